@@ -1,8 +1,7 @@
-import os
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import customtkinter as ctk
-from PIL import Image, ImageTk, ImageOps
+from PIL import ImageOps
 
 # import your ui components
 from ui.toolbar import Toolbarr
@@ -10,15 +9,21 @@ from ui.sidebar import Sidebar
 from ui.menu_manager import MenuManager
 from ui.properties_panel import PropertiesPanel
 from ui.settings_manager import SettingsManager
-from layers.layer import Layer
 from layers.layer_manager import LayerManager
+from layers.history import HistoryStore
 from ui.layer_panel import LayerPanel
+from ui.canvas_renderer import CanvasRenderer
+from ui.render_scheduler import RenderScheduler
 
 # import you utilities
 from utils.keyboard_shortcuts import KeyboardShortcuts
+from utils.job_scheduler import JobScheduler
+from utils.autosave import AutosaveService
 
 # import your tools
 from tools.tools import Toolss
+from tools.filter_executor import FilterExecutor
+from tools import operations
 
 # Set appearance mode and default color theme
 ctk.set_appearance_mode("System")
@@ -35,9 +40,12 @@ class ModernImageEditor:
         
         
         self.image_path = None
+        self.project = None  # ProjectFile the layers were last opened from or saved to
         self.original_image = None
         self.current_image = None
-        self.display_image = None
+        # Full image size over current image size while a draft preview of a file is shown
+        self.preview_scale = 1.0
+        self.composite_outdated = False  # Set when the layer composite must be refreshed before drawing
         
         self.crop_start_x = None
         self.crop_start_y = None
@@ -49,6 +57,13 @@ class ModernImageEditor:
         self.history = []
         self.history_index = -1
         self.max_history = 20  # Maximum number of states to keep in history
+        self.history_store = HistoryStore()  # Shares unchanged layer tiles between states
+        self.history_error = None  # Why the history could not be kept within its budget, if it could not
+        # Recipe steps of the operations applied so far; the first operation_count
+        # of them lead to the current state, later ones were undone
+        self.operation_log = []
+        self.operation_count = 0
+        self.filter_executor = FilterExecutor()  # Runs filters on large images in parallel strips
         
         self.layer_manager = LayerManager(self)
         self.tools = Toolss(self)
@@ -64,6 +79,12 @@ class ModernImageEditor:
         self.menu_manager = MenuManager(self)
         self.menu_manager.settings_manager.apply_settings()
         self.menu_manager.create_menu()
+        
+        # Autosave the layers to a recovery file, which is removed on a normal exit.
+        # Autosaving starts once a recovery file left by a crash has been dealt with.
+        self.autosave = AutosaveService(self, interval=0)
+        self.root.protocol("WM_DELETE_WINDOW", self.quit)
+        self.root.after_idle(self.offer_recovery)
         # Initialize the layer manager
         
 
@@ -103,6 +124,12 @@ class ModernImageEditor:
         self.canvas = tk.Canvas(self.canvas_frame, bg="#2a2d2e", highlightthickness=0)
         self.canvas.pack(fill=tk.BOTH, expand=True)
 
+        # Renders only the visible part of the image into the canvas, with fast
+        # previews while the view is changing and a quality pass once it settles
+        self.renderer = CanvasRenderer(self.canvas)
+        self.render_scheduler = RenderScheduler(self.root, self.render_canvas)
+        self.canvas.bind("<Configure>", lambda event: self.request_render())
+
         # Status bar
         self.status_frame = ctk.CTkFrame(self.content_frame, height=30)
         self.status_frame.pack(fill=tk.X, pady=(5, 0))
@@ -118,6 +145,19 @@ class ModernImageEditor:
         self.zoom_label = ctk.CTkLabel(self.status_frame, text="Zoom: 100%", padx=10)
         self.zoom_label.pack(side=tk.RIGHT)
 
+        # History memory label in status bar
+        self.history_label = ctk.CTkLabel(self.status_frame, text="", padx=10)
+        self.history_label.pack(side=tk.RIGHT)
+
+        # Background job progress and cancel button, shown while a job is running
+        self.job_label = ctk.CTkLabel(self.status_frame, text="", padx=10)
+        self.job_progress = ctk.CTkProgressBar(self.status_frame, width=120)
+        self.job_cancel_btn = ctk.CTkButton(self.status_frame, text="Cancel", width=60,
+                                            command=lambda: self.job_scheduler.cancel())
+
+        # Runs filters, resizes, rotations and saves off the main loop, one after the other
+        self.job_scheduler = JobScheduler(self.root, on_update=self.update_job_status)
+
         # Create sidebar elements
         self.sidebar_ui = Sidebar(self)
 
@@ -147,12 +187,6 @@ class ModernImageEditor:
         
         self.draw_last_point = None
         
-        # Create a temporary image for drawing preview
-        if self.current_image:
-            from PIL import ImageDraw
-            self.draw_overlay = self.current_image.copy()
-            self.draw_preview = ImageDraw.Draw(self.draw_overlay)
-        
         # Bind canvas events for drawing
         self.canvas.bind("<Button-1>", self.start_drawing)
         self.canvas.bind("<B1-Motion>", self.draw)
@@ -163,17 +197,63 @@ class ModernImageEditor:
         self.sidebar_ui.brightness_slider.configure(command=self.tools.apply_brightness)
         self.sidebar_ui.contrast_slider.configure(command=self.tools.apply_contrast)
         self.sidebar_ui.saturation_slider.configure(command=self.tools.apply_saturation)
+        # Sliders preview on a proxy while dragged and apply to the full image on release
+        for slider in (self.sidebar_ui.brightness_slider, self.sidebar_ui.contrast_slider,
+                       self.sidebar_ui.saturation_slider):
+            slider.bind("<ButtonRelease-1>", self.tools.commit_adjustments, add="+")
         self.sidebar_ui.grayscale_btn.configure(command=self.tools.apply_grayscale)
         # Add other callbacks as needed
 
     def open_image(self, event=None):
         self.tools.open_image()
 
-    def save_image(self, event=None):
-        self.tools.save_image()
+    def save_image(self, event=None, save_as=False):
+        self.tools.save_image(save_as)
+
+    def open_project(self, event=None):
+        self.tools.open_project()
+
+    def save_project(self, event=None, save_as=False):
+        self.tools.save_project(save_as)
+
+    def offer_recovery(self):
+        """Offer to restore the work autosaved by a session that did not close normally"""
+        if self.autosave.has_recovery:
+            if messagebox.askyesno("Recover Work",
+                                   "The editor was not closed normally last time.\n"
+                                   "Do you want to restore the autosaved work?"):
+                try:
+                    layers, canvas_size, active_index = self.autosave.restore()
+                except Exception as e:
+                    messagebox.showerror("Error", f"Could not restore the autosaved work: {str(e)}")
+                    self.autosave.discard()
+                else:
+                    self.project = None
+                    self.image_path = None
+                    self.tools.show_layers(layers, canvas_size, active_index, "Restored autosaved work")
+            else:
+                self.autosave.discard()
+        
+        self.autosave.interval = self.settings_manager.settings["performance"]["autosave_interval_s"]
+
+    def quit(self, event=None):
+        """Close the editor; nothing needs recovering after this, so the recovery file is removed"""
+        self.autosave.stop()
+        self.root.quit()
 
     def display_image_on_canvas(self):
-        self.tools.display_image_on_canvas()
+        self.render_scheduler.render_now()
+
+    def request_render(self, interactive=True):
+        """Redraw the canvas, coalescing bursts of interactive changes."""
+        self.render_scheduler.request(interactive)
+
+    def render_canvas(self, fast=False):
+        """Draw the canvas, refreshing the layer composite first if it is out of date."""
+        if self.composite_outdated:
+            self.composite_outdated = False
+            self.current_image = self.layer_manager.get_composite_image()
+        self.tools.display_image_on_canvas(fast)
 
     def resize_image(self, event=None):
         self.tools.resize_image()
@@ -214,6 +294,9 @@ class ModernImageEditor:
     def apply_negative(self, event=None):
         self.tools.apply_negative()
 
+    def apply_tint(self, event=None):
+        self.tools.apply_tint()
+
     def apply_brightness(self, value):
         self.tools.apply_brightness(value)
 
@@ -242,36 +325,22 @@ class ModernImageEditor:
             y1, y2 = min(y1, y2), max(y1, y2)
             
             # Convert canvas coordinates to image coordinates
-            canvas_width = self.canvas.winfo_width()
-            canvas_height = self.canvas.winfo_height()
-            img_width, img_height = self.current_image.size
-            display_width, display_height = self.display_image.size
-            
-            # Calculate the position of the image on the canvas
-            img_x = (canvas_width - display_width) // 2
-            img_y = (canvas_height - display_height) // 2
-            
-            # Adjust coordinates relative to the image
-            x1 = max(0, x1 - img_x)
-            y1 = max(0, y1 - img_y)
-            x2 = min(display_width, x2 - img_x)
-            y2 = min(display_height, y2 - img_y)
+            img_x1, img_y1 = self.renderer.canvas_to_image(x1, y1)
+            img_x2, img_y2 = self.renderer.canvas_to_image(x2, y2)
             
-            # Scale coordinates to original image size
-            scale_x = img_width / display_width
-            scale_y = img_height / display_height
-            
-            crop_x1 = int(x1 * scale_x)
-            crop_y1 = int(y1 * scale_y)
-            crop_x2 = int(x2 * scale_x)
-            crop_y2 = int(y2 * scale_y)
+            # Clip the crop box to the image
+            crop_x1 = max(0, int(img_x1))
+            crop_y1 = max(0, int(img_y1))
+            crop_x2 = min(self.current_image.width, int(img_x2))
+            crop_y2 = min(self.current_image.height, int(img_y2))
             
             # Perform the crop
             if crop_x2 > crop_x1 and crop_y2 > crop_y1:
                 # Add current state to history before making changes
                 self.push_to_history()
+                self.record_operation("crop", left=crop_x1, upper=crop_y1, right=crop_x2, lower=crop_y2)
                 
-                self.current_image = self.current_image.crop((crop_x1, crop_y1, crop_x2, crop_y2))
+                self.current_image = operations.crop(self.current_image, crop_x1, crop_y1, crop_x2, crop_y2)
                 self.display_image_on_canvas()
             
             # Reset cropping state
@@ -285,29 +354,17 @@ class ModernImageEditor:
         if not hasattr(self, 'layer_manager') or not self.layer_manager.layers:
             return
         
-        # Create a deep copy of the current layer stack
-        layer_stack_copy = []
-        for layer in self.layer_manager.layers:
-            layer_copy = Layer(
-                image=layer.image.copy() if layer.image else None,
-                name=layer.name,
-                visible=layer.visible,
-                opacity=layer.opacity,
-                blend_mode=layer.blend_mode
-            )
-            layer_copy.x_offset = layer.x_offset
-            layer_copy.y_offset = layer.y_offset
-            layer_stack_copy.append(layer_copy)
+        # Snapshot the layer stack; unchanged tiles are shared with the previous state
+        state = self.history_store.snapshot(self.layer_manager.layers, self.layer_manager.active_layer_index)
+        # Operations recorded after this point follow this state
+        state['operations'] = self.operation_count
         
         # If we're not at the end of the history, truncate it
         if self.history_index < len(self.history) - 1:
             self.history = self.history[:self.history_index + 1]
         
-        # Add the copy to history
-        self.history.append({
-            'layers': layer_stack_copy,
-            'active_index': self.layer_manager.active_layer_index
-        })
+        # Add the snapshot to history
+        self.history.append(state)
         
         # Limit history size
         max_history = getattr(self, 'max_history_states', 20)
@@ -317,9 +374,73 @@ class ModernImageEditor:
         # Update history index
         self.history_index = len(self.history) - 1
         
+        # Compress or spill older states that no longer fit the memory budget
+        self.enforce_history_budget()
+        
         # Update undo/redo buttons
         self.update_undo_redo_buttons()
 
+    def enforce_history_budget(self):
+        """Compress or spill older history states that no longer fit the memory budget"""
+        try:
+            self.history_store.enforce_budget(self.history, self.history_index)
+            self.history_error = None
+        except OSError as e:
+            # The states that could not be spilled stay in memory
+            self.history_error = f"could not spill to disk: {e}"
+        self.update_history_status()
+
+    def record_operation(self, op, **params):
+        """Log an operation as a recipe step for macros, after push_to_history() for it"""
+        # A new operation replaces any that were undone
+        del self.operation_log[self.operation_count:]
+        step = dict(op=op, **params)
+        step["layer"] = self.layer_manager.active_layer_index
+        self.operation_log.append(step)
+        self.operation_count = len(self.operation_log)
+
+    def recorded_operations(self):
+        """Return the recipe steps that lead to the current state"""
+        return [dict(step) for step in self.operation_log[:self.operation_count]]
+
+    def update_job_status(self, job):
+        """Show the progress of the running background job in the status bar, or hide it"""
+        if job is None:
+            self.job_label.pack_forget()
+            self.job_progress.pack_forget()
+            self.job_cancel_btn.pack_forget()
+            return
+
+        if not self.job_label.winfo_manager():
+            self.job_cancel_btn.pack(side=tk.RIGHT, padx=(0, 10))
+            self.job_progress.pack(side=tk.RIGHT)
+            self.job_label.pack(side=tk.RIGHT)
+        self.job_label.configure(text=f"{job.name}...")
+        self.job_progress.set(job.progress)
+
+    def update_history_status(self):
+        """Show the memory used by the undo history in the status bar"""
+        if not hasattr(self, 'history_label'):
+            return
+        
+        memory = self.history_store.memory_usage(self.history) / (1024 * 1024)
+        disk = self.history_store.disk_usage(self.history) / (1024 * 1024)
+        text = f"History: {memory:.1f} MB"
+        if disk:
+            text += f" (+{disk:.1f} MB on disk)"
+        if self.history_error:
+            text += f", {self.history_error}"
+        self.history_label.configure(text=text)
+
+    def reset_history(self):
+        """Start a new history containing only the current state"""
+        self.history = []
+        self.history_index = -1
+        self.operation_log = []
+        self.operation_count = 0
+        self.push_to_history()
+        self.update_undo_redo_buttons()
+
     def clear_panel(self):
         """Clear all widgets from the properties panel."""
         # Destroy all widgets in the panel
@@ -389,37 +510,12 @@ class ModernImageEditor:
         if self.active_tool != "text" or self.current_image is None:
             return
         
-        # Check if display_image exists
-        if self.display_image is None:
-            self.status_bar.configure(text="Please load an image first")
-            return
-        
-        # Get click position relative to the image
-        canvas_width = self.canvas.winfo_width()
-        canvas_height = self.canvas.winfo_height()
+        # Convert the canvas position to image coordinates
+        position = self.canvas_to_image(event.x, event.y)
         
-        # Calculate the position of the image on the canvas
-        img_width, img_height = self.display_image.size
-        img_x = (canvas_width - img_width) // 2
-        img_y = (canvas_height - img_height) // 2
-        
-        # Check if click is within image bounds
-        if (img_x <= event.x <= img_x + img_width and 
-            img_y <= event.y <= img_y + img_height):
-            
-            # Calculate position relative to the image
-            rel_x = event.x - img_x
-            rel_y = event.y - img_y
-            
-            # Scale coordinates to original image size if zoomed
-            if hasattr(self, 'zoom_level'):
-                scale_x = self.current_image.width / img_width
-                scale_y = self.current_image.height / img_height
-                img_x_pos = int(rel_x * scale_x)
-                img_y_pos = int(rel_y * scale_y)
-            else:
-                img_x_pos = rel_x
-                img_y_pos = rel_y
+        # Check if the position is within image bounds
+        if position is not None:
+            img_x_pos, img_y_pos = position
             
             # Create an editable text field on the canvas
             self.create_editable_text(img_x_pos, img_y_pos, event.x, event.y)
@@ -450,10 +546,7 @@ class ModernImageEditor:
             # Set the image path and load the image
             self.image_path = file_path
             try:
-                self.original_image = Image.open(file_path)
-                self.current_image = self.original_image.copy()
-                self.display_image_on_canvas()
-                self.status_bar.configure(text=f"Loaded: {os.path.basename(file_path)}")
+                self.tools.load_image_file(file_path)
             except Exception as e:
                 messagebox.showerror("Error", f"Could not open image: {str(e)}")
         else:
@@ -469,8 +562,8 @@ class ModernImageEditor:
         
         # Restore the state
         state = self.history[self.history_index]
-        self.layer_manager.layers = state['layers']
-        self.layer_manager.active_layer_index = state['active_index']
+        self.layer_manager.layers, self.layer_manager.active_layer_index = self.history_store.restore(state)
+        self.operation_count = state.get('operations', 0)
         
         # Update the display
         self.current_image = self.layer_manager.get_composite_image()
@@ -492,8 +585,8 @@ class ModernImageEditor:
         
         # Restore the state
         state = self.history[self.history_index]
-        self.layer_manager.layers = state['layers']
-        self.layer_manager.active_layer_index = state['active_index']
+        self.layer_manager.layers, self.layer_manager.active_layer_index = self.history_store.restore(state)
+        self.operation_count = state.get('operations', 0)
         
         # Update the display
         self.current_image = self.layer_manager.get_composite_image()
@@ -604,6 +697,12 @@ class ModernImageEditor:
         self.canvas.bind("<MouseWheel>", self.zoom_with_mouse_wheel)  # Windows
         self.canvas.bind("<Button-4>", self.zoom_with_mouse_wheel)    # Linux scroll up
         self.canvas.bind("<Button-5>", self.zoom_with_mouse_wheel)    # Linux scroll down
+        
+        # Pan with the middle mouse button
+        self.pan_last_point = None
+        self.canvas.bind("<ButtonPress-2>", self.start_pan)
+        self.canvas.bind("<B2-Motion>", self.pan_view)
+        self.canvas.bind("<ButtonRelease-2>", self.stop_pan)
 
     def zoom_in(self, event=None):
         """Zoom in the image."""
@@ -621,6 +720,15 @@ class ModernImageEditor:
         self.zoom_level = max(self.zoom_level - self.zoom_step, self.min_zoom)
         self.apply_zoom()
 
+    def set_zoom(self, percent):
+        """Set the zoom level to a percentage and recenter the image."""
+        if not self.current_image:
+            return
+        
+        self.zoom_level = min(max(percent / 100, self.min_zoom), self.max_zoom)
+        self.renderer.reset_view()
+        self.apply_zoom()
+
     def zoom_with_mouse_wheel(self, event):
         """Handle zoom with mouse wheel."""
         if not self.current_image:
@@ -632,33 +740,51 @@ class ModernImageEditor:
         elif event.num == 5 or event.delta < 0:  # Scroll down or negative delta
             self.zoom_level = max(self.zoom_level - self.zoom_step, self.min_zoom)
         
-        self.apply_zoom()
+        # Keep the point under the mouse cursor in place
+        self.apply_zoom(anchor=(event.x, event.y))
 
-    def apply_zoom(self):
+    def apply_zoom(self, anchor=None):
         """Apply the current zoom level to the image."""
         if not self.current_image:
             return
         
-        # Calculate new dimensions
-        new_width = int(self.current_image.width * self.zoom_level)
-        new_height = int(self.current_image.height * self.zoom_level)
-        
-        # Resize the display image (not the actual image data)
-        self.display_image = self.current_image.resize((new_width, new_height), Image.LANCZOS)
-        
-        # Update the display
-        self.tk_image = ImageTk.PhotoImage(self.display_image)
-        self.canvas.delete("all")
-        self.canvas.create_image(
-            self.canvas.winfo_width()//2, 
-            self.canvas.winfo_height()//2, 
-            image=self.tk_image, 
-            anchor=tk.CENTER
-        )
+        # Only the visible part of the image is resampled
+        self.renderer.set_zoom(self.zoom_level, anchor)
+        self.request_render()
         
         # Update zoom level indicator
         self.zoom_label.configure(text=f"Zoom: {int(self.zoom_level * 100)}%")
 
+    def start_pan(self, event):
+        """Start panning the view with the middle mouse button."""
+        self.pan_last_point = (event.x, event.y)
+        self.canvas.config(cursor="fleur")
+
+    def pan_view(self, event):
+        """Pan the view as the middle mouse button is dragged."""
+        if not self.current_image or self.pan_last_point is None:
+            return
+        
+        self.renderer.pan(event.x - self.pan_last_point[0], event.y - self.pan_last_point[1])
+        self.pan_last_point = (event.x, event.y)
+        self.request_render()
+
+    def stop_pan(self, event):
+        """Stop panning the view."""
+        self.pan_last_point = None
+        self.canvas.config(cursor="")
+
+    def canvas_to_image(self, x, y):
+        """Convert canvas coordinates to image pixel coordinates, or None if outside the image."""
+        if not self.renderer.contains(x, y):
+            return None
+        img_x, img_y = self.renderer.canvas_to_image(x, y)
+        return int(img_x), int(img_y)
+
+    def image_to_canvas(self, x, y):
+        """Convert image coordinates to canvas coordinates."""
+        return self.renderer.image_to_canvas(x, y)
+
     def setup_drag_drop(self):
         """Set up drag and drop functionality for the canvas."""
         try:
@@ -706,117 +832,37 @@ class ModernImageEditor:
         
         # Bind canvas click for text placement
         self.canvas.bind("<Button-1>", self.place_text_on_canvas)
-    def activate_draw_tool(self, event=None):
-        """Activate the drawing tool."""
-        self.active_tool = "draw"
-        self.status_bar.configure(text="Drawing Tool: Click and drag to draw")
-        
-        # Show drawing properties in the properties panel
-        self.properties_panel.show_draw_properties()
-        
-        # Bind canvas events for drawing
-        self.canvas.bind("<Button-1>", self.start_drawing)
-        self.canvas.bind("<B1-Motion>", self.draw)
-        self.canvas.bind("<ButtonRelease-1>", self.stop_drawing)
-
     def start_drawing(self, event):
         """Start drawing on the canvas."""
         if self.active_tool != "draw" or self.current_image is None:
             return
         
-        # Get click position relative to the image
-        canvas_width = self.canvas.winfo_width()
-        canvas_height = self.canvas.winfo_height()
-        
-        # Calculate the position of the image on the canvas
-        img_width, img_height = self.display_image.size
-        img_x = (canvas_width - img_width) // 2
-        img_y = (canvas_height - img_height) // 2
+        # Convert the canvas position to image coordinates
+        position = self.canvas_to_image(event.x, event.y)
         
-        # Check if click is within image bounds
-        if (img_x <= event.x <= img_x + img_width and 
-            img_y <= event.y <= img_y + img_height):
-            
-            # Calculate position relative to the image
-            rel_x = event.x - img_x
-            rel_y = event.y - img_y
-            
-            # Scale coordinates to original image size if zoomed
-            if hasattr(self, 'zoom_level'):
-                scale_x = self.current_image.width / img_width
-                scale_y = self.current_image.height / img_height
-                img_x_pos = int(rel_x * scale_x)
-                img_y_pos = int(rel_y * scale_y)
-            else:
-                img_x_pos = rel_x
-                img_y_pos = rel_y
-            
+        # Check if the position is within image bounds
+        if position is not None and self.tools.start_stroke():
             # Set the last point for drawing
-            self.draw_last_point = (img_x_pos, img_y_pos)
+            self.draw_last_point = position
             
             # Draw a single point
-            if hasattr(self, 'draw_preview'):
-                self.draw_preview.ellipse(
-                    [(img_x_pos - self.draw_size//2, img_y_pos - self.draw_size//2),
-                    (img_x_pos + self.draw_size//2, img_y_pos + self.draw_size//2)],
-                    fill=self.draw_color
-                )
-                
-                # Update display
-                self.display_drawing_preview()
+            self.tools.paint_stroke(position, position)
 
     def draw(self, event):
         """Continue drawing as the mouse moves."""
         if self.active_tool != "draw" or self.current_image is None or self.draw_last_point is None:
             return
         
-        # Get current position relative to the image
-        canvas_width = self.canvas.winfo_width()
-        canvas_height = self.canvas.winfo_height()
-        
-        # Calculate the position of the image on the canvas
-        img_width, img_height = self.display_image.size
-        img_x = (canvas_width - img_width) // 2
-        img_y = (canvas_height - img_height) // 2
+        # Convert the canvas position to image coordinates
+        position = self.canvas_to_image(event.x, event.y)
         
-        # Check if within image bounds
-        if (img_x <= event.x <= img_x + img_width and 
-            img_y <= event.y <= img_y + img_height):
-            
-            # Calculate position relative to the image
-            rel_x = event.x - img_x
-            rel_y = event.y - img_y
-            
-            # Scale coordinates to original image size if zoomed
-            if hasattr(self, 'zoom_level'):
-                scale_x = self.current_image.width / img_width
-                scale_y = self.current_image.height / img_height
-                img_x_pos = int(rel_x * scale_x)
-                img_y_pos = int(rel_y * scale_y)
-            else:
-                img_x_pos = rel_x
-                img_y_pos = rel_y
-            
+        # Check if the position is within image bounds
+        if position is not None:
             # Draw a line from last point to current point
-            if hasattr(self, 'draw_preview'):
-                self.draw_preview.line(
-                    [self.draw_last_point, (img_x_pos, img_y_pos)],
-                    fill=self.draw_color,
-                    width=self.draw_size
-                )
-                
-                # Draw a circle at the end point for smoother lines
-                self.draw_preview.ellipse(
-                    [(img_x_pos - self.draw_size//2, img_y_pos - self.draw_size//2),
-                    (img_x_pos + self.draw_size//2, img_y_pos + self.draw_size//2)],
-                    fill=self.draw_color
-                )
-                
-                # Update the last point
-                self.draw_last_point = (img_x_pos, img_y_pos)
-                
-                # Update display
-                self.display_drawing_preview()
+            self.tools.paint_stroke(self.draw_last_point, position)
+            
+            # Update the last point
+            self.draw_last_point = position
 
     def stop_drawing(self, event):
         """Stop drawing and apply changes to the image."""
@@ -829,65 +875,17 @@ class ModernImageEditor:
         # Reset drawing state
         self.draw_last_point = None
 
-    def display_drawing_preview(self):
-        """Display the drawing preview on the canvas."""
-        if not hasattr(self, 'draw_overlay') or self.draw_overlay is None:
-            return
-        
-        # Create a copy that's properly sized for display
-        if hasattr(self, 'zoom_level'):
-            preview_width = int(self.draw_overlay.width * self.zoom_level)
-            preview_height = int(self.draw_overlay.height * self.zoom_level)
-            display_preview = self.draw_overlay.resize((preview_width, preview_height), Image.LANCZOS)
-        else:
-            display_preview = self.draw_overlay.copy()
-        
-        # Update the display
-        self.tk_image = ImageTk.PhotoImage(display_preview)
-        self.canvas.delete("all")
-        self.canvas.create_image(
-            self.canvas.winfo_width()//2, 
-            self.canvas.winfo_height()//2, 
-            image=self.tk_image, 
-            anchor=tk.CENTER
-        )
-
     def place_text_on_canvas(self, event):
         """Handle click event to place text at the clicked position."""
         if self.active_tool != "text" or self.current_image is None:
             return
         
-        # Check if display_image exists
-        if self.display_image is None:
-            self.status_bar.configure(text="Please load an image first")
-            return
-        
-        # Get click position relative to the image
-        canvas_width = self.canvas.winfo_width()
-        canvas_height = self.canvas.winfo_height()
-        
-        # Calculate the position of the image on the canvas
-        img_width, img_height = self.display_image.size
-        img_x = (canvas_width - img_width) // 2
-        img_y = (canvas_height - img_height) // 2
+        # Convert the canvas position to image coordinates
+        position = self.canvas_to_image(event.x, event.y)
         
-        # Check if click is within image bounds
-        if (img_x <= event.x <= img_x + img_width and 
-            img_y <= event.y <= img_y + img_height):
-            
-            # Calculate position relative to the image
-            rel_x = event.x - img_x
-            rel_y = event.y - img_y
-            
-            # Scale coordinates to original image size if zoomed
-            if hasattr(self, 'zoom_level'):
-                scale_x = self.current_image.width / img_width
-                scale_y = self.current_image.height / img_height
-                img_x_pos = int(rel_x * scale_x)
-                img_y_pos = int(rel_y * scale_y)
-            else:
-                img_x_pos = rel_x
-                img_y_pos = rel_y
+        # Check if the position is within image bounds
+        if position is not None:
+            img_x_pos, img_y_pos = position
             
             # Create an editable text field on the canvas
             self.create_editable_text(img_x_pos, img_y_pos, event.x, event.y)
@@ -990,9 +988,13 @@ class ModernImageEditor:
         if self.current_image is None:
             self.status_bar.configure(text="No image to add text to")
             return
+        if self.tools.refuse_tiled_edit("Adding text"):
+            return
         
         # Save current state for undo
         self.push_to_history()
+        self.record_operation("text", text=text, position=position, font_family=font_family,
+                              font_size=font_size, color=color)
         
         # Create a drawing context
         from PIL import ImageDraw, ImageFont
@@ -1084,10 +1086,7 @@ class ModernImageEditor:
             # Set the image path and load the image
             self.image_path = file_path
             try:
-                self.original_image = Image.open(file_path)
-                self.current_image = self.original_image.copy()
-                self.display_image_on_canvas()
-                self.status_bar.configure(text=f"Loaded: {os.path.basename(file_path)}")
+                self.tools.load_image_file(file_path)
             except Exception as e:
                 messagebox.showerror("Error", f"Could not open image: {str(e)}")
         else:
@@ -0,0 +1,72 @@
+from PIL import Image, ImageChops
+
+# Separable blend functions B(backdrop, source) for each mode offered in the layer panel.
+# Normal has no blend function: the source is simply composited over the backdrop.
+BLEND_FUNCTIONS = {
+    "Normal": None,
+    "Multiply": ImageChops.multiply,
+    "Screen": ImageChops.screen,
+    "Overlay": ImageChops.overlay,
+    "Soft Light": ImageChops.soft_light,
+    "Hard Light": ImageChops.hard_light,
+    "Difference": ImageChops.difference,
+}
+
+BLEND_MODES = list(BLEND_FUNCTIONS)
+
+
+def blend_onto(base, top, mode="Normal", offset=(0, 0)):
+    """Blend top onto the RGBA image base in place, with its top-left corner at offset.
+
+    Colors are mixed following the W3C compositing model: where the backdrop is
+    opaque the source color is replaced by B(backdrop, source), where it is
+    transparent the source color is used unchanged, and the result is then
+    composited source-over using the source alpha.
+    """
+    if top.mode != 'RGBA':
+        top = top.convert('RGBA')
+
+    # Clip the layer to the part that overlaps the base image
+    x, y = offset
+    left, upper = max(x, 0), max(y, 0)
+    right, lower = min(x + top.width, base.width), min(y + top.height, base.height)
+    if right <= left or lower <= upper:
+        return base
+
+    if (left - x, upper - y, right - x, lower - y) != (0, 0, top.width, top.height):
+        top = top.crop((left - x, upper - y, right - x, lower - y))
+
+    blend_function = BLEND_FUNCTIONS.get(mode)
+    if blend_function is not None:
+        backdrop = base.crop((left, upper, right, lower))
+        backdrop_alpha = backdrop.getchannel('A')
+        top_rgb = top.convert('RGB')
+        blended = blend_function(backdrop.convert('RGB'), top_rgb)
+
+        # Use the blended color only where there is something to blend with
+        if backdrop_alpha.getextrema()[0] < 255:
+            blended = Image.composite(blended, top_rgb, backdrop_alpha)
+        blended.putalpha(top.getchannel('A'))
+        top = blended
+
+    base.alpha_composite(top, dest=(left, upper))
+    return base
+
+
+def composite_layers(layers, size, origin=(0, 0)):
+    """Composite the visible layers (bottom to top) into a new RGBA image of the given size.
+
+    origin is the canvas position of the image's top-left corner, so a single region
+    of the canvas can be composited on its own.
+    """
+    composite = Image.new("RGBA", size, (0, 0, 0, 0))
+    origin_x, origin_y = origin
+
+    for layer in layers:
+        if layer.visible and layer.image:
+            layer_image = layer.apply_opacity()
+            if layer_image:
+                offset = (layer.x_offset - origin_x, layer.y_offset - origin_y)
+                blend_onto(composite, layer_image, layer.blend_mode, offset)
+
+    return composite
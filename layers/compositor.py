@@ -0,0 +1,216 @@
+from PIL import Image
+
+from .blend_modes import blend_onto, composite_layers
+
+# Edge length of the square tiles the canvas is split into
+TILE_SIZE = 256
+
+
+def tiles_in_rect(rect, canvas_size, tile_size=TILE_SIZE):
+    """Return the (column, row) of every tile overlapping rect, clipped to the canvas"""
+    left, upper = max(rect[0], 0), max(rect[1], 0)
+    right, lower = min(rect[2], canvas_size[0]), min(rect[3], canvas_size[1])
+    if right <= left or lower <= upper:
+        return set()
+
+    return {
+        (column, row)
+        for row in range(upper // tile_size, (lower - 1) // tile_size + 1)
+        for column in range(left // tile_size, (right - 1) // tile_size + 1)
+    }
+
+
+def tile_box(tile, size, tile_size=TILE_SIZE):
+    """Return the box covered by a (column, row) tile in an image of the given size"""
+    column, row = tile
+    left, upper = column * tile_size, row * tile_size
+    return (left, upper, min(left + tile_size, size[0]), min(upper + tile_size, size[1]))
+
+
+def tile_runs(tiles, canvas_size, tile_size=TILE_SIZE):
+    """Merge tiles into boxes covering horizontal runs of adjacent tiles in each row"""
+    rows = {}
+    for column, row in tiles:
+        rows.setdefault(row, []).append(column)
+
+    boxes = []
+    for row, columns in sorted(rows.items()):
+        columns.sort()
+        start = previous = columns[0]
+        for column in columns[1:] + [None]:
+            if column is not None and column == previous + 1:
+                previous = column
+                continue
+            boxes.append((
+                start * tile_size,
+                row * tile_size,
+                min((previous + 1) * tile_size, canvas_size[0]),
+                min((row + 1) * tile_size, canvas_size[1]),
+            ))
+            if column is not None:
+                start = previous = column
+
+    return boxes
+
+
+class TileCompositor:
+    """Keeps a flattened image of a layer stack and re-blends only the tiles that changed"""
+
+    def __init__(self, tile_size=TILE_SIZE):
+        self.tile_size = tile_size
+        self.image = None
+        self.shared = False  # Set by share() until the next refresh that changes the image
+        self._layer_states = []  # (layer, stamp, bounds) as of the last refresh
+        self._dirty_tiles = set()
+
+    def share(self):
+        """Leave the current image as it is for a reader off the main thread.
+
+        The next refresh that changes it pastes into a copy instead of updating
+        it in place, so the copy is only made if the layers change meanwhile.
+        """
+        self.shared = self.image is not None
+
+    def _mark_dirty(self, rect, canvas_size):
+        if rect is not None:
+            self._dirty_tiles |= tiles_in_rect(rect, canvas_size, self.tile_size)
+
+    def _collect_changes(self, layers, canvas_size):
+        """Turn layer changes since the last refresh into dirty tiles"""
+        previous_layers = [state[0] for state in self._layer_states]
+        same_stack = len(previous_layers) == len(layers) and \
+            all(old is new for old, new in zip(previous_layers, layers))
+
+        if not same_stack:
+            # Layers were added, removed or reordered: redo everything they cover
+            for _, _, bounds in self._layer_states:
+                self._mark_dirty(bounds, canvas_size)
+            for layer in layers:
+                self._mark_dirty(layer.bounds, canvas_size)
+            return
+
+        for layer, stamp, bounds in self._layer_states:
+            if layer.stamp == stamp:
+                continue
+
+            rects = layer.dirty_rects_since(stamp)
+            if rects is None:
+                # The whole layer changed, possibly moving or changing size
+                self._mark_dirty(bounds, canvas_size)
+                self._mark_dirty(layer.bounds, canvas_size)
+            else:
+                for left, upper, right, lower in rects:
+                    self._mark_dirty((left + layer.x_offset, upper + layer.y_offset,
+                                      right + layer.x_offset, lower + layer.y_offset), canvas_size)
+
+    def refresh(self, layers, canvas_size):
+        """Bring the flattened image up to date with layers and return it.
+
+        Returns the list of canvas boxes that were recomposited along with the image.
+        The image is owned by the compositor and updated in place on later refreshes.
+        """
+        if self.image is None or self.image.size != tuple(canvas_size):
+            self.image = Image.new("RGBA", canvas_size, (0, 0, 0, 0))
+            self.shared = False
+            self._layer_states = []
+            self._dirty_tiles = tiles_in_rect((0, 0) + tuple(canvas_size), canvas_size, self.tile_size)
+
+        self._collect_changes(layers, canvas_size)
+
+        boxes = tile_runs(self._dirty_tiles, canvas_size, self.tile_size) if self._dirty_tiles else []
+        if boxes and self.shared:
+            self.image = self.image.copy()
+            self.shared = False
+        for box in boxes:
+            region = composite_layers(layers, (box[2] - box[0], box[3] - box[1]), origin=box[:2])
+            self.image.paste(region, box[:2])
+
+        self._dirty_tiles = set()
+        self._layer_states = [(layer, layer.stamp, layer.bounds) for layer in layers]
+        return self.image, boxes
+
+
+class ActiveLayerCompositor:
+    """Composites a layer stack around the active layer from two cached flattened images.
+
+    The layers under the active one are kept flattened in one TileCompositor and the
+    layers above it in another, so refreshing after an edit of the active layer only
+    blends three images over the dirty tiles. Flattening the layers above is only exact
+    when they all use the Normal blend mode (source-over is associative); use
+    can_composite() to check before relying on it.
+    """
+
+    def __init__(self, tile_size=TILE_SIZE):
+        self.tile_size = tile_size
+        self.below = TileCompositor(tile_size)
+        self.above = TileCompositor(tile_size)
+        self.image = None
+        self.shared = False  # See TileCompositor.share()
+        self._active_state = None  # (layer, stamp, bounds) as of the last refresh
+
+    @staticmethod
+    def can_composite(layers, active_index):
+        """Whether the stack can be split around active_index without changing the result"""
+        if not 0 <= active_index < len(layers):
+            return False
+        return all(layer.blend_mode == "Normal" or not layer.visible
+                   for layer in layers[active_index + 1:])
+
+    def share(self):
+        """Leave the current image as it is for a reader off the main thread, see TileCompositor.share()"""
+        self.shared = self.image is not None
+
+    def _active_layer_tiles(self, layer, canvas_size):
+        """Return the tiles changed by the active layer since the last refresh"""
+        if self._active_state is None or self._active_state[0] is not layer:
+            return tiles_in_rect((0, 0) + tuple(canvas_size), canvas_size, self.tile_size)
+
+        _, stamp, bounds = self._active_state
+        if layer.stamp == stamp:
+            return set()
+
+        rects = layer.dirty_rects_since(stamp)
+        if rects is None:
+            tiles = set()
+            for rect in (bounds, layer.bounds):
+                if rect is not None:
+                    tiles |= tiles_in_rect(rect, canvas_size, self.tile_size)
+            return tiles
+
+        tiles = set()
+        for left, upper, right, lower in rects:
+            tiles |= tiles_in_rect((left + layer.x_offset, upper + layer.y_offset,
+                                    right + layer.x_offset, lower + layer.y_offset), canvas_size, self.tile_size)
+        return tiles
+
+    def refresh(self, layers, active_index, canvas_size):
+        """Bring the composite up to date and return it with the list of recomposited boxes"""
+        active_layer = layers[active_index]
+
+        if self.image is None or self.image.size != tuple(canvas_size):
+            self.image = Image.new("RGBA", canvas_size, (0, 0, 0, 0))
+            self.shared = False
+            self._active_state = None
+
+        # Refresh the cached stacks; they rebuild themselves when their layers change
+        _, below_boxes = self.below.refresh(layers[:active_index], canvas_size)
+        _, above_boxes = self.above.refresh(layers[active_index + 1:], canvas_size)
+
+        dirty_tiles = self._active_layer_tiles(active_layer, canvas_size)
+        for box in below_boxes + above_boxes:
+            dirty_tiles |= tiles_in_rect(box, canvas_size, self.tile_size)
+
+        boxes = tile_runs(dirty_tiles, canvas_size, self.tile_size) if dirty_tiles else []
+        if boxes and self.shared:
+            self.image = self.image.copy()
+            self.shared = False
+        for box in boxes:
+            region = self.below.image.crop(box)
+            if active_layer.visible and active_layer.image:
+                offset = (active_layer.x_offset - box[0], active_layer.y_offset - box[1])
+                blend_onto(region, active_layer.apply_opacity(), active_layer.blend_mode, offset)
+            region.alpha_composite(self.above.image.crop(box))
+            self.image.paste(region, box[:2])
+
+        self._active_state = (active_layer, active_layer.stamp, active_layer.bounds)
+        return self.image, boxes
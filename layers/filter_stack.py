@@ -0,0 +1,131 @@
+from tools import operations
+
+
+# Operation name -> (label, function(image, **params), default params).
+# Every operation returns a new image of the same size as its input.
+FILTER_OPS = {
+    "blur": ("Blur", operations.blur, {"radius": 2}),
+    "sharpen": ("Sharpen", operations.sharpen, {}),
+    "edge_detection": ("Edge Detection", operations.edge_detection, {}),
+    "emboss": ("Emboss", operations.emboss, {}),
+    "grayscale": ("Grayscale", operations.grayscale, {}),
+    "sepia": ("Sepia", operations.sepia, {}),
+    "negative": ("Negative", operations.negative, {}),
+    "tint": ("Tint", operations.tint, {"color": (255, 160, 60), "strength": 0.5}),
+    "adjust": ("Brightness/Contrast/Saturation", operations.adjust, {"brightness": 0, "contrast": 0, "saturation": 0}),
+}
+
+
+class FilterNode:
+    """One step of a filter stack: an operation from FILTER_OPS and its parameters"""
+
+    def __init__(self, op, params=None, enabled=True):
+        if op not in FILTER_OPS:
+            raise ValueError(f"Unknown filter: {op}")
+        self.op = op
+        self.params = dict(FILTER_OPS[op][2])
+        if params:
+            self.params.update(params)
+        self.enabled = enabled
+        # (input version, key, output) of the last run
+        self._cache = None
+
+    @property
+    def label(self):
+        return FILTER_OPS[self.op][0]
+
+    @property
+    def key(self):
+        """A value that changes whenever the output of the node for a given input would"""
+        return (self.op, tuple(sorted(self.params.items())))
+
+    def run(self, image):
+        return FILTER_OPS[self.op][1](image, **self.params)
+
+    def copy(self):
+        """Return a node with the same operation and parameters and an empty cache"""
+        return FilterNode(self.op, self.params, self.enabled)
+
+
+class FilterStack:
+    """Ordered filter nodes applied non-destructively on top of a layer's pixels.
+
+    The output of each node is cached against its parameters and the version of its
+    input. The input version of the first node is the version of the source pixels
+    and each later node sees the version of the node before it combined with that
+    node's key, so editing a node reuses the cached outputs of the nodes before it
+    and only recomputes the ones after it.
+    """
+
+    def __init__(self, nodes=None, on_change=None):
+        self.nodes = list(nodes or [])
+        # Called after every change that alters the output of the stack
+        self.on_change = on_change
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __bool__(self):
+        return any(node.enabled for node in self.nodes)
+
+    def add(self, op, **params):
+        """Append a node running op with params and return it"""
+        node = FilterNode(op, params)
+        self.nodes.append(node)
+        self._changed()
+        return node
+
+    def remove(self, index):
+        del self.nodes[index]
+        self._changed()
+
+    def move(self, from_index, to_index):
+        self.nodes.insert(to_index, self.nodes.pop(from_index))
+        self._changed()
+
+    def set_params(self, index, **params):
+        self.nodes[index].params.update(params)
+        self._changed()
+
+    def set_enabled(self, index, enabled):
+        self.nodes[index].enabled = enabled
+        self._changed()
+
+    def clear(self):
+        self.nodes = []
+        self._changed()
+
+    def copy(self):
+        """Return a stack with copies of the nodes and no cached results"""
+        return FilterStack([node.copy() for node in self.nodes])
+
+    def apply(self, image, version):
+        """Return image run through the enabled nodes.
+
+        version identifies the pixels of image: callers pass a new version whenever
+        the pixels change.
+        """
+        for node in self.nodes:
+            if not node.enabled:
+                continue
+
+            key = node.key
+            cached = node._cache
+            if cached is not None and cached[0] == version and cached[1] == key:
+                image = cached[2]
+            else:
+                image = node.run(image)
+                node._cache = (version, key, image)
+            version = (version, key)
+        return image
+
+    def clear_cache(self):
+        for node in self.nodes:
+            node._cache = None
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
@@ -0,0 +1,283 @@
+import atexit
+import os
+import shutil
+import tempfile
+import weakref
+import zlib
+from PIL import Image
+
+from .layer import Layer
+from .compositor import TILE_SIZE, tile_box, tiles_in_rect
+
+
+# Fast compression level used for history tiles that are moved out of raw storage
+COMPRESSION_LEVEL = 1
+
+
+class Tile:
+    """An immutable block of pixel data, shared by every history state that contains it.
+
+    A tile starts out holding raw bytes and can be compressed in memory, then spilled
+    to a file. Reading data always returns the raw bytes whatever the storage.
+    """
+    __slots__ = ('_raw', '_compressed', '_path')
+
+    def __init__(self, data):
+        self._raw = data
+        self._compressed = None
+        self._path = None
+
+    def __del__(self):
+        # Remove the spill file once no history state refers to the tile anymore
+        if self._path is not None:
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+
+    @property
+    def data(self):
+        if self._raw is not None:
+            return self._raw
+        if self._compressed is not None:
+            return zlib.decompress(self._compressed)
+        with open(self._path, 'rb') as f:
+            return zlib.decompress(f.read())
+
+    @property
+    def is_raw(self):
+        return self._raw is not None
+
+    @property
+    def is_spilled(self):
+        return self._path is not None
+
+    @property
+    def nbytes(self):
+        """Bytes of memory held by the tile"""
+        if self._raw is not None:
+            return len(self._raw)
+        if self._compressed is not None:
+            return len(self._compressed)
+        return 0
+
+    @property
+    def disk_bytes(self):
+        """Bytes the tile occupies in its spill file"""
+        return os.path.getsize(self._path) if self._path is not None else 0
+
+    def compress(self):
+        """Replace the raw bytes with a zlib-compressed copy"""
+        if self._raw is not None:
+            self._compressed = zlib.compress(self._raw, COMPRESSION_LEVEL)
+            self._raw = None
+
+    def spill(self, directory):
+        """Move the compressed bytes out of memory into a file in directory"""
+        self.compress()
+        if self._compressed is None:
+            return
+        fd, path = tempfile.mkstemp(suffix='.tile', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._compressed)
+        except OSError:
+            # The tile stays compressed in memory
+            os.remove(path)
+            raise
+        self._path = path
+        self._compressed = None
+
+
+class LayerSnapshot:
+    """The properties and tiled pixels of a layer at one point in history"""
+
+    def __init__(self, layer, tiles, tile_size, source=None):
+        self.name = layer.name
+        self.visible = layer.visible
+        self.opacity = layer.opacity
+        self.blend_mode = layer.blend_mode
+        self.x_offset = layer.x_offset
+        self.y_offset = layer.y_offset
+        self.mask = layer.mask.copy() if layer.mask else None
+        self.filters = layer.filters.copy()
+        self.tile_size = tile_size
+
+        # Pixels not loaded from a project file yet stay there, shared with the layer
+        self.source = source
+        if source is not None:
+            self.mode = source.mode
+            self.size = source.size
+            self.palette = None
+        else:
+            image = layer.image
+            self.mode = image.mode if image else None
+            self.size = image.size if image else None
+            self.palette = image.getpalette() if image and image.mode == 'P' else None
+        # (column, row) -> Tile
+        self.tiles = tiles
+
+    def to_image(self):
+        """Reassemble the full image from the tiles"""
+        if self.mode is None:
+            return None
+
+        image = Image.new(self.mode, self.size)
+        for tile, block in self.tiles.items():
+            box = tile_box(tile, self.size, self.tile_size)
+            image.paste(Image.frombytes(self.mode, (box[2] - box[0], box[3] - box[1]), block.data), box[:2])
+
+        if self.palette is not None:
+            image.putpalette(self.palette)
+        return image
+
+    def to_layer(self):
+        """Create a new Layer holding this snapshot's image and properties"""
+        layer = Layer(
+            image=self.to_image() if self.source is None else None,
+            name=self.name,
+            visible=self.visible,
+            opacity=self.opacity,
+            blend_mode=self.blend_mode
+        )
+        layer.x_offset = self.x_offset
+        layer.y_offset = self.y_offset
+        layer.mask = self.mask.copy() if self.mask else None
+        layer.filters = self.filters.copy()
+        if self.source is not None:
+            layer.set_image_source(self.source)
+        return layer
+
+
+class HistoryStore:
+    """Builds undo/redo states whose layer pixels live in copy-on-write tiles.
+
+    Each snapshot shares every tile that has not changed since the previous snapshot
+    of the same layer, so a state only costs memory for the tiles that were edited.
+    """
+
+    def __init__(self, tile_size=TILE_SIZE, budget=None):
+        self.tile_size = tile_size
+        # Bytes of memory the history may hold before older states are compressed
+        # and then spilled to disk, or None for no limit
+        self.budget = budget
+        self._spill_dir = None
+        # Layer -> (pixel stamp, LayerSnapshot) for the most recent snapshot of each live layer
+        self._latest = weakref.WeakKeyDictionary()
+
+    def snapshot(self, layers, active_index):
+        """Capture the layer stack as a history state"""
+        return {
+            'layers': [self._snapshot_layer(layer) for layer in layers],
+            'active_index': active_index
+        }
+
+    def restore(self, state):
+        """Return fresh (layers, active_index) built from a history state"""
+        layers = []
+        for snapshot in state['layers']:
+            layer = snapshot.to_layer()
+            # Later snapshots of the restored layer can share the tiles it came from
+            self._latest[layer] = (layer.pixel_stamp, snapshot)
+            layers.append(layer)
+        return layers, state['active_index']
+
+    def _encode_tile(self, image, box):
+        return Tile(image.crop(box).tobytes())
+
+    def _snapshot_layer(self, layer):
+        if layer.image_source is not None:
+            # The pixels have not been loaded, so the snapshot refers to their source.
+            # Once they are, the next snapshot of the layer encodes every tile.
+            self._latest.pop(layer, None)
+            return LayerSnapshot(layer, {}, self.tile_size, layer.image_source)
+
+        image = layer.image
+        previous = self._latest.get(layer)
+        tiles = {}
+
+        if image:
+            reusable = previous is not None and previous[1].source is None and \
+                previous[1].mode == image.mode and previous[1].size == image.size
+            previous_tiles = previous[1].tiles if reusable else {}
+            rects = layer.pixel_rects_since(previous[0]) if reusable else None
+
+            if rects is not None:
+                # Only re-encode the tiles touched by in-place edits since the last snapshot
+                tiles = dict(previous_tiles)
+                changed = set()
+                for rect in rects:
+                    changed |= tiles_in_rect(rect, image.size, self.tile_size)
+                for tile in changed:
+                    tiles[tile] = self._encode_tile(image, tile_box(tile, image.size, self.tile_size))
+            else:
+                # The whole image was replaced; keep sharing tiles whose pixels are identical
+                for tile in tiles_in_rect((0, 0) + image.size, image.size, self.tile_size):
+                    block = self._encode_tile(image, tile_box(tile, image.size, self.tile_size))
+                    old_block = previous_tiles.get(tile)
+                    tiles[tile] = old_block if old_block is not None and old_block.data == block.data else block
+
+        snapshot = LayerSnapshot(layer, tiles, self.tile_size)
+        self._latest[layer] = (layer.pixel_stamp, snapshot)
+        return snapshot
+
+    def _unique_tiles(self, states):
+        """Yield each tile held by states once, in the order of the states"""
+        seen = set()
+        for state in states:
+            for snapshot in state['layers']:
+                for block in snapshot.tiles.values():
+                    if id(block) not in seen:
+                        seen.add(id(block))
+                        yield block
+
+    def memory_usage(self, states):
+        """Return the number of bytes of pixel data held in memory by states, counting shared tiles once"""
+        return sum(block.nbytes for block in self._unique_tiles(states))
+
+    def disk_usage(self, states):
+        """Return the number of bytes of pixel data states have spilled to disk"""
+        return sum(block.disk_bytes for block in self._unique_tiles(states))
+
+    def enforce_budget(self, states, current_index):
+        """Shrink the memory held by states until it fits the budget.
+
+        States furthest from current_index are handled first: their tiles are
+        compressed, and if that is not enough, spilled to the temporary directory.
+        Tiles shared with states near the current one are moved last.
+        Raises OSError if tiles cannot be spilled; the ones not spilled yet stay
+        in memory.
+        """
+        if not self.budget:
+            return
+
+        usage = self.memory_usage(states)
+        if usage <= self.budget:
+            return
+
+        order = sorted(range(len(states)), key=lambda i: abs(i - current_index), reverse=True)
+        ordered_states = [states[i] for i in order]
+
+        for block in self._unique_tiles(ordered_states):
+            if block.is_raw:
+                before = block.nbytes
+                block.compress()
+                usage -= before - block.nbytes
+                if usage <= self.budget:
+                    return
+
+        spill_dir = self._get_spill_dir()
+        for block in self._unique_tiles(ordered_states):
+            if not block.is_spilled:
+                before = block.nbytes
+                block.spill(spill_dir)
+                usage -= before
+                if usage <= self.budget:
+                    return
+
+    def _get_spill_dir(self):
+        """Create the temporary directory for spilled tiles on first use"""
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='photoshop-history-')
+            atexit.register(shutil.rmtree, self._spill_dir, True)
+        return self._spill_dir
@@ -1,7 +1,24 @@
 from PIL import Image
+from .filter_stack import FilterStack
+
+# Partial edits remembered per layer before they are collapsed into a full change
+MAX_DIRTY_RECTS = 256
 
 class Layer:
     def __init__(self, image=None, name="New Layer", visible=True, opacity=100, blend_mode="Normal"):
+        # Change tracking: the revision is bumped whenever the whole layer changes,
+        # the pixel revision when its whole image changes, and the edit serial on
+        # every change including partial edits of the image
+        self.revision = 0
+        self.pixel_revision = 0
+        self.edit_serial = 0
+        self._dirty_log = []  # (edit_serial, rect) for partial edits since the last pixel revision
+        # Cached display version of the image with opacity applied
+        self._opacity_cache = None
+        # Non-destructive filters applied on top of the image
+        self._filters = FilterStack(on_change=self._filters_changed)
+        # Where the pixels come from until they are first used, see set_image_source()
+        self._image_source = None
         # The actual image data (PIL Image)
         self.image = image
         # Layer properties
@@ -14,27 +31,235 @@ class Layer:
         self.y_offset = 0
         # Layer mask (optional)
         self.mask = None
-        
+
+    @property
+    def image(self):
+        if self._image_source is not None:
+            # Decode pixels that were left in a project file until now
+            source, self._image_source = self._image_source, None
+            self._image = source.load()
+        return self._image
+
+    @image.setter
+    def image(self, image):
+        self._image_source = None
+        self._image = image
+        self._changed()
+
+    @property
+    def image_source(self):
+        """The source the pixels will be loaded from, or None once they are in memory"""
+        return self._image_source
+
+    def set_image_source(self, source):
+        """Take the pixels from source, loaded on first use of the image.
+
+        source has the mode and size of the image and a load() method returning it.
+        Until then the layer can be listed, moved and composited as hidden without
+        reading its pixels.
+        """
+        self._image = None
+        self._image_source = source
+        self._changed()
+
+    @property
+    def image_size(self):
+        """The size of the image, known without loading it, or None if there is no image"""
+        if self._image_source is not None:
+            return self._image_source.size
+        return self._image.size if self._image else None
+
+    @property
+    def filters(self):
+        return self._filters
+
+    @filters.setter
+    def filters(self, filters):
+        self._filters = filters
+        filters.on_change = self._filters_changed
+        self._filters_changed()
+
+    @property
+    def output_image(self):
+        """The image with the filter stack applied, as it is composited"""
+        if not self.image or not self._filters:
+            return self.image
+        return self._filters.apply(self.image, self.pixel_version)
+
+    @property
+    def opacity(self):
+        return self._opacity
+
+    @opacity.setter
+    def opacity(self, opacity):
+        self._opacity = opacity
+        self._opacity_cache = None
+        self._changed(pixels=False)
+
+    @property
+    def visible(self):
+        return self._visible
+
+    @visible.setter
+    def visible(self, visible):
+        self._visible = visible
+        self._changed(pixels=False)
+
+    @property
+    def blend_mode(self):
+        return self._blend_mode
+
+    @blend_mode.setter
+    def blend_mode(self, blend_mode):
+        self._blend_mode = blend_mode
+        self._changed(pixels=False)
+
+    @property
+    def x_offset(self):
+        return self._x_offset
+
+    @x_offset.setter
+    def x_offset(self, x_offset):
+        self._x_offset = x_offset
+        self._changed(pixels=False)
+
+    @property
+    def y_offset(self):
+        return self._y_offset
+
+    @y_offset.setter
+    def y_offset(self, y_offset):
+        self._y_offset = y_offset
+        self._changed(pixels=False)
+
+    @property
+    def stamp(self):
+        """A token identifying the current state of the layer, see dirty_rects_since()"""
+        return (self.revision, self.edit_serial)
+
+    @property
+    def pixel_stamp(self):
+        """A token identifying the current pixels of the layer, see pixel_rects_since()"""
+        return (self.pixel_revision, self.edit_serial)
+
+    @property
+    def pixel_version(self):
+        """A token that changes only when the pixels of the layer change"""
+        return (self.pixel_revision, self._dirty_log[-1][0] if self._dirty_log else 0)
+
+    @property
+    def bounds(self):
+        """The area covered by the layer in canvas coordinates, or None if it has no image"""
+        size = self.image_size
+        if size is None:
+            return None
+        return (self.x_offset, self.y_offset, self.x_offset + size[0], self.y_offset + size[1])
+
+    def _changed(self, pixels=True):
+        """Record a change affecting the whole layer, either its pixels or only its properties"""
+        self.revision += 1
+        self.edit_serial += 1
+        if pixels:
+            self.pixel_revision += 1
+            self._dirty_log = []
+            self._opacity_cache = None
+
+    def _filters_changed(self):
+        """Record that the filter stack changed, which changes the output but not the pixels"""
+        self._opacity_cache = None
+        self._changed(pixels=False)
+
+    def mark_dirty(self, rect=None):
+        """Record that the image was modified in place, optionally only inside rect.
+
+        rect is (left, upper, right, lower) in layer image coordinates.
+        """
+        if rect is None or len(self._dirty_log) >= MAX_DIRTY_RECTS:
+            self._changed()
+            return
+
+        self.edit_serial += 1
+        self._dirty_log.append((self.edit_serial, rect))
+
+        if self._filters:
+            # Filters can spread the edit anywhere in the output, so the whole layer
+            # is redrawn while history still only re-encodes the edited pixels
+            self.revision += 1
+            self._opacity_cache = None
+            return
+
+        # Refresh only the edited part of the cached display image
+        if self._opacity_cache is not None:
+            region = self._scale_alpha(self.image.crop(rect), self.opacity)
+            self._opacity_cache.paste(region, rect[:2])
+
+    def dirty_rects_since(self, stamp):
+        """Return the rects edited after stamp, or None if the whole layer has changed since"""
+        revision, edit_serial = stamp
+        if revision != self.revision:
+            return None
+        return [rect for serial, rect in self._dirty_log if serial > edit_serial]
+
+    def pixel_rects_since(self, pixel_stamp):
+        """Return the rects edited after pixel_stamp, or None if the whole image has changed since"""
+        pixel_revision, edit_serial = pixel_stamp
+        if pixel_revision != self.pixel_revision:
+            return None
+        return [rect for serial, rect in self._dirty_log if serial > edit_serial]
+
+    def thumbnail(self, size):
+        """Return a copy of the filtered image scaled down to fit size.
+
+        A preview kept by the image source is used while the pixels are not loaded,
+        and None is returned if the source has none yet rather than loading them.
+        """
+        source = self._image_source
+        if source is not None:
+            if getattr(source, 'thumbnail', None) is None:
+                return None
+            thumb = source.thumbnail.copy()
+            thumb.thumbnail(size)
+            return thumb
+
+        # Scaled straight from the image rather than from a full size copy of it
+        image = self.output_image
+        scale = min(1.0, size[0] / image.width, size[1] / image.height)
+        thumb_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        return image.resize(thumb_size, Image.BICUBIC, reducing_gap=2.0)
+
     def resize(self, width, height):
         """Resize the layer's image"""
         if self.image:
             self.image = self.image.resize((width, height), Image.LANCZOS)
-            
+
     def apply_opacity(self):
-        """Apply the opacity setting to create a display version of the image"""
-        if not self.image or self.opacity == 100:
-            return self.image
-            
+        """Apply the opacity setting to create an RGBA display version of the filtered image"""
+        image = self.output_image
+        if not image or (self.opacity == 100 and image.mode == 'RGBA'):
+            return image
+
+        # Reuse the cached version until the image, filters or opacity change
+        if self._opacity_cache is None:
+            self._opacity_cache = self._scale_alpha(image, self.opacity)
+
+        return self._opacity_cache
+
+    @staticmethod
+    def _scale_alpha(image, opacity):
+        """Return an RGBA copy of image with its alpha band scaled by opacity (0-100)"""
         # Create a copy with alpha channel
-        if self.image.mode != 'RGBA':
-            img_with_alpha = self.image.convert('RGBA')
+        if image.mode != 'RGBA':
+            img_with_alpha = image.convert('RGBA')
         else:
-            img_with_alpha = self.image.copy()
-            
-        # Apply opacity
-        alpha_factor = self.opacity / 100
-        data = list(img_with_alpha.getdata())
-        new_data = [(r, g, b, int(a * alpha_factor)) for r, g, b, a in data]
-        img_with_alpha.putdata(new_data)
-        
+            img_with_alpha = image.copy()
+
+        if opacity == 100:
+            return img_with_alpha
+
+        # Scale the alpha band through a lookup table in a single pass
+        alpha_factor = opacity / 100
+        alpha_table = [int(a * alpha_factor) for a in range(256)]
+        alpha = img_with_alpha.getchannel('A').point(alpha_table)
+        img_with_alpha.putalpha(alpha)
+
         return img_with_alpha
@@ -1,5 +1,8 @@
 from PIL import Image
 from .layer import Layer
+from .blend_modes import blend_onto, composite_layers
+from .compositor import ActiveLayerCompositor, TileCompositor
+from utils.image_pyramid import ImagePyramid
 
 class LayerManager:
     def __init__(self, editor):
@@ -7,6 +10,13 @@ class LayerManager:
         self.layers = []  # The layer stack (bottom to top)
         self.active_layer_index = -1  # Index of the currently selected layer
         self.canvas_size = (800, 600)  # Default size
+        # Flattened composite, refreshed one dirty tile at a time. While the layers
+        # above the active one are all Normal, the stacks below and above it are
+        # cached separately so edits to the active layer only blend three images.
+        self._compositor = TileCompositor()
+        # Downscaled levels of the composite for zoomed-out display, refreshed
+        # from the same dirty boxes as the composite itself
+        self.pyramid = ImagePyramid()
         
     def create_new_document(self, width, height, bg_color="white"):
         """Create a new document with a background layer"""
@@ -83,6 +93,7 @@ class LayerManager:
             opacity=source_layer.opacity,
             blend_mode=source_layer.blend_mode
         )
+        new_layer.filters = source_layer.filters.copy()
         
         # Insert after the source layer
         self.layers.insert(index + 1, new_layer)
@@ -103,18 +114,19 @@ class LayerManager:
         bottom_layer = self.layers[index1]
         top_layer = self.layers[index2]
         
-        # Create a new image for the merged result
-        if bottom_layer.image.mode != 'RGBA':
-            merged_image = bottom_layer.image.convert('RGBA')
+        # Create a new image for the merged result, with the filters of the bottom layer applied
+        bottom_image = bottom_layer.output_image
+        if bottom_image.mode != 'RGBA':
+            merged_image = bottom_image.convert('RGBA')
         else:
-            merged_image = bottom_layer.image.copy()
+            merged_image = bottom_image.copy()
             
-        # Apply the top layer with its opacity
+        # Apply the top layer with its opacity and blend mode
         if top_layer.visible and top_layer.image:
             top_image = top_layer.apply_opacity()
             if top_image:
                 # Composite the images
-                merged_image.paste(top_image, (top_layer.x_offset, top_layer.y_offset), top_image)
+                blend_onto(merged_image, top_image, top_layer.blend_mode, (top_layer.x_offset, top_layer.y_offset))
                 
         # Create a new layer with the merged result
         merged_layer = Layer(
@@ -145,16 +157,9 @@ class LayerManager:
         if not self.layers:
             return None
             
-        # Start with a blank image
-        flattened = Image.new("RGBA", self.canvas_size, (0, 0, 0, 0))
-        
         # Composite all visible layers
-        for layer in self.layers:
-            if layer.visible and layer.image:
-                layer_image = layer.apply_opacity()
-                if layer_image:
-                    flattened.paste(layer_image, (layer.x_offset, layer.y_offset), layer_image)
-                    
+        flattened = composite_layers(self.layers, self.canvas_size)
+        
         # Create a new background layer
         bg_layer = Layer(flattened.convert("RGB"), name="Flattened Image")
         
@@ -165,21 +170,74 @@ class LayerManager:
         
         return flattened
         
+    def edit_layer_filters(self, change, record=True):
+        """Call change(filters) on the filter stack of the active layer and redraw.
+        
+        Only the nodes from the first changed one onwards are recomputed; the cached
+        outputs of the nodes before it are reused. Returns the result of change.
+        """
+        if self.active_layer_index < 0 or self.active_layer_index >= len(self.layers):
+            return None
+        
+        # Add current state to history before making changes
+        if record and hasattr(self.editor, 'push_to_history'):
+            self.editor.push_to_history()
+        
+        result = change(self.layers[self.active_layer_index].filters)
+        self.update_layer_ui()
+        return result
+    
+    def apply_layer_filters(self):
+        """Bake the filter stack of the active layer into its pixels and clear the stack"""
+        if self.active_layer_index < 0 or self.active_layer_index >= len(self.layers):
+            return
+        
+        layer = self.layers[self.active_layer_index]
+        if not layer.filters:
+            return
+        
+        if hasattr(self.editor, 'push_to_history'):
+            self.editor.push_to_history()
+        layer.image = layer.output_image
+        layer.filters.clear()
+        self.update_layer_ui()
+        
     def get_composite_image(self):
-        """Get a composite of all visible layers for display"""
+        """Get a composite of all visible layers for display.
+        
+        Only the tiles touched by layer changes since the previous call are re-blended.
+        The returned image is shared with the layer manager and updated in place,
+        so copy it before modifying it.
+        """
         if not self.layers:
             return None
             
-        # Start with a blank image
-        composite = Image.new("RGBA", self.canvas_size, (0, 0, 0, 0))
+        # An image handed out by get_composite_snapshot() is copied rather than updated
+        shared = self._compositor.image if self._compositor.shared else None
         
-        # Composite all visible layers
-        for layer in self.layers:
-            if layer.visible and layer.image:
-                layer_image = layer.apply_opacity()
-                if layer_image:
-                    composite.paste(layer_image, (layer.x_offset, layer.y_offset), layer_image)
-                    
+        if ActiveLayerCompositor.can_composite(self.layers, self.active_layer_index):
+            if not isinstance(self._compositor, ActiveLayerCompositor):
+                self._compositor = ActiveLayerCompositor()
+            composite, boxes = self._compositor.refresh(self.layers, self.active_layer_index, self.canvas_size)
+        else:
+            if not isinstance(self._compositor, TileCompositor):
+                self._compositor = TileCompositor()
+            composite, boxes = self._compositor.refresh(self.layers, self.canvas_size)
+        
+        if shared is not None and composite is not shared and composite.size == shared.size:
+            # Only the boxes differ from the image the pyramid was built from
+            self.pyramid.rebase(composite)
+        self.pyramid.update(composite, boxes)
+        return composite
+    
+    def get_composite_snapshot(self):
+        """Get the composite as it is now, to be read off the main thread.
+        
+        Unlike get_composite_image(), later edits leave the returned image as it is.
+        """
+        composite = self.get_composite_image()
+        if composite is not None:
+            self._compositor.share()
         return composite
         
     def update_layer_ui(self):
@@ -194,6 +252,19 @@ class LayerManager:
             self.editor.current_image = composite
             self.editor.display_image_on_canvas()
 
+    def update_composite(self, interactive=False):
+        """Redraw the canvas after a layer property change without rebuilding the layer panel"""
+        if interactive and hasattr(self.editor, 'request_render'):
+            # Recomposite once per burst of changes, when the canvas is next drawn
+            self.editor.composite_outdated = True
+            self.editor.request_render()
+            return
+            
+        composite = self.get_composite_image()
+        if composite and hasattr(self.editor, 'display_image_on_canvas'):
+            self.editor.current_image = composite
+            self.editor.display_image_on_canvas()
+
     def clear_layers(self):
         """Remove all layers from the layer manager"""
         # Store the current canvas size before clearing
@@ -0,0 +1,436 @@
+import json
+import os
+import struct
+import threading
+import weakref
+import zlib
+from PIL import Image
+
+from .compositor import TILE_SIZE, tile_box, tiles_in_rect
+from .filter_stack import FilterNode, FilterStack
+from .layer import Layer
+
+PROJECT_EXTENSION = '.mie'
+MAGIC = b'MIEPROJ\x00'
+FORMAT_VERSION = 1
+# Magic, format version, offset and length of the current index
+HEADER = struct.Struct('<8sIQQ')
+
+COMPRESSION_LEVEL = 6
+# Largest size of the layer previews stored for the layer panel
+THUMBNAIL_SIZE = (64, 64)
+# Saving to the same file rewrites it from scratch once less than this fraction of it
+# is still in use, and it is at least COMPACT_MIN_BYTES long
+COMPACT_RATIO = 0.5
+COMPACT_MIN_BYTES = 4 * 1024 * 1024
+
+
+class StoredImage:
+    """An image kept as compressed tiles in a project file, decoded when load() is called.
+
+    The tiles are never modified once written, so a StoredImage can be shared by a
+    layer and its history states. Tiles that are all zero are not stored.
+    """
+
+    def __init__(self, project, mode, size, tiles, tile_size=TILE_SIZE, palette=None, thumbnail=None):
+        self.project = project
+        self.mode = mode
+        self.size = size
+        # (column, row) -> (offset, length) of the compressed tile in the file
+        self.tiles = tiles
+        self.tile_size = tile_size
+        self.palette = palette
+        # Preview shown by the layer panel before the image is loaded
+        self.thumbnail = thumbnail
+        project._stored.add(self)
+
+    def load(self):
+        """Decode the tiles into a new image"""
+        image = Image.new(self.mode, self.size)
+        # The file may be compacted by a save on another thread, which moves the tiles
+        with self.project._lock:
+            for tile, (offset, length) in self.tiles.items():
+                box = tile_box(tile, self.size, self.tile_size)
+                data = self.project.read_chunk(offset, length)
+                image.paste(Image.frombytes(self.mode, (box[2] - box[0], box[3] - box[1]), data), box[:2])
+        if self.palette is not None:
+            image.putpalette(self.palette)
+        return image
+
+    def read_raw(self, tile):
+        """Return the compressed bytes of tile, wherever the file keeps it now"""
+        with self.project._lock:
+            offset, length = self.tiles[tile]
+            return self.project._read_raw(offset, length)
+
+
+class ProjectFile:
+    """A layered document on disk: compressed tiles appended one after another, then an index.
+
+    The index lists the layers with their properties, filters and the location of
+    each tile of their image, mask and thumbnail. The header at the start of the
+    file points at the current index. Saving appends only the tiles that changed
+    since the last save and a new index, then updates the header, so a save that
+    is interrupted part way leaves the previous one readable.
+
+    Saving happens in three steps so the slow part can run off the main thread:
+    prepare_save() copies the changed tiles out of the layers, write() compresses
+    and writes them, and finish_save() records what was saved.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._file = None
+        # Layer -> what the last save wrote for it, see _saved_entry()
+        self._saved = weakref.WeakKeyDictionary()
+        # Every StoredImage reading from this file, moved along when it is compacted
+        self._stored = weakref.WeakSet()
+
+    # Reading
+
+    @classmethod
+    def open(cls, path):
+        """Read the index of the project at path and return (project, layers, canvas_size, active_index).
+
+        Only the index, the masks and the layer thumbnails are read. The pixels of each
+        layer stay in the file until the layer needs them.
+        """
+        project = cls(path)
+        project._file = open(path, 'rb')
+        try:
+            index = project._read_index()
+            layers = [project._layer_from_entry(entry) for entry in index['layers']]
+        except Exception:
+            project.close()
+            raise
+        return project, layers, tuple(index['canvas_size']), index['active_index']
+
+    def _read_index(self):
+        header = self._file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError("Not a project file")
+        magic, version, offset, length = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError("Not a project file")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"The project was saved by a newer version (format {version})")
+        return json.loads(self.read_chunk(offset, length))
+
+    def read_chunk(self, offset, length):
+        """Return the decompressed bytes of the chunk at offset"""
+        return zlib.decompress(self._read_raw(offset, length))
+
+    def _read_raw(self, offset, length):
+        with self._lock:
+            self._file.seek(offset)
+            data = self._file.read(length)
+        if len(data) != length:
+            raise ValueError("The project file is truncated")
+        return data
+
+    def _layer_from_entry(self, entry):
+        layer = Layer(
+            name=entry['name'],
+            visible=entry['visible'],
+            opacity=entry['opacity'],
+            blend_mode=entry['blend_mode']
+        )
+        layer.x_offset = entry['x_offset']
+        layer.y_offset = entry['y_offset']
+        layer.filters = FilterStack([FilterNode(node['op'], node['params'], node['enabled'])
+                                     for node in entry['filters']])
+
+        mask = self._stored_image(entry['mask'])
+        layer.mask = mask.load() if mask else None
+        thumbnail = self._stored_image(entry['thumbnail'])
+        image = self._stored_image(entry['image'])
+        if image is not None:
+            image.thumbnail = thumbnail.load() if thumbnail else None
+            layer.set_image_source(image)
+
+        self._saved[layer] = self._saved_entry(layer, entry)
+        return layer
+
+    def _stored_image(self, entry):
+        if entry is None:
+            return None
+        tiles = {(column, row): (offset, length) for column, row, offset, length in entry['tiles']}
+        return StoredImage(self, entry['mode'], tuple(entry['size']), tiles,
+                           entry['tile_size'], entry.get('palette'))
+
+    # Saving
+
+    def _saved_entry(self, layer, entry):
+        """What is saved for layer: its stamps, the mask checksum and its index entry"""
+        mask = layer.mask
+        return {
+            'stamp': layer.stamp,
+            'pixel_stamp': layer.pixel_stamp,
+            'mask_crc': zlib.crc32(mask.tobytes()) if mask else None,
+            'entry': entry
+        }
+
+    def prepare_save(self, layers, canvas_size, active_index):
+        """Collect what has to be written to save layers, on the main thread.
+
+        Only the tiles edited since the last save of each layer are copied out of its
+        image. Layers whose pixels were never loaded are saved from their tiles in
+        the file without decoding them.
+        """
+        plan = {
+            'canvas_size': list(canvas_size),
+            'active_index': active_index,
+            'layers': [],
+        }
+        for layer in layers:
+            saved = self._saved.get(layer)
+            # The state being saved, before any edits made while the plan is written
+            record = self._saved_entry(layer, None)
+            entry = {
+                'name': layer.name,
+                'visible': layer.visible,
+                'opacity': layer.opacity,
+                'blend_mode': layer.blend_mode,
+                'x_offset': layer.x_offset,
+                'y_offset': layer.y_offset,
+                'filters': [{'op': node.op, 'params': dict(node.params), 'enabled': node.enabled}
+                            for node in layer.filters],
+                'image': self._plan_image(layer, saved),
+                'mask': self._plan_mask(layer, saved, record),
+                'thumbnail': self._plan_thumbnail(layer, saved),
+            }
+            plan['layers'].append((layer, entry, record))
+        return plan
+
+    def _plan_image(self, layer, saved):
+        previous = saved['entry']['image'] if saved else None
+        rects = layer.pixel_rects_since(saved['pixel_stamp']) if previous is not None else None
+        if rects == []:
+            # The pixels are as saved, whether they were loaded since or not
+            return self._reused_entry(previous)
+
+        source = layer.image_source
+        if isinstance(source, StoredImage):
+            if source.project is self:
+                return self._image_entry(source.mode, source.size, source.tile_size, source.palette,
+                                         dict(source.tiles))
+            # Copy the compressed tiles over from the other file, see write()
+            return self._image_entry(source.mode, source.size, source.tile_size, source.palette,
+                                     {tile: source for tile in source.tiles})
+        if source is not None:
+            # Other sources are loaded while the plan is written, leaving the layer as it is
+            return self._image_entry(source.mode, source.size, TILE_SIZE, None,
+                                     {tile: source for tile in tiles_in_rect((0, 0) + source.size, source.size)})
+
+        image = layer.image
+        if not image:
+            return None
+
+        if rects is not None and (previous['mode'] != image.mode or tuple(previous['size']) != image.size):
+            rects = None
+
+        if rects is None:
+            changed = tiles_in_rect((0, 0) + image.size, image.size)
+            tiles = {}
+        else:
+            changed = set()
+            for rect in rects:
+                changed |= tiles_in_rect(rect, image.size)
+            tiles = self._reused_entry(previous)['tiles']
+
+        for tile in changed:
+            tiles[tile] = image.crop(tile_box(tile, image.size)).tobytes()
+        palette = image.getpalette() if image.mode == 'P' else None
+        return self._image_entry(image.mode, image.size, TILE_SIZE, palette, tiles)
+
+    def _plan_mask(self, layer, saved, record):
+        mask = layer.mask
+        if mask is None:
+            return None
+        if saved and saved['entry']['mask'] is not None and saved['mask_crc'] == record['mask_crc']:
+            return self._reused_entry(saved['entry']['mask'])
+        tiles = {tile: mask.crop(tile_box(tile, mask.size)).tobytes()
+                 for tile in tiles_in_rect((0, 0) + mask.size, mask.size)}
+        return self._image_entry(mask.mode, mask.size, TILE_SIZE, None, tiles)
+
+    def _plan_thumbnail(self, layer, saved):
+        if layer.image_size is None:
+            return None
+        # Any change of the layer may change how it looks
+        if saved and saved['stamp'] == layer.stamp and saved['entry']['thumbnail'] is not None:
+            return self._reused_entry(saved['entry']['thumbnail'])
+        thumbnail = layer.thumbnail(THUMBNAIL_SIZE)
+        if thumbnail is None:
+            return None
+        thumbnail = thumbnail.convert('RGBA')
+        return self._image_entry('RGBA', thumbnail.size, max(thumbnail.size), None,
+                                 {(0, 0): thumbnail.tobytes()})
+
+    @staticmethod
+    def _reused_entry(entry):
+        """A planned copy of a saved index entry, keeping all of its tiles"""
+        tiles = {(column, row): (offset, length) for column, row, offset, length in entry['tiles']}
+        return dict(entry, tiles=tiles)
+
+    @staticmethod
+    def _image_entry(mode, size, tile_size, palette, tiles):
+        """An index entry whose tiles are still being planned, see _write_tiles()"""
+        return {'mode': mode, 'size': list(size), 'tile_size': tile_size, 'palette': palette, 'tiles': tiles}
+
+    def write(self, plan):
+        """Write the tiles and index of a plan from prepare_save(); safe to run off the main thread"""
+        # Tiles of other files are read before taking the lock of this one, so two files
+        # saved at the same time never wait on each other
+        for _, entry, _ in plan['layers']:
+            image = entry['image']
+            if image is not None:
+                loaded = {}
+                for tile, value in image['tiles'].items():
+                    if isinstance(value, StoredImage):
+                        image['tiles'][tile] = (value.read_raw(tile),)
+                    elif not isinstance(value, (bytes, tuple)):
+                        # A layer whose pixels come from another kind of source, loaded once
+                        if value not in loaded:
+                            loaded[value] = value.load()
+                        image['tiles'][tile] = loaded[value].crop(tile_box(tile, value.size)).tobytes()
+        with self._lock:
+            if self._file is not None and self._should_compact(plan):
+                self._rewrite(plan)
+            else:
+                self._append(plan)
+
+    def finish_save(self, plan):
+        """Record what a written plan saved, on the main thread"""
+        for layer, entry, record in plan['layers']:
+            record['entry'] = entry
+            self._saved[layer] = record
+
+    def save(self, layers, canvas_size, active_index):
+        """Save layers in one go"""
+        plan = self.prepare_save(layers, canvas_size, active_index)
+        self.write(plan)
+        self.finish_save(plan)
+
+    def _append(self, plan):
+        """Add the new tiles and index at the end of the file and point the header at them"""
+        new_file = self._file is None
+        with open(self.path, 'w+b' if new_file else 'r+b') as f:
+            if new_file:
+                f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, 0))
+            f.seek(0, os.SEEK_END)
+            self._write_plan(f, plan, None)
+        if new_file:
+            self._file = open(self.path, 'rb')
+
+    def _write_plan(self, f, plan, relocated):
+        """Write the planned tiles and then the index at the end of f, and point the header at it.
+
+        relocated is None when f is this file, see _write_tiles().
+        """
+        layers = []
+        for _, entry, _ in plan['layers']:
+            for key in ('image', 'mask', 'thumbnail'):
+                if entry[key] is not None:
+                    entry[key] = dict(entry[key], tiles=self._write_tiles(f, entry[key]['tiles'], relocated))
+            layers.append(entry)
+
+        index = zlib.compress(json.dumps({
+            'version': FORMAT_VERSION,
+            'canvas_size': plan['canvas_size'],
+            'active_index': plan['active_index'],
+            'layers': layers,
+        }).encode('utf-8'), COMPRESSION_LEVEL)
+        index_offset = f.tell()
+        f.write(index)
+        f.flush()
+        os.fsync(f.fileno())
+
+        # Only now that the data is on disk does the header move to the new index
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, index_offset, len(index)))
+        f.flush()
+        os.fsync(f.fileno())
+
+    def _write_tiles(self, f, tiles, relocated):
+        """Write the tiles that are not in f yet and return them as [column, row, offset, length].
+
+        Tiles already in this file keep their place when f is this file, that is when
+        relocated is None. Otherwise they are copied into f and relocated maps their
+        old offsets to the new ones.
+        """
+        written = []
+        for (column, row), tile in sorted(tiles.items()):
+            if isinstance(tile, bytes):
+                # Tiles left all zero match the blank image they are loaded into
+                if not tile.strip(b'\0'):
+                    continue
+                data = zlib.compress(tile, COMPRESSION_LEVEL)
+            elif len(tile) == 1:
+                # The compressed bytes of a tile of another project
+                data, = tile
+            else:
+                offset, length = tile
+                if relocated is None:
+                    written.append([column, row, offset, length])
+                    continue
+                if offset not in relocated:
+                    relocated[offset] = f.tell()
+                    f.write(self._read_raw(offset, length))
+                written.append([column, row, relocated[offset], length])
+                continue
+            written.append([column, row, f.tell(), len(data)])
+            f.write(data)
+        return written
+
+    def _should_compact(self, plan):
+        """Whether little enough of the file is still in use that it should be rewritten"""
+        file_size = os.path.getsize(self.path)
+        if file_size < COMPACT_MIN_BYTES:
+            return False
+        in_use = {}
+        for tiles in self._tiles_in_use(plan):
+            for offset, length in tiles:
+                in_use[offset] = length
+        return sum(in_use.values()) < COMPACT_RATIO * file_size
+
+    def _tiles_in_use(self, plan):
+        """Yield lists of (offset, length) of the tiles of this file still needed after the plan"""
+        for _, entry, _ in plan['layers']:
+            for key in ('image', 'mask', 'thumbnail'):
+                if entry[key] is not None:
+                    yield [tile for tile in entry[key]['tiles'].values()
+                           if isinstance(tile, tuple) and len(tile) == 2]
+        # Images not loaded yet, including those only held by undo history
+        for stored in list(self._stored):
+            yield list(stored.tiles.values())
+
+    def _rewrite(self, plan):
+        """Save the plan into a new file holding only the tiles still in use, then replace this one"""
+        temp_path = self.path + '.tmp'
+        relocated = {}
+        with open(temp_path, 'w+b') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, 0))
+            # The tiles of images not loaded yet go first, so they can be moved along
+            stored_images = list(self._stored)
+            for stored in stored_images:
+                for offset, length in stored.tiles.values():
+                    if offset not in relocated:
+                        relocated[offset] = f.tell()
+                        f.write(self._read_raw(offset, length))
+            self._write_plan(f, plan, relocated)
+
+        self._file.close()
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, 'rb')
+
+        for stored in stored_images:
+            stored.tiles = {tile: (relocated[offset], length) for tile, (offset, length) in stored.tiles.items()}
+        # Earlier saves of layers left out of this one point into the old file
+        self._saved = weakref.WeakKeyDictionary()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,104 @@
+import threading
+from PIL import Image
+
+from .layer import Layer
+from .project import THUMBNAIL_SIZE
+
+# psd-tools reads the layer structure of Photoshop files and decodes single layers.
+# Without it, PSD files can only be opened flattened through Pillow.
+try:
+    from psd_tools import PSDImage
+except ImportError:
+    PSDImage = None
+
+# Photoshop blend modes with an equivalent in BLEND_MODES, by psd-tools BlendMode name.
+# Layers with any other mode are imported as Normal.
+PSD_BLEND_MODES = {
+    'NORMAL': 'Normal',
+    'PASS_THROUGH': 'Normal',
+    'MULTIPLY': 'Multiply',
+    'SCREEN': 'Screen',
+    'OVERLAY': 'Overlay',
+    'SOFT_LIGHT': 'Soft Light',
+    'HARD_LIGHT': 'Hard Light',
+    'DIFFERENCE': 'Difference',
+}
+
+
+class PsdLayerSource:
+    """The pixels of one PSD layer, decoded by psd-tools when load() is called.
+
+    Decoding only reads the channels of this layer, so the layers of a document
+    can be loaded one at a time without compositing it. The sources of one file
+    share a lock, as psd-tools reads them from the same parsed document.
+    """
+
+    def __init__(self, psd_layer, lock):
+        self.psd_layer = psd_layer
+        self.mode = 'RGBA'
+        self.size = psd_layer.size
+        # Preview shown by the layer panel before the pixels are loaded, see make_thumbnail()
+        self.thumbnail = None
+        self._lock = lock
+
+    def load(self):
+        """Decode the pixels of the layer into a new RGBA image"""
+        with self._lock:
+            image = self.psd_layer.topil()
+        if image is None:
+            return Image.new(self.mode, self.size)
+        return image if image.mode == self.mode else image.convert(self.mode)
+
+    def make_thumbnail(self, size=THUMBNAIL_SIZE):
+        """Decode the pixels only to keep a preview of them, without holding on to them"""
+        image = self.load()
+        image.thumbnail(size)
+        self.thumbnail = image
+
+
+def open_psd(path):
+    """Read the layers of the PSD file at path and return (layers, canvas_size).
+
+    Each PSD layer with pixels becomes a Layer with its name, visibility, opacity,
+    blend mode and offset. Groups are flattened: their layers keep their place in
+    the stack, are hidden along with the group and have its opacity multiplied in.
+    Adjustment, fill and shape layers have no pixels of their own and are left out,
+    as are layer masks and effects. The pixels of each layer are decoded from the
+    file the first time the layer needs them.
+    """
+    if PSDImage is None:
+        raise ImportError("PSD support requires the psd_tools package. Please install it with: pip install psd-tools")
+
+    psd = PSDImage.open(path)
+    lock = threading.Lock()
+    layers = []
+    # Bottom to top, the order of the layer stack
+    for psd_layer in psd.descendants():
+        if psd_layer.is_group() or not psd_layer.has_pixels() or not psd_layer.width or not psd_layer.height:
+            continue
+
+        layer = Layer(
+            name=psd_layer.name,
+            visible=psd_layer.is_visible(),
+            opacity=_opacity(psd_layer),
+            blend_mode=PSD_BLEND_MODES.get(psd_layer.blend_mode.name, "Normal")
+        )
+        layer.x_offset = psd_layer.left
+        layer.y_offset = psd_layer.top
+        layer.set_image_source(PsdLayerSource(psd_layer, lock))
+        layers.append(layer)
+
+    if not layers:
+        # A file saved without layers holds only the flattened image
+        layers.append(Layer(psd.topil().convert('RGBA'), name="Background"))
+    return layers, psd.size
+
+
+def _opacity(psd_layer):
+    """The opacity of a PSD layer and the groups it is in, from 0-255 to 0-100"""
+    opacity = psd_layer.opacity / 255
+    parent = psd_layer.parent
+    while parent is not None and not isinstance(parent, PSDImage):
+        opacity *= parent.opacity / 255
+        parent = parent.parent
+    return int(round(opacity * 100))
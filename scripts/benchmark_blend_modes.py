@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+from PIL import Image
+
+# Allow running the script directly from the scripts directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from layers.layer import Layer
+from layers.blend_modes import BLEND_MODES, blend_onto, composite_layers
+
+SIZES = {
+    "4K": (3840, 2160),
+    "8K": (7680, 4320),
+}
+REPEATS = 3
+STACK_DEPTH = 20
+
+
+def make_test_image(size, seed):
+    """Create a noisy, partially transparent RGBA test image"""
+    bands = [Image.effect_noise(size, 40 + seed * 10 + i * 5).point(lambda v, o=i * 40: (v + o) % 256) for i in range(3)]
+    alpha = Image.linear_gradient("L").resize(size)
+    return Image.merge("RGBA", bands + [alpha])
+
+
+def time_call(func):
+    """Return the best wall time of func over REPEATS runs, in milliseconds"""
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    for label, size in SIZES.items():
+        print(f"{label} ({size[0]}x{size[1]})")
+        base = make_test_image(size, 0)
+        top = make_test_image(size, 1)
+
+        for mode in BLEND_MODES:
+            ms = time_call(lambda: blend_onto(base.copy(), top, mode))
+            print(f"  {mode:<12} {ms:8.1f} ms")
+
+        layers = [Layer(make_test_image(size, i % 4), blend_mode=BLEND_MODES[i % len(BLEND_MODES)]) for i in range(STACK_DEPTH)]
+        ms = time_call(lambda: composite_layers(layers, size))
+        print(f"  {STACK_DEPTH}-layer stack {ms:8.1f} ms")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+from PIL import Image, ImageFilter
+
+# Allow running the script directly from the scripts directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.filter_executor import FilterExecutor
+
+SIZES = {
+    "4K": (3840, 2160),
+    "8K": (7680, 4320),
+}
+REPEATS = 3
+
+FILTERS = {
+    "blur": ImageFilter.GaussianBlur(radius=2),
+    "sharpen": ImageFilter.SHARPEN,
+    "edges": ImageFilter.FIND_EDGES,
+    "emboss": ImageFilter.EMBOSS,
+}
+
+
+def make_test_image(size):
+    """Create a noisy RGB test image"""
+    bands = [Image.effect_noise(size, 40 + i * 10) for i in range(3)]
+    return Image.merge("RGB", bands)
+
+
+def time_call(func):
+    """Return the best wall time of func over REPEATS runs, in milliseconds"""
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def core_counts():
+    """Return the worker counts to try, doubling up to the number of cores"""
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    if counts[-1] != (os.cpu_count() or 1):
+        counts.append(os.cpu_count())
+    return counts
+
+
+def main():
+    counts = core_counts()
+    for label, size in SIZES.items():
+        print(f"{label} ({size[0]}x{size[1]})")
+        image = make_test_image(size)
+
+        for name, image_filter in FILTERS.items():
+            expected = image.filter(image_filter).tobytes()
+            serial = time_call(lambda: image.filter(image_filter))
+            print(f"  {name:<8} serial {serial:8.1f} ms")
+
+            for workers in counts:
+                executor = FilterExecutor(workers)
+                if executor.apply(image, image_filter).tobytes() != expected:
+                    print(f"  {name:<8} {workers:>2} cores: output differs from the serial path")
+                    continue
+                ms = time_call(lambda: executor.apply(image, image_filter))
+                print(f"  {name:<8} {workers:>2} cores {ms:8.1f} ms  x{serial / ms:.2f}")
+                executor.shutdown()
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+
+import pytest
+
+# The editor imports its packages from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeRoot:
+    """Stands in for the Tk root: after() callbacks run when run_pending() is called"""
+
+    def __init__(self):
+        self._callbacks = {}
+        self._next_id = 0
+
+    def after(self, ms, func, *args):
+        self._next_id += 1
+        self._callbacks[self._next_id] = (func, args)
+        return self._next_id
+
+    def after_idle(self, func, *args):
+        return self.after(0, func, *args)
+
+    def after_cancel(self, callback_id):
+        self._callbacks.pop(callback_id, None)
+
+    def run_pending(self):
+        callbacks, self._callbacks = self._callbacks, {}
+        for func, args in callbacks.values():
+            func(*args)
+
+
+class FakeWidget:
+    def __init__(self):
+        self.options = {}
+
+    def configure(self, **options):
+        self.options.update(options)
+
+
+class FakeRenderer:
+    """Records what would be drawn instead of drawing it"""
+
+    canvas_size = (400, 300)
+    origin = (0, 0)
+    zoom = 1.0
+
+    def __init__(self):
+        self.rendered = []
+        self.proxies = []
+
+    def render(self, image, zoom=None, pyramid=None, fast=False):
+        self.rendered.append((image, None, pyramid))
+
+    def render_region(self, image, rect, pyramid=None):
+        self.rendered.append((image, rect, pyramid))
+
+    def view_proxy(self, image, pyramid=None):
+        source, _ = pyramid.level_for_zoom(self.zoom) if pyramid is not None else (image, 1.0)
+        return source.copy(), (0, 0, source.width, source.height)
+
+    def show_proxy(self, proxy, canvas_box):
+        self.proxies.append((proxy, canvas_box))
+
+
+class FakeRenderScheduler:
+    def __init__(self):
+        self.cancelled = 0
+
+    def cancel(self):
+        self.cancelled += 1
+
+
+class FakeEditor:
+    """The parts of ModernImageEditor used by Toolss, without a window.
+
+    Jobs run on the real JobScheduler; run_jobs() waits for them and runs their
+    callbacks as the Tk main loop would.
+    """
+
+    def __init__(self):
+        from layers.layer_manager import LayerManager
+        from tools.filter_executor import FilterExecutor
+        from tools.tools import Toolss
+        from utils.job_scheduler import JobScheduler
+
+        self.root = FakeRoot()
+        self.image_path = None
+        self.project = None
+        self.original_image = None
+        self.current_image = None
+        self.preview_scale = 1.0
+        self.zoom_level = 1.0
+        self.draw_color = "#FF0000"
+        self.draw_size = 3
+        self.draw_last_point = None
+        self.history_pushes = 0
+        self.operation_log = []
+        self.status_bar = FakeWidget()
+        self.renderer = FakeRenderer()
+        self.render_scheduler = FakeRenderScheduler()
+        self.filter_executor = FilterExecutor()
+        self.job_scheduler = JobScheduler(self.root, poll_interval=1)
+        self.layer_manager = LayerManager(self)
+        self.tools = Toolss(self)
+
+    def push_to_history(self):
+        self.history_pushes += 1
+
+    def reset_history(self):
+        self.history_pushes = 0
+
+    def record_operation(self, op, **params):
+        self.operation_log.append(dict(op=op, **params))
+
+    def recorded_operations(self):
+        return [dict(step) for step in self.operation_log]
+
+    def display_image_on_canvas(self):
+        self.tools.display_image_on_canvas()
+
+    def run_jobs(self, timeout=10):
+        """Run main loop callbacks until no job is queued or running"""
+        deadline = time.monotonic() + timeout
+        while self.job_scheduler.busy:
+            if time.monotonic() > deadline:
+                raise TimeoutError("Jobs did not finish")
+            time.sleep(0.005)
+            self.root.run_pending()
+
+
+@pytest.fixture
+def editor():
+    pytest.importorskip("customtkinter")
+    editor = FakeEditor()
+    yield editor
+    editor.job_scheduler.shutdown()
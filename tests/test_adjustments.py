@@ -0,0 +1,56 @@
+import threading
+
+from PIL import Image, ImageChops
+
+from tools import color_engine
+
+
+def open_image(editor, tmp_path):
+    path = str(tmp_path / "photo.png")
+    Image.linear_gradient('L').resize((300, 200)).convert('RGB').save(path)
+    editor.tools.load_image_file(path)
+    editor.run_jobs()
+    return editor.original_image
+
+
+def test_first_preview_waits_for_the_original_to_be_read(editor, tmp_path, monkeypatch):
+    original = open_image(editor, tmp_path)
+    editor.renderer.zoom = 0.5
+    threads = []
+
+    def luma_histogram(image, histogram=color_engine.luma_histogram):
+        threads.append(threading.current_thread())
+        return histogram(image)
+    monkeypatch.setattr(color_engine, "luma_histogram", luma_histogram)
+
+    editor.tools.apply_brightness(20)
+    assert editor.renderer.proxies == []
+    editor.run_jobs()
+
+    assert threads and threading.current_thread() not in threads
+    assert len(editor.renderer.proxies) == 1
+    assert editor.renderer.proxies[0][0].size == (150, 100)
+
+    # Later slider callbacks preview right away
+    editor.tools.apply_contrast(30)
+    assert not editor.job_scheduler.busy
+    assert len(editor.renderer.proxies) == 2
+
+    editor.tools.commit_adjustments()
+    editor.run_jobs()
+    expected = editor.tools.adjust_image(original, 20, 30, 0)
+    assert ImageChops.difference(editor.current_image, expected).getbbox() is None
+    assert editor.operation_log == [{"op": "adjust", "brightness": 20, "contrast": 30, "saturation": 0}]
+
+
+def test_release_before_the_first_preview_still_applies(editor, tmp_path):
+    original = open_image(editor, tmp_path)
+
+    editor.tools.apply_brightness(-40)
+    editor.tools.commit_adjustments()
+    editor.run_jobs()
+
+    assert editor.renderer.proxies == []
+    expected = editor.tools.adjust_image(original, -40, 0, 0)
+    assert ImageChops.difference(editor.current_image, expected).getbbox() is None
+    assert editor.history_pushes == 1
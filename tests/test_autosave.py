@@ -0,0 +1,92 @@
+from PIL import Image, ImageChops
+
+from layers.project import ProjectFile
+from utils.autosave import AutosaveService
+
+
+def assert_same(a, b):
+    assert a.mode == b.mode and a.size == b.size
+    assert ImageChops.difference(a, b).getbbox() is None
+
+
+def autosave(service, editor):
+    """Run one autosave through to the end, returning whether anything was written"""
+    service.autosave()
+    written = service._writing is not None
+    while service._writing is not None:
+        editor.root.run_pending()
+    return written
+
+
+def saved(path):
+    project, layers, canvas_size, active_index = ProjectFile.open(str(path))
+    images = [layer.image for layer in layers]
+    project.close()
+    return images, canvas_size
+
+
+def test_layers_are_saved_when_they_change(editor, tmp_path):
+    path = tmp_path / "recovery.mie"
+    service = AutosaveService(editor, path=str(path), interval=0, poll_interval=1)
+    editor.layer_manager.create_new_document(300, 200)
+    editor.current_image = editor.layer_manager.get_composite_image()
+
+    assert autosave(service, editor)
+    assert not autosave(service, editor)
+
+    editor.tools.start_stroke()
+    editor.tools.paint_stroke((10, 10), (100, 10))
+    editor.tools.apply_drawing()
+    assert autosave(service, editor)
+    images, canvas_size = saved(path)
+    assert canvas_size == (300, 200)
+    assert images[0].getpixel((50, 10))[:3] == (255, 0, 0)
+    service.stop()
+    assert not path.exists()
+
+
+def test_image_without_layers_is_saved_as_one_layer(editor, tmp_path):
+    path = tmp_path / "recovery.mie"
+    service = AutosaveService(editor, path=str(path), interval=0, poll_interval=1)
+    editor.current_image = Image.linear_gradient('L').resize((120, 80)).convert('RGB')
+
+    assert autosave(service, editor)
+    images, canvas_size = saved(path)
+    assert canvas_size == (120, 80)
+    assert_same(images[0], editor.current_image)
+    assert not autosave(service, editor)
+
+    # Operations replace the current image without touching any layer
+    editor.tools.rotate_image(90)
+    editor.run_jobs()
+    assert autosave(service, editor)
+    images, canvas_size = saved(path)
+    assert canvas_size == (80, 120)
+    assert_same(images[0], editor.current_image)
+    service.stop()
+
+
+def test_operation_on_a_layered_document_is_saved(editor, tmp_path):
+    path = tmp_path / "recovery.mie"
+    service = AutosaveService(editor, path=str(path), interval=0, poll_interval=1)
+    editor.layer_manager.create_new_document(300, 200, bg_color="orange")
+    editor.current_image = editor.layer_manager.get_composite_image()
+    assert autosave(service, editor)
+
+    editor.tools.apply_grayscale()
+    editor.run_jobs()
+    assert autosave(service, editor)
+    images, _ = saved(path)
+    assert len(images) == 1
+    assert_same(images[0], editor.current_image)
+    service.stop()
+
+
+def test_failures_are_reported_in_the_status_bar(editor, tmp_path):
+    service = AutosaveService(editor, path=str(tmp_path / "missing" / "recovery.mie"), interval=0, poll_interval=1)
+    editor.current_image = Image.new('RGB', (40, 40))
+
+    autosave(service, editor)
+    assert service.error
+    assert editor.status_bar.options["text"].startswith("Autosave failed")
+    service.stop()
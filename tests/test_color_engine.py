@@ -0,0 +1,78 @@
+import pytest
+from PIL import Image, ImageChops, ImageEnhance, ImageOps
+
+from tools import color_engine
+
+
+def sample_image(mode='RGB'):
+    image = Image.merge('RGB', [
+        Image.linear_gradient('L').resize((64, 48)),
+        Image.linear_gradient('L').rotate(90).resize((64, 48)),
+        Image.new('L', (64, 48), 90),
+    ])
+    if mode == 'RGBA':
+        image.putalpha(Image.linear_gradient('L').resize((64, 48)))
+    return image
+
+
+def max_difference(a, b):
+    return max(high for _, high in ImageChops.difference(a, b).getextrema())
+
+
+def test_grayscale_matches_pillow_and_keeps_alpha():
+    image = sample_image('RGBA')
+    result = color_engine.grayscale(image)
+
+    assert result.mode == 'RGBA'
+    assert result.getchannel('A') == image.getchannel('A')
+    expected = ImageOps.grayscale(image.convert('RGB')).convert('RGB')
+    assert max_difference(result.convert('RGB'), expected) <= 1
+
+
+def test_sepia_matches_the_per_pixel_tone():
+    image = sample_image()
+    result = color_engine.sepia(image)
+
+    gray = ImageOps.grayscale(image)
+    for position in [(0, 0), (20, 10), (63, 47)]:
+        value = gray.getpixel(position)
+        expected = (min(int(value * 1.2), 255), min(int(value * 0.95), 255), int(value * 0.7))
+        assert all(abs(a - b) <= 1 for a, b in zip(result.getpixel(position), expected))
+
+
+def test_negative_inverts_colors_only():
+    image = sample_image('RGBA')
+    result = color_engine.negative(image)
+    assert result.getchannel('A') == image.getchannel('A')
+    assert result.convert('RGB') == ImageOps.invert(image.convert('RGB'))
+
+
+def test_tint_at_zero_strength_is_identity():
+    image = sample_image()
+    assert max_difference(color_engine.tint(image, (255, 0, 0), 0.0), image) <= 1
+
+
+def test_saturation_matrix_matches_image_enhance():
+    image = sample_image()
+    result = color_engine.apply_color_matrix(image, color_engine.saturation_matrix(1.6))
+    assert max_difference(result, ImageEnhance.Color(image).enhance(1.6)) <= 2
+
+
+def test_brightness_contrast_lut_matches_image_enhance():
+    image = sample_image()
+    lut = color_engine.brightness_contrast_lut(1.2, 1.5, color_engine.luma_histogram(image))
+    result = color_engine.apply_channel_luts(image, lut)
+
+    expected = ImageEnhance.Contrast(ImageEnhance.Brightness(image).enhance(1.2)).enhance(1.5)
+    assert max_difference(result, expected) <= 2
+
+
+def test_matrices_accept_offsets_and_affine_rows():
+    image = Image.new('RGB', (2, 2), (10, 20, 30))
+    shifted = color_engine.apply_color_matrix(image, [[1, 0, 0, 5], [0, 1, 0, 5], [0, 0, 1, 5], [0, 0, 0, 1]])
+    assert shifted.getpixel((0, 0)) == (15, 25, 35)
+
+    with pytest.raises(ValueError):
+        color_engine.apply_color_matrix(image, [[1, 0]])
+    with pytest.raises(ValueError):
+        color_engine.apply_channel_luts(image, [0] * 10)
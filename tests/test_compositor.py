@@ -0,0 +1,107 @@
+from PIL import Image, ImageChops, ImageDraw
+
+from layers.blend_modes import composite_layers
+from layers.compositor import ActiveLayerCompositor, TileCompositor, tile_runs, tiles_in_rect
+from layers.layer import Layer
+
+CANVAS_SIZE = (600, 500)
+
+
+def make_layers():
+    background = Layer(Image.linear_gradient('L').resize(CANVAS_SIZE).convert('RGB'), name="Background")
+    shapes = Image.new('RGBA', (300, 200), (0, 0, 0, 0))
+    ImageDraw.Draw(shapes).ellipse((20, 20, 280, 180), fill=(200, 40, 40, 180))
+    middle = Layer(shapes, name="Shapes", opacity=80, blend_mode="Multiply")
+    middle.x_offset, middle.y_offset = 100, 150
+    top = Layer(Image.new('RGBA', CANVAS_SIZE, (0, 0, 0, 0)), name="Paint")
+    return [background, middle, top]
+
+
+def assert_same(a, b):
+    assert a.size == b.size
+    assert ImageChops.difference(a.convert('RGBA'), b.convert('RGBA')).getbbox() is None
+
+
+def paint(layer, rect, color):
+    ImageDraw.Draw(layer.image).rectangle((rect[0], rect[1], rect[2] - 1, rect[3] - 1), fill=color)
+    layer.mark_dirty(rect)
+
+
+def test_tiles_in_rect_clips_to_canvas():
+    assert tiles_in_rect((-10, -10, 10, 10), CANVAS_SIZE) == {(0, 0)}
+    assert tiles_in_rect((250, 0, 260, 300), CANVAS_SIZE) == {(0, 0), (1, 0), (0, 1), (1, 1)}
+    assert tiles_in_rect((700, 0, 800, 10), CANVAS_SIZE) == set()
+
+
+def test_tile_runs_merge_adjacent_tiles_of_a_row():
+    boxes = tile_runs({(0, 0), (1, 0), (0, 1)}, CANVAS_SIZE)
+    assert boxes == [(0, 0, 512, 256), (0, 256, 256, 500)]
+
+
+def test_tile_compositor_recomposites_only_dirty_tiles():
+    layers = make_layers()
+    compositor = TileCompositor()
+    image, boxes = compositor.refresh(layers, CANVAS_SIZE)
+    assert_same(image, composite_layers(layers, CANVAS_SIZE))
+
+    # Nothing changed
+    _, boxes = compositor.refresh(layers, CANVAS_SIZE)
+    assert boxes == []
+
+    paint(layers[2], (10, 10, 30, 30), (0, 0, 255, 255))
+    refreshed, boxes = compositor.refresh(layers, CANVAS_SIZE)
+    assert refreshed is image
+    assert boxes == [(0, 0, 256, 256)]
+    assert_same(refreshed, composite_layers(layers, CANVAS_SIZE))
+
+
+def test_tile_compositor_redoes_moved_layer():
+    layers = make_layers()
+    compositor = TileCompositor()
+    compositor.refresh(layers, CANVAS_SIZE)
+
+    layers[1].x_offset = 300
+    image, boxes = compositor.refresh(layers, CANVAS_SIZE)
+    assert boxes
+    assert_same(image, composite_layers(layers, CANVAS_SIZE))
+
+
+def test_shared_image_is_left_as_it_was():
+    layers = make_layers()
+    compositor = TileCompositor()
+    image, _ = compositor.refresh(layers, CANVAS_SIZE)
+    before = image.copy()
+    compositor.share()
+
+    paint(layers[2], (0, 0, 50, 50), (0, 255, 0, 255))
+    refreshed, _ = compositor.refresh(layers, CANVAS_SIZE)
+    assert refreshed is not image
+    assert_same(image, before)
+    assert_same(refreshed, composite_layers(layers, CANVAS_SIZE))
+
+
+def test_active_layer_compositor_matches_full_composite():
+    layers = make_layers()
+    assert ActiveLayerCompositor.can_composite(layers, 1)
+    compositor = ActiveLayerCompositor()
+    image, _ = compositor.refresh(layers, 1, CANVAS_SIZE)
+    assert_same(image, composite_layers(layers, CANVAS_SIZE))
+
+    # An edit of the active layer only blends the tiles it touches
+    paint(layers[1], (0, 0, 40, 40), (0, 0, 0, 255))
+    image, boxes = compositor.refresh(layers, 1, CANVAS_SIZE)
+    assert boxes == [(0, 0, 256, 256)]
+    assert_same(image, composite_layers(layers, CANVAS_SIZE))
+
+    # Edits of the cached stacks below and above are picked up too
+    paint(layers[2], (400, 300, 450, 350), (255, 255, 0, 128))
+    layers[0].opacity = 50
+    image, _ = compositor.refresh(layers, 1, CANVAS_SIZE)
+    assert_same(image, composite_layers(layers, CANVAS_SIZE))
+
+
+def test_active_layer_compositor_needs_normal_layers_above():
+    layers = make_layers()
+    layers[2].blend_mode = "Screen"
+    assert not ActiveLayerCompositor.can_composite(layers, 1)
+    assert ActiveLayerCompositor.can_composite(layers, 2)
@@ -0,0 +1,28 @@
+from PIL import Image
+
+
+def test_image_without_layers_is_drawn_from_its_own_pyramid(editor):
+    image = Image.new('RGB', (2000, 1000), 'white')
+    editor.current_image = image
+    editor.zoom_level = 0.25
+    editor.display_image_on_canvas()
+
+    drawn, _, pyramid = editor.renderer.rendered[-1]
+    assert drawn is image
+    assert pyramid.image is image
+    assert pyramid.level_for_zoom(0.25)[0].size == (500, 250)
+
+    # An operation replacing the image gets a pyramid of the result
+    editor.current_image = image.rotate(90, expand=True)
+    editor.display_image_on_canvas()
+    _, _, pyramid = editor.renderer.rendered[-1]
+    assert pyramid.image is editor.current_image
+
+
+def test_layer_composite_is_drawn_from_the_layer_pyramid(editor):
+    editor.layer_manager.create_new_document(300, 200)
+    editor.display_image_on_canvas()
+
+    drawn, _, pyramid = editor.renderer.rendered[-1]
+    assert drawn is editor.layer_manager.get_composite_image()
+    assert pyramid is editor.layer_manager.pyramid
@@ -0,0 +1,57 @@
+from PIL import Image, ImageChops
+
+from layers.blend_modes import composite_layers
+from layers.layer import Layer
+
+
+def test_stroke_paints_the_active_layer_in_place(editor):
+    layer_manager = editor.layer_manager
+    layer_manager.canvas_size = (600, 400)
+    layer_manager.create_new_document(600, 400)
+    paint_layer = layer_manager.add_layer()
+    paint_layer.x_offset = 50
+    image = paint_layer.image
+    stamp = paint_layer.stamp
+    composite = editor.current_image
+    assert composite is layer_manager.get_composite_image()
+
+    assert editor.tools.start_stroke()
+    editor.tools.paint_stroke((100, 100), (140, 100))
+    editor.tools.apply_drawing()
+
+    # Only the brush segment is recorded as changed, in layer coordinates
+    assert paint_layer.image is image
+    assert paint_layer.dirty_rects_since(stamp) == [(48, 98, 93, 103)]
+    assert image.getpixel((70, 100)) == (255, 0, 0, 255)
+    assert editor.history_pushes == 1
+
+    # The composite is updated in place to match
+    assert editor.current_image is composite
+    expected = composite_layers(layer_manager.layers, layer_manager.canvas_size)
+    assert ImageChops.difference(composite, expected).getbbox() is None
+
+
+def test_stroke_without_layers_replaces_the_image(editor):
+    original = Image.new('RGB', (200, 100), 'white')
+    editor.current_image = original
+
+    assert editor.tools.start_stroke()
+    editor.tools.paint_stroke((10, 10), (50, 10))
+    editor.tools.apply_drawing()
+
+    assert editor.current_image is not original
+    assert original.getpixel((30, 10)) == (255, 255, 255)
+    assert editor.current_image.getpixel((30, 10)) == (255, 0, 0)
+
+
+def test_stroke_outside_the_layer_marks_nothing(editor):
+    layer_manager = editor.layer_manager
+    layer_manager.canvas_size = (300, 300)
+    layer = Layer(Image.new('RGBA', (50, 50)), name="Small")
+    layer_manager.create_new_document(300, 300)
+    layer_manager.add_layer(layer)
+    stamp = layer.stamp
+
+    assert editor.tools.start_stroke()
+    editor.tools.paint_stroke((200, 200), (250, 250))
+    assert layer.dirty_rects_since(stamp) == []
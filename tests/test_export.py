@@ -0,0 +1,95 @@
+import os
+
+import pytest
+from PIL import Image, ImageChops, ImageFilter
+
+from tools import export
+
+
+def photo(size):
+    # Smooth areas with some grain, compressing roughly like a photograph
+    noise = Image.effect_noise(size, 20).convert('RGB')
+    gradient = Image.linear_gradient('L').resize(size).convert('RGB')
+    return Image.blend(gradient, noise, 0.3).filter(ImageFilter.GaussianBlur(1))
+
+
+def test_format_for_path():
+    assert export.format_for_path("photo.JPG") == 'JPEG'
+    assert export.format_for_path("scan.tif") == 'TIFF'
+    with pytest.raises(ValueError):
+        export.format_for_path("notes.txt")
+    with pytest.raises(ValueError):
+        export.format_for_path("no_extension")
+
+
+def test_sample_keeps_the_aspect_ratio():
+    sample = export.make_sample(Image.new('RGB', (4000, 2000)), pixels=20000)
+    assert sample.size == (200, 100)
+    small = Image.new('RGB', (50, 40))
+    assert export.make_sample(small).size == (50, 40)
+
+
+def test_tiled_file_is_sampled_at_the_same_size(tmp_path):
+    tiled_tiff = pytest.importorskip("tools.tiled_tiff")
+    path = str(tmp_path / "large.tif")
+    image = photo((2048, 1024))
+    image.save(path)
+
+    tiff = tiled_tiff.TiledTiff(path)
+    sample = export.make_sample(tiff, pixels=256 * 128)
+    tiff.close()
+    assert sample.size == (256, 128)
+    assert ImageChops.difference(sample, export.make_sample(image, pixels=256 * 128)).getextrema()[0][1] < 40
+
+
+@pytest.mark.parametrize("name, options", [
+    ("out.jpg", {'quality': 85, 'optimize': False, 'progressive': False}),
+    ("out.png", {'compress_level': 6}),
+    ("out.webp", {'quality': 80}),
+])
+def test_estimate_is_close_to_the_exported_size(tmp_path, name, options):
+    image = photo((1600, 1200))
+    path = str(tmp_path / name)
+    size, seconds = export.estimate(export.make_sample(image, pixels=400 * 300), image.size, path, options)
+    export.export_image(image, path, options)
+
+    actual = os.path.getsize(path)
+    assert seconds > 0
+    # Never off by an order of magnitude
+    assert actual / 4 < size < actual * 4
+
+
+def test_export_flattens_transparency_for_jpeg(tmp_path):
+    path = str(tmp_path / "out.jpg")
+    export.export_image(Image.new('RGBA', (20, 20), (255, 0, 0, 128)), path)
+    with Image.open(path) as saved:
+        assert saved.mode == 'RGB'
+
+
+def test_failed_export_leaves_the_existing_file(tmp_path):
+    path = str(tmp_path / "out.png")
+    Image.new('RGB', (10, 10), 'green').save(path)
+
+    # PNG has no CMYK mode
+    with pytest.raises(OSError):
+        export.export_image(Image.new('CMYK', (10, 10)), path)
+    assert sorted(os.listdir(tmp_path)) == ["out.png"]
+    with Image.open(path) as saved:
+        assert saved.getpixel((0, 0)) == (0, 128, 0)
+
+
+def test_export_writes_the_image_as_it_was_requested(editor, tmp_path):
+    editor.layer_manager.create_new_document(300, 200)
+    path = str(tmp_path / "out.png")
+
+    editor.tools.export_image(path, {'compress_level': 1})
+    # Painting before the export has run does not reach the file
+    editor.tools.start_stroke()
+    editor.tools.paint_stroke((10, 10), (200, 10))
+    editor.tools.apply_drawing()
+    editor.run_jobs()
+
+    with Image.open(path) as saved:
+        assert saved.size == (300, 200)
+        assert saved.convert('RGB').getpixel((100, 10)) == (255, 255, 255)
+    assert editor.current_image.getpixel((100, 10)) == (255, 0, 0, 255)
@@ -0,0 +1,78 @@
+import random
+
+import pytest
+from PIL import Image, ImageChops, ImageFilter
+
+from tools.filter_executor import FilterExecutor, filter_margin
+
+
+@pytest.fixture(scope="module")
+def noise():
+    size = (1200, 1000)
+    return Image.frombytes('RGB', size, random.Random(1).randbytes(size[0] * size[1] * 3))
+
+
+@pytest.fixture
+def executor():
+    executor = FilterExecutor(workers=4)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.mark.parametrize("image_filter", [
+    ImageFilter.GaussianBlur(radius=2),
+    ImageFilter.BoxBlur(3),
+    ImageFilter.SHARPEN,
+    ImageFilter.FIND_EDGES,
+    ImageFilter.EMBOSS,
+    ImageFilter.MedianFilter(5),
+])
+def test_strips_give_the_same_result_as_one_pass(executor, noise, image_filter):
+    result = executor.apply(noise, image_filter)
+    assert ImageChops.difference(result, noise.filter(image_filter)).getbbox() is None
+
+
+def test_strips_cover_the_image_once(executor):
+    strips = executor.strips((100, 1000), 6)
+    assert len(strips) > 1
+    rows = []
+    for box, inner in strips:
+        rows.extend(range(box[1] + inner[1], box[1] + inner[3]))
+    assert rows == list(range(1000))
+
+
+def test_progress_is_reported_per_strip(executor, noise):
+    reported = []
+    executor.apply(noise, ImageFilter.GaussianBlur(radius=1), progress=reported.append)
+    assert len(reported) == len(executor.strips(noise.size, filter_margin(ImageFilter.GaussianBlur(1))))
+    assert reported[-1] == 1.0
+
+
+def test_progress_can_stop_the_filter(executor, noise):
+    def stop(fraction):
+        raise RuntimeError("cancelled")
+
+    with pytest.raises(RuntimeError):
+        executor.apply(noise, ImageFilter.SHARPEN, progress=stop)
+
+
+def test_small_images_and_single_thread_run_in_one_pass(noise):
+    executor = FilterExecutor(workers=4, use_multithreading=False)
+    reported = []
+    result = executor.apply(noise, ImageFilter.SMOOTH, progress=reported.append)
+    assert reported == [1.0]
+    assert executor._pool is None
+    assert ImageChops.difference(result, noise.filter(ImageFilter.SMOOTH)).getbbox() is None
+
+
+def test_margin_of_filters():
+    assert filter_margin(ImageFilter.GaussianBlur(radius=2)) == 9
+    assert filter_margin(ImageFilter.SHARPEN) == 1
+    assert filter_margin(ImageFilter.MedianFilter(5)) == 2
+    assert filter_margin(ImageFilter.Color3DLUT.generate(2, lambda r, g, b: (r, g, b))) is None
+
+
+def test_built_in_kernels_run_in_strips(executor, noise):
+    reported = []
+    executor.apply(noise, ImageFilter.EMBOSS, progress=reported.append)
+    assert len(reported) > 1
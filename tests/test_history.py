@@ -0,0 +1,144 @@
+import random
+
+import pytest
+from PIL import Image, ImageChops, ImageDraw
+
+from layers.history import HistoryStore
+from layers.layer import Layer
+
+SIZE = (600, 300)
+
+
+def make_layer():
+    return Layer(Image.linear_gradient('L').resize(SIZE).convert('RGBA'), name="Paint")
+
+
+def assert_same(a, b):
+    assert a.mode == b.mode and a.size == b.size
+    assert ImageChops.difference(a, b).getbbox() is None
+
+
+def test_snapshot_shares_tiles_not_edited_since_the_last_one():
+    store = HistoryStore()
+    layer = make_layer()
+    first = store.snapshot([layer], 0)
+    before = layer.image.copy()
+
+    ImageDraw.Draw(layer.image).rectangle((10, 10, 40, 40), fill='red')
+    layer.mark_dirty((10, 10, 41, 41))
+    second = store.snapshot([layer], 0)
+
+    first_tiles = first['layers'][0].tiles
+    second_tiles = second['layers'][0].tiles
+    assert set(first_tiles) == set(second_tiles)
+    assert second_tiles[(0, 0)] is not first_tiles[(0, 0)]
+    assert all(second_tiles[tile] is first_tiles[tile] for tile in first_tiles if tile != (0, 0))
+
+    # Each state restores the pixels it was taken with
+    layers, active_index = store.restore(first)
+    assert active_index == 0
+    assert_same(layers[0].image, before)
+    layers, _ = store.restore(second)
+    assert_same(layers[0].image, layer.image)
+
+
+def test_replaced_image_keeps_sharing_identical_tiles():
+    store = HistoryStore()
+    layer = make_layer()
+    first = store.snapshot([layer], 0)['layers'][0]
+
+    image = layer.image.copy()
+    ImageDraw.Draw(image).rectangle((300, 0, 310, 10), fill='blue')
+    layer.image = image
+    second = store.snapshot([layer], 0)['layers'][0]
+
+    assert second.tiles[(0, 0)] is first.tiles[(0, 0)]
+    assert second.tiles[(1, 0)] is not first.tiles[(1, 0)]
+
+
+def test_restored_layer_shares_tiles_with_its_snapshot():
+    store = HistoryStore()
+    layer = make_layer()
+    state = store.snapshot([layer], 0)
+
+    restored = store.restore(state)[0][0]
+    again = store.snapshot([restored], 0)['layers'][0]
+    assert again.tiles == state['layers'][0].tiles
+
+
+def test_properties_and_palette_survive_a_round_trip():
+    store = HistoryStore()
+    image = Image.new('P', (20, 20))
+    image.putpalette([0, 0, 0, 255, 0, 0] + [0] * 762)
+    layer = Layer(image, name="Indexed", visible=False, opacity=40, blend_mode="Screen")
+    layer.x_offset, layer.y_offset = 5, 7
+
+    restored = store.restore(store.snapshot([layer], 0))[0][0]
+    assert (restored.name, restored.visible, restored.opacity, restored.blend_mode) == \
+        ("Indexed", False, 40, "Screen")
+    assert (restored.x_offset, restored.y_offset) == (5, 7)
+    assert restored.image.getpalette()[:6] == [0, 0, 0, 255, 0, 0]
+
+
+class Source:
+    mode = 'RGBA'
+    size = SIZE
+    thumbnail = None
+
+    def __init__(self):
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return Image.new(self.mode, self.size, 'green')
+
+
+def test_unloaded_layer_is_snapshot_by_its_source():
+    store = HistoryStore()
+    source = Source()
+    layer = Layer(name="Lazy")
+    layer.set_image_source(source)
+
+    snapshot = store.snapshot([layer], 0)['layers'][0]
+    assert snapshot.source is source and snapshot.tiles == {}
+    assert source.loads == 0
+
+    restored = store.restore({'layers': [snapshot], 'active_index': 0})[0][0]
+    assert restored.image_source is source
+    assert restored.image.getpixel((0, 0)) == (0, 128, 0, 255)
+
+
+def noisy_layer(seed):
+    # Random pixels, so compressing the tiles does not bring them under budget
+    return Layer(Image.frombytes('RGBA', SIZE, random.Random(seed).randbytes(SIZE[0] * SIZE[1] * 4)))
+
+
+def test_budget_compresses_then_spills_the_oldest_states(tmp_path):
+    store = HistoryStore()
+    store._spill_dir = str(tmp_path)
+    states = [store.snapshot([noisy_layer(seed)], 0) for seed in range(3)]
+    images = [store.restore(state)[0][0].image for state in states]
+    one_state = store.memory_usage(states[:1])
+
+    store.budget = int(one_state * 1.5)
+    store.enforce_budget(states, 2)
+    assert store.memory_usage(states) <= store.budget
+    assert store.disk_usage(states) > 0
+    # The oldest state is spilled first and the current one stays in memory
+    assert all(tile.is_spilled for tile in states[0]['layers'][0].tiles.values())
+    assert not any(tile.is_spilled for tile in states[2]['layers'][0].tiles.values())
+
+    for state, image in zip(states, images):
+        assert_same(store.restore(state)[0][0].image, image)
+
+
+def test_spill_failure_is_raised_and_keeps_tiles_in_memory(tmp_path):
+    store = HistoryStore(budget=1)
+    store._spill_dir = str(tmp_path / "missing")
+    states = [store.snapshot([noisy_layer(0)], 0)]
+    image = store.restore(states[0])[0][0].image
+
+    with pytest.raises(OSError):
+        store.enforce_budget(states, 0)
+    assert store.disk_usage(states) == 0
+    assert_same(store.restore(states[0])[0][0].image, image)
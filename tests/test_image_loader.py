@@ -0,0 +1,64 @@
+import os
+
+from PIL import Image, ImageChops, ImageDraw
+
+from tools import image_loader
+
+
+def assert_same(a, b):
+    assert a.mode == b.mode and a.size == b.size
+    assert ImageChops.difference(a, b).getbbox() is None
+
+
+def test_jpeg_preview_is_a_draft_decode(tmp_path):
+    path = str(tmp_path / "photo.jpg")
+    Image.new('RGB', (2000, 1600), 'red').save(path)
+
+    preview, full_size = image_loader.open_preview(path, (400, 300))
+    assert full_size == (2000, 1600)
+    assert preview.width <= 500 and preview.height >= 300
+
+
+def test_pyramid_tiff_is_previewed_from_a_reduced_page(tmp_path):
+    path = str(tmp_path / "scan.tif")
+    full = Image.new('RGB', (1600, 1200), 'blue')
+    full.save(path, save_all=True, append_images=[full.resize((800, 600)), full.resize((200, 150))])
+
+    preview, full_size = image_loader.open_preview(path, (400, 300))
+    assert full_size == (1600, 1200)
+    assert preview.size == (400, 300)
+
+
+def test_original_stays_as_loaded_when_the_file_changes(editor, tmp_path):
+    path = str(tmp_path / "photo.png")
+    Image.new('RGB', (60, 40), 'red').save(path)
+    editor.tools.load_image_file(path)
+    editor.run_jobs()
+    original = editor.original_image
+    assert original.getpixel((0, 0)) == (255, 0, 0)
+
+    # Saving over the file, then removing it, leaves the original and reset alone
+    editor.current_image = Image.new('RGB', (60, 40), 'blue')
+    editor.image_path = path
+    editor.tools.save_image()
+    editor.run_jobs()
+    os.remove(path)
+
+    editor.tools.reset_image()
+    editor.run_jobs()
+    assert editor.original_image is original
+    assert editor.current_image is not original
+    assert_same(editor.current_image, Image.new('RGB', (60, 40), 'red'))
+
+
+def test_original_of_a_layered_document_is_a_copy(editor, tmp_path):
+    path = str(tmp_path / "photo.png")
+    Image.new('RGB', (60, 40), 'red').save(path)
+    loaded = []
+    editor.tools.load_image_file(path, on_loaded=loaded.append)
+    editor.run_jobs()
+
+    # The image may be painted in place as a layer without changing the original
+    ImageDraw.Draw(loaded[0]).rectangle((0, 0, 10, 10), fill='green')
+    assert editor.original_image is not loaded[0]
+    assert editor.original_image.getpixel((0, 0)) == (255, 0, 0)
@@ -0,0 +1,40 @@
+from PIL import Image, ImageChops, ImageDraw
+
+from utils.image_pyramid import ImagePyramid
+
+
+def test_levels_halve_the_image():
+    image = Image.linear_gradient('L').resize((1000, 600)).convert('RGB')
+    pyramid = ImagePyramid(image)
+
+    assert pyramid.level_for_zoom(1.5) == (image, 1.0)
+    # The smallest level at least as large as the zoomed image
+    level, scale = pyramid.level_for_zoom(0.3)
+    assert scale == 0.5
+    assert level.size == (500, 300)
+    # Zooming out further stops at the last level
+    level, _ = pyramid.level_for_zoom(0.0001)
+    assert level.size == pyramid.level(pyramid.max_level).size == (2, 2)
+
+
+def test_in_place_edits_rebuild_only_their_region():
+    image = Image.new('RGB', (512, 512), 'white')
+    pyramid = ImagePyramid(image)
+    pyramid.level(2)
+
+    ImageDraw.Draw(image).rectangle((0, 0, 63, 63), fill='black')
+    pyramid.update(image, [(0, 0, 64, 64)])
+
+    level = pyramid.level(2)
+    expected = image.reduce(2).reduce(2)
+    assert ImageChops.difference(level, expected).getbbox() is None
+
+
+def test_a_new_image_starts_a_new_pyramid():
+    pyramid = ImagePyramid(Image.new('RGB', (64, 64)))
+    pyramid.level(1)
+    replacement = Image.new('RGB', (32, 32), 'red')
+    pyramid.update(replacement)
+
+    assert pyramid.image is replacement
+    assert pyramid.level(1).getpixel((0, 0)) == (255, 0, 0)
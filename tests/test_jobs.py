@@ -0,0 +1,143 @@
+import threading
+import time
+
+from PIL import Image, ImageChops, ImageFilter
+
+from layers.layer import Layer
+from tests.conftest import FakeRoot
+from tools import operations
+from utils.job_scheduler import JobScheduler
+
+
+def run(scheduler, root):
+    while scheduler.busy:
+        time.sleep(0.005)
+        root.run_pending()
+
+
+def test_jobs_run_in_order_with_prepared_values():
+    root = FakeRoot()
+    scheduler = JobScheduler(root, poll_interval=1)
+    results = []
+    for value in range(3):
+        scheduler.submit(f"Job {value}", lambda job, prepared: prepared * 10,
+                         on_done=results.append, prepare=lambda value=value: value)
+    run(scheduler, root)
+    assert results == [0, 10, 20]
+    scheduler.shutdown()
+
+
+def test_errors_and_cancellation_reach_their_callbacks():
+    root = FakeRoot()
+    scheduler = JobScheduler(root, poll_interval=1)
+    outcomes = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail(job, prepared):
+        raise ValueError("bad")
+
+    def wait(job, prepared):
+        started.set()
+        release.wait(5)
+        job.report(0.5)
+
+    scheduler.submit("Failing", fail, on_error=lambda e: outcomes.append(str(e)))
+    run(scheduler, root)
+    scheduler.submit("Waiting", wait, on_done=lambda result: outcomes.append("done"),
+                     on_cancel=lambda: outcomes.append("cancelled"))
+    queued = scheduler.submit("Queued", lambda job, prepared: None,
+                              on_done=lambda result: outcomes.append("queued done"))
+    started.wait(5)
+    scheduler.cancel()
+    release.set()
+    run(scheduler, root)
+
+    assert outcomes == ["bad", "cancelled"]
+    assert queued.cancelled
+    scheduler.shutdown()
+
+
+def test_image_job_applies_the_operation_to_the_current_image(editor):
+    image = Image.linear_gradient('L').resize((120, 80)).convert('RGB')
+    editor.current_image = image
+
+    editor.tools.rotate_image(90)
+    editor.run_jobs()
+
+    assert editor.current_image.size == (80, 120)
+    assert ImageChops.difference(editor.current_image, operations.rotate(image, 90)).getbbox() is None
+    assert editor.history_pushes == 1
+    assert editor.operation_log == [{"op": "rotate", "angle": 90}]
+    assert editor.status_bar.options["text"] == "Image rotated by 90 degrees"
+
+
+def test_filter_job_gets_the_image_and_its_job(editor):
+    # The filter reports progress through the job it is passed
+    image = Image.effect_noise((1500, 1000), 40).convert('RGB')
+    editor.current_image = image
+
+    editor.tools.apply_blur()
+    editor.run_jobs()
+
+    expected = image.filter(ImageFilter.GaussianBlur(radius=2))
+    assert ImageChops.difference(editor.current_image, expected).getbbox() is None
+
+
+def test_snapshots_are_not_changed_by_later_edits(editor):
+    # An image without layers is replaced by edits, never changed, so it is not copied
+    image = editor.current_image = Image.new('RGB', (50, 50), 'white')
+    assert editor.tools.snapshot_image() is image
+    editor.tools.start_stroke()
+    editor.tools.paint_stroke((10, 10), (40, 10))
+    editor.tools.apply_drawing()
+    assert editor.current_image is not image
+    assert image.getpixel((20, 10)) == (255, 255, 255)
+
+    editor.layer_manager.create_new_document(300, 200)
+    snapshot = editor.tools.snapshot_image()
+    assert snapshot is editor.current_image
+    before = snapshot.copy()
+
+    editor.tools.start_stroke()
+    editor.tools.paint_stroke((10, 10), (100, 10))
+    editor.tools.apply_drawing()
+
+    assert editor.current_image is not snapshot
+    assert ImageChops.difference(snapshot, before).getbbox() is None
+    assert editor.current_image.getpixel((50, 10)) == (255, 0, 0, 255)
+
+
+def test_save_writes_the_displayed_image(editor, tmp_path):
+    # Layers left from an earlier document, and an image opened without layers since
+    editor.layer_manager.create_new_document(300, 200)
+    editor.current_image = Image.new('RGB', (40, 30), 'blue')
+    editor.image_path = str(tmp_path / "opened.png")
+
+    editor.tools.save_image()
+    editor.run_jobs()
+
+    with Image.open(editor.image_path) as saved:
+        assert saved.size == (40, 30)
+        assert saved.convert('RGB').getpixel((0, 0)) == (0, 0, 255)
+
+
+class BrokenSource:
+    mode = 'RGBA'
+    size = (20, 20)
+    thumbnail = None
+
+    def load(self):
+        return Image.new(self.mode, self.size)
+
+    def make_thumbnail(self):
+        raise OSError("unreadable layer")
+
+
+def test_layer_preview_failure_is_shown_in_the_status_bar(editor):
+    layer = Layer(name="Hidden")
+    layer.set_image_source(BrokenSource())
+
+    editor.tools.make_layer_previews([layer])
+    editor.run_jobs()
+    assert editor.status_bar.options["text"] == "Could not make layer previews: unreadable layer"
@@ -0,0 +1,36 @@
+from PIL import Image, ImageChops
+
+from tools import operations
+
+
+def assert_same(a, b):
+    assert a.mode == b.mode and a.size == b.size
+    assert ImageChops.difference(a, b).getbbox() is None
+
+
+def test_recorded_macro_replays_on_another_image(editor):
+    editor.current_image = Image.linear_gradient('L').resize((160, 90)).convert('RGB')
+    editor.tools.rotate_image(90)
+    editor.tools.flip_horizontal()
+    editor.tools.apply_blur()
+    editor.tools.apply_grayscale()
+    editor.run_jobs()
+    steps = editor.recorded_operations()
+    assert [step["op"] for step in steps] == ["rotate", "flip_horizontal", "blur", "grayscale"]
+
+    other = Image.effect_noise((120, 200), 30).convert('RGB')
+    editor.current_image = other
+    editor.operation_log = []
+    editor.tools.run_macro(steps)
+    editor.run_jobs()
+
+    assert_same(editor.current_image, operations.apply_recipe(other, steps))
+    assert editor.recorded_operations() == steps
+    assert editor.status_bar.options["text"] == "Macro applied (4 steps)"
+
+
+def test_empty_macro_does_nothing(editor):
+    image = Image.new('RGB', (10, 10))
+    editor.current_image = image
+    assert editor.tools.run_macro([]) is None
+    assert editor.current_image is image
@@ -0,0 +1,149 @@
+import os
+import random
+
+from PIL import Image, ImageChops, ImageDraw
+
+from layers import project as project_module
+from layers.filter_stack import FilterNode, FilterStack
+from layers.layer import Layer
+from layers.project import ProjectFile, StoredImage, THUMBNAIL_SIZE
+
+CANVAS_SIZE = (700, 400)
+
+
+def assert_same(a, b):
+    assert a.mode == b.mode and a.size == b.size
+    assert ImageChops.difference(a, b).getbbox() is None
+
+
+def noise(size, seed):
+    # Random pixels, so the tiles do not compress to almost nothing
+    return Image.frombytes('RGBA', size, random.Random(seed).randbytes(size[0] * size[1] * 4))
+
+
+def make_layers():
+    background = Layer(Image.linear_gradient('L').resize(CANVAS_SIZE).convert('RGB'), name="Background")
+    paint = Layer(noise((300, 200), 0), name="Paint", visible=False, opacity=60, blend_mode="Multiply")
+    paint.x_offset, paint.y_offset = 40, -10
+    paint.filters = FilterStack([FilterNode("blur", {"radius": 3}), FilterNode("negative", enabled=False)])
+    paint.mask = Image.linear_gradient('L').resize((300, 200))
+    indexed = Image.new('P', (100, 100))
+    indexed.putpalette([0, 0, 0, 255, 0, 0] + [0] * 762)
+    ImageDraw.Draw(indexed).rectangle((10, 10, 50, 50), fill=1)
+    return [background, paint, Layer(indexed, name="Indexed")]
+
+
+def save(path, layers, active_index=1):
+    project = ProjectFile(str(path))
+    project.save(layers, CANVAS_SIZE, active_index)
+    return project
+
+
+def test_layers_survive_a_round_trip(tmp_path):
+    layers = make_layers()
+    save(tmp_path / "doc.mie", layers).close()
+
+    project, loaded, canvas_size, active_index = ProjectFile.open(str(tmp_path / "doc.mie"))
+    assert canvas_size == CANVAS_SIZE and active_index == 1
+    assert [layer.name for layer in loaded] == ["Background", "Paint", "Indexed"]
+
+    paint = loaded[1]
+    assert (paint.visible, paint.opacity, paint.blend_mode) == (False, 60, "Multiply")
+    assert (paint.x_offset, paint.y_offset) == (40, -10)
+    assert [(node.op, node.params, node.enabled) for node in paint.filters] == \
+        [("blur", {"radius": 3}, True), ("negative", {}, False)]
+    assert_same(paint.mask, layers[1].mask)
+
+    for saved, layer in zip(layers, loaded):
+        assert_same(layer.image, saved.image)
+    assert loaded[2].image.getpalette()[:6] == [0, 0, 0, 255, 0, 0]
+    project.close()
+
+
+def test_layers_are_loaded_on_first_use(tmp_path):
+    save(tmp_path / "doc.mie", make_layers()).close()
+
+    project, loaded, _, _ = ProjectFile.open(str(tmp_path / "doc.mie"))
+    source = loaded[0].image_source
+    assert isinstance(source, StoredImage)
+    assert loaded[0].image_size == CANVAS_SIZE
+    # The layer panel shows the stored thumbnail without decoding the layer
+    assert source.thumbnail.size[0] <= THUMBNAIL_SIZE[0] and source.thumbnail.size[1] <= THUMBNAIL_SIZE[1]
+
+    image = loaded[0].image
+    assert loaded[0].image_source is None
+    assert image.size == CANVAS_SIZE
+    assert loaded[1].image_source is not None
+    project.close()
+
+
+def test_unloaded_layers_are_saved_without_decoding_them(tmp_path, monkeypatch):
+    layers = make_layers()
+    save(tmp_path / "doc.mie", layers).close()
+    project, loaded, _, _ = ProjectFile.open(str(tmp_path / "doc.mie"))
+
+    def no_load(self):
+        raise AssertionError("decoded while saving")
+    monkeypatch.setattr(StoredImage, "load", no_load)
+    project.save(loaded, CANVAS_SIZE, 0)
+    copy = save(tmp_path / "copy.mie", loaded)
+    monkeypatch.undo()
+
+    assert all(layer.image_source is not None for layer in loaded)
+    copy.close()
+    project.close()
+    _, reopened, _, _ = ProjectFile.open(str(tmp_path / "copy.mie"))
+    for saved, layer in zip(layers, reopened):
+        assert_same(layer.image, saved.image)
+
+
+def test_resave_writes_only_the_edited_tiles(tmp_path):
+    layers = make_layers()
+    path = tmp_path / "doc.mie"
+    project = save(path, layers)
+    first_size = os.path.getsize(path)
+
+    # Nothing changed: every tile is reused from the file
+    plan = project.prepare_save(layers, CANVAS_SIZE, 1)
+    for _, entry, _ in plan['layers']:
+        assert all(isinstance(tile, tuple) for tile in entry['image']['tiles'].values())
+
+    paint = layers[1]
+    ImageDraw.Draw(paint.image).rectangle((10, 10, 20, 20), fill=(0, 0, 255, 255))
+    paint.mark_dirty((10, 10, 21, 21))
+    plan = project.prepare_save(layers, CANVAS_SIZE, 1)
+    tiles = plan['layers'][1][1]['image']['tiles']
+    assert [tile for tile, value in tiles.items() if isinstance(value, bytes)] == [(0, 0)]
+    project.write(plan)
+    project.finish_save(plan)
+
+    # One tile of 256 x 200 noise, a new thumbnail and the index were appended
+    grown = os.path.getsize(path) - first_size
+    assert 0 < grown < 256 * 200 * 4 * 1.1
+    project.close()
+
+    project, loaded, _, _ = ProjectFile.open(str(path))
+    for saved, layer in zip(layers, loaded):
+        assert_same(layer.image, saved.image)
+    project.close()
+
+
+def test_compacting_keeps_unloaded_images_readable(tmp_path, monkeypatch):
+    monkeypatch.setattr(project_module, "COMPACT_MIN_BYTES", 0)
+    layers = [Layer(noise((300, 300), 1), name="Noise")]
+    path = tmp_path / "doc.mie"
+    save(path, layers).close()
+    project, loaded, _, _ = ProjectFile.open(str(path))
+    stored = loaded[0].image_source
+    expected = layers[0].image
+
+    # Replacing the image leaves most of the file unused, so the next save rewrites it
+    # with the tiles of the unloaded image and the new ones only
+    layer = Layer(noise((300, 300), 2), name="Other")
+    project.save([layer], CANVAS_SIZE, 0)
+    layer.image = noise((300, 300), 3)
+    project.save([layer], CANVAS_SIZE, 0)
+
+    assert os.path.getsize(path) < 2.5 * 300 * 300 * 4
+    assert_same(stored.load(), expected)
+    project.close()
@@ -0,0 +1,102 @@
+import pytest
+from PIL import Image, ImageChops
+
+from tools import svg_image
+
+SVG = b"""<svg xmlns="http://www.w3.org/2000/svg" width="200" height="100">
+  <rect x="0" y="0" width="100" height="100" fill="#ff0000"/>
+  <circle cx="150" cy="50" r="40" fill="#0000ff"/>
+</svg>"""
+
+
+def assert_same(a, b):
+    assert a.mode == b.mode and a.size == b.size
+    assert ImageChops.difference(a, b).getbbox() is None
+
+
+def assert_close(a, b):
+    # Antialiased edges may round differently when a region is drawn on its own
+    assert a.mode == b.mode and a.size == b.size
+    assert max(high for _, high in ImageChops.difference(a, b).getextrema()) <= 1
+
+
+class FakeDocument:
+    """Rasterizes a gradient, counting the renders"""
+
+    size = (200, 100)
+
+    def __init__(self):
+        self.renders = []
+
+    def render(self, size=None, region=None):
+        self.renders.append((size, region))
+        image = Image.linear_gradient('L').resize(size or self.size).convert('RGBA')
+        return image.crop(region) if region else image
+
+
+def test_zoomed_in_views_reuse_the_last_raster():
+    document = FakeDocument()
+    pyramid = svg_image.SvgPyramid(document, document.render())
+    document.renders.clear()
+
+    level, scale = pyramid.level_for_zoom(4)
+    assert scale == 4 and level.size == (800, 400)
+    full = Image.linear_gradient('L').resize((800, 400)).convert('RGBA')
+
+    assert_same(level.crop((100, 100, 300, 200)), full.crop((100, 100, 300, 200)))
+    assert document.renders == [((800, 400), (0, 50, 400, 250))]
+
+    # Panning within the margin, and a level made for the next render, use the raster
+    level, _ = pyramid.level_for_zoom(4)
+    assert_same(level.crop((150, 60, 350, 160)), full.crop((150, 60, 350, 160)))
+    assert len(document.renders) == 1
+
+    # Leaving it, or zooming, draws again
+    level.crop((500, 100, 700, 200))
+    pyramid.level_for_zoom(2)[0].crop((0, 0, 100, 100))
+    assert len(document.renders) == 3
+
+
+def test_zoomed_out_views_use_downscaled_levels():
+    document = FakeDocument()
+    image = document.render()
+    pyramid = svg_image.SvgPyramid(document, image)
+    assert pyramid.level_for_zoom(1) == (image, 1.0)
+    level, scale = pyramid.level_for_zoom(0.5)
+    assert (level.size, scale) == ((100, 50), 0.5)
+
+
+@pytest.fixture
+def svg_path(tmp_path):
+    if svg_image.cairosvg is None:
+        pytest.skip("cairosvg or the cairo library is not available")
+    path = tmp_path / "drawing.svg"
+    path.write_bytes(SVG)
+    return str(path)
+
+
+def test_document_is_rasterized_at_any_size(svg_path):
+    document = svg_image.SvgDocument(svg_path)
+    assert document.size == (200, 100)
+
+    image = document.render()
+    assert image.size == (200, 100)
+    assert image.getpixel((50, 50)) == (255, 0, 0, 255)
+    assert image.getpixel((150, 50)) == (0, 0, 255, 255)
+
+    large = document.render((800, 400))
+    assert large.getpixel((200, 200)) == (255, 0, 0, 255)
+    # A region is drawn as it is in the whole raster
+    assert_close(document.render((800, 400), (500, 100, 700, 300)), large.crop((500, 100, 700, 300)))
+
+
+def test_zoomed_in_crop_matches_a_whole_raster(svg_path):
+    document = svg_image.SvgDocument(svg_path)
+    pyramid = svg_image.SvgPyramid(document, document.render())
+    level, _ = pyramid.level_for_zoom(3)
+    whole = document.render((600, 300))
+    for box in [(0, 0, 600, 300), (250, 50, 450, 250), (-20, -20, 100, 100)]:
+        expected = Image.new('RGBA', (box[2] - box[0], box[3] - box[1]))
+        expected.paste(whole.crop((max(0, box[0]), max(0, box[1]), box[2], box[3])),
+                       (max(0, -box[0]), max(0, -box[1])))
+        assert_close(level.crop(box), expected)
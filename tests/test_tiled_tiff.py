@@ -0,0 +1,133 @@
+import numpy
+import pytest
+from PIL import Image, ImageChops
+
+from tools import tiled_tiff
+
+tifffile = pytest.importorskip("tifffile")
+
+SIZE = (700, 500)
+BOXES = [(0, 0, 700, 500), (10, 20, 300, 260), (250, 100, 700, 101), (600, 400, 700, 500)]
+
+
+def photo(mode='RGB'):
+    image = Image.merge('RGB', [Image.linear_gradient('L').resize(SIZE),
+                                Image.effect_noise(SIZE, 60),
+                                Image.radial_gradient('L').resize(SIZE)])
+    return image.convert(mode)
+
+
+def assert_same(a, b):
+    assert a.mode == b.mode and a.size == b.size
+    assert ImageChops.difference(a, b).getbbox() is None
+
+
+def write(path, image, **options):
+    tifffile.imwrite(str(path), numpy.asarray(image), photometric='minisblack' if image.mode == 'L' else 'rgb',
+                     **options)
+    return str(path)
+
+
+def assert_reads_like(path, image):
+    tiff = tiled_tiff.TiledTiff(path)
+    try:
+        for box in BOXES:
+            assert_same(tiff.crop(box), image.crop(box))
+        # Levels missing from the file are halved from the tiles of the level above
+        for index in (1, 2):
+            level = tiff.level(index)
+            expected = image
+            for _ in range(index):
+                expected = expected.reduce(2)
+            assert_same(level.crop((0, 0) + level.size), expected)
+    finally:
+        tiff.close()
+
+
+LAYOUTS = {
+    "strips": dict(rowsperstrip=64),
+    "single strip": dict(rowsperstrip=SIZE[1]),
+    "tiles": dict(tile=(256, 128)),
+    "compressed strips": dict(rowsperstrip=64, compression='zlib'),
+    "compressed tiles": dict(tile=(256, 256), compression='zlib'),
+}
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+@pytest.mark.parametrize("mode", ['RGB', 'L', 'RGBA'])
+def test_tifffile_reads_like_a_full_decode(tmp_path, monkeypatch, layout, mode):
+    # Bands of 7 rows, so they straddle strips
+    monkeypatch.setattr(tiled_tiff, "STRIP_BAND_BYTES", 7 * SIZE[0] * len(mode))
+    image = photo(mode)
+    assert_reads_like(write(tmp_path / "image.tif", image, **LAYOUTS[layout]), image)
+
+
+@pytest.mark.parametrize("layout", ["strips", "single strip", "tiles"])
+def test_pillow_reads_uncompressed_files_like_a_full_decode(tmp_path, monkeypatch, layout):
+    monkeypatch.setattr(tiled_tiff, "tifffile", None)
+    monkeypatch.setattr(tiled_tiff, "STRIP_BAND_BYTES", 7 * SIZE[0] * 3)
+    image = photo()
+    assert_reads_like(write(tmp_path / "image.tif", image, **LAYOUTS[layout]), image)
+
+
+def test_pillow_single_strip_file_is_read_in_bands(tmp_path, monkeypatch):
+    monkeypatch.setattr(tiled_tiff, "tifffile", None)
+    path = str(tmp_path / "image.tif")
+    image = photo()
+    image.save(path)
+
+    tiff = tiled_tiff.TiledTiff(path)
+    assert tiff.levels[0].tile_size == (SIZE[0], tiled_tiff.STRIP_BAND_BYTES // (SIZE[0] * 3))
+    assert_same(tiff.crop((5, 5, 100, 100)), image.crop((5, 5, 100, 100)))
+    tiff.close()
+
+
+def test_pyramid_pages_are_used_for_reduced_levels(tmp_path):
+    image = photo()
+    half = image.resize((350, 250))
+    path = str(tmp_path / "pyramid.tif")
+    with tifffile.TiffWriter(path) as tif:
+        tif.write(numpy.asarray(image), photometric='rgb', tile=(256, 256), subifds=1)
+        tif.write(numpy.asarray(half), photometric='rgb', tile=(256, 256), subfiletype=1)
+
+    tiff = tiled_tiff.TiledTiff(path)
+    level, scale = tiff.level_for_zoom(0.5)
+    assert scale == 0.5
+    assert_same(level.crop((0, 0, 350, 250)), half)
+    tiff.close()
+
+
+def test_files_with_tiles_larger_than_the_cache_are_refused(tmp_path, monkeypatch):
+    monkeypatch.setattr(tiled_tiff.tile_cache, "max_bytes", 100 * 1024)
+    monkeypatch.setattr(tiled_tiff, "STRIP_BAND_BYTES", 20 * 1024)
+    monkeypatch.setattr(tiled_tiff, "TILED_MIN_BYTES", 0)
+    image = photo()
+
+    # Uncompressed strips are read in bands, whatever their size
+    single = write(tmp_path / "single.tif", image, rowsperstrip=SIZE[1])
+    assert tiled_tiff.should_open_tiled(single)
+
+    compressed = write(tmp_path / "compressed.tif", image, rowsperstrip=SIZE[1], compression='zlib')
+    assert not tiled_tiff.can_open(compressed)
+    assert not tiled_tiff.should_open_tiled(compressed)
+    with pytest.raises(ValueError):
+        tiled_tiff.TiledTiff(compressed)
+
+
+def test_edits_that_would_decode_a_tiled_file_on_the_main_thread_are_refused(editor, tmp_path, monkeypatch):
+    from tools import tools as tools_module
+    shown = []
+    monkeypatch.setattr(tools_module.messagebox, "showinfo", lambda title, message: shown.append(message))
+    tiff = tiled_tiff.TiledTiff(write(tmp_path / "image.tif", photo(), tile=(256, 256)))
+    editor.original_image = editor.current_image = tiff
+
+    assert not editor.tools.start_stroke()
+    assert editor.history_pushes == 0
+    assert shown == ["Drawing is not available for large TIFF files read a tile at a time"]
+
+    # Reset shows the file as it is
+    editor.current_image = photo()
+    editor.tools.reset_image()
+    assert editor.current_image is tiff
+    assert tiff._image is None
+    tiff.close()
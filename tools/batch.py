@@ -0,0 +1,141 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from PIL import Image
+
+# When run as a script, import from the repository root rather than from the
+# tools directory, where "tools" would resolve to tools/tools.py
+if not __package__:
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from tools import operations
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.tif', '.webp', '.ppm', '.pgm', '.pbm')
+
+
+def find_images(input_dir, recursive=False):
+    """Yield the paths of the images in input_dir, relative to it, in sorted order"""
+    if recursive:
+        for root, dirs, files in os.walk(input_dir):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.relpath(os.path.join(root, name), input_dir)
+    else:
+        for name in sorted(os.listdir(input_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(os.path.join(input_dir, name)):
+                yield name
+
+
+def output_path(relative_path, output_dir, output_format=None):
+    path = os.path.join(output_dir, relative_path)
+    if output_format:
+        path = os.path.splitext(path)[0] + "." + output_format.lstrip(".")
+    return path
+
+
+def process_file(source, destination, steps, save_options):
+    """Apply the steps to one file and save the result.
+
+    Runs in a worker process and returns (load, process, save) times in milliseconds.
+    """
+    start = time.perf_counter()
+    with Image.open(source) as image:
+        image.load()
+    loaded = time.perf_counter()
+
+    image = operations.apply_recipe(image, steps)
+    processed = time.perf_counter()
+
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    operations.flatten_for_format(image, destination).save(destination, **save_options)
+    saved = time.perf_counter()
+
+    return ((loaded - start) * 1000, (processed - loaded) * 1000, (saved - processed) * 1000)
+
+
+def run_batch(recipe, input_dir, output_dir, workers=None, max_in_flight=None, recursive=False, report=print):
+    """Process every image in input_dir with recipe on a pool of worker processes.
+
+    At most max_in_flight files are submitted at a time, so memory use stays bounded
+    however many files there are. report is called with one line per file.
+    Returns the number of files that failed.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    steps = recipe["operations"]
+    save_options = recipe.get("save", {})
+
+    files = find_images(input_dir, recursive)
+    pending = {}
+    done_count = 0
+    failed = 0
+    totals = [0.0, 0.0, 0.0]
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            # Keep the pool fed without queueing every file up front
+            for relative_path in files:
+                destination = output_path(relative_path, output_dir, recipe.get("format"))
+                future = pool.submit(process_file, os.path.join(input_dir, relative_path),
+                                     destination, steps, save_options)
+                pending[future] = relative_path
+                if len(pending) >= max_in_flight:
+                    break
+
+            if not pending:
+                break
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                relative_path = pending.pop(future)
+                done_count += 1
+                try:
+                    times = future.result()
+                except Exception as e:
+                    failed += 1
+                    report(f"FAILED {relative_path}: {e}")
+                    continue
+                for i, value in enumerate(times):
+                    totals[i] += value
+                report(f"{relative_path}: load {times[0]:.1f} ms, process {times[1]:.1f} ms, "
+                       f"save {times[2]:.1f} ms, total {sum(times):.1f} ms")
+
+    elapsed = time.perf_counter() - start
+    succeeded = done_count - failed
+    report(f"Processed {succeeded} of {done_count} files in {elapsed:.2f} s with {workers} workers")
+    if succeeded:
+        report(f"Average per file: load {totals[0] / succeeded:.1f} ms, process {totals[1] / succeeded:.1f} ms, "
+               f"save {totals[2] / succeeded:.1f} ms")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply an editing recipe to a directory of images")
+    parser.add_argument("recipe", help="JSON recipe: a list of steps such as {\"op\": \"blur\", \"radius\": 2}")
+    parser.add_argument("input_dir", help="Directory of images to process")
+    parser.add_argument("output_dir", help="Directory to write the results to")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Files submitted to the pool at once (default: twice the workers)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Include images in subdirectories")
+    parser.add_argument("-f", "--format", default=None, help="Output file extension, overriding the recipe")
+    args = parser.parse_args(argv)
+
+    try:
+        recipe = operations.load_recipe(args.recipe)
+    except (OSError, ValueError) as e:
+        parser.error(f"Invalid recipe: {e}")
+    if args.format:
+        recipe["format"] = args.format
+
+    failed = run_batch(recipe, args.input_dir, args.output_dir, args.workers, args.max_in_flight, args.recursive)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+# Luma weights (ITU-R 601-2), the same ones Pillow uses to convert RGB to L
+LUMA = (0.299, 0.587, 0.114)
+
+IDENTITY_LUT = list(range(256))
+
+
+def _normalize_matrix(matrix):
+    """Return matrix as the 12-tuple of (r, g, b, offset) rows expected by Image.convert.
+
+    3x3 matrices have no offsets, 3x4 matrices carry the offset in their last column,
+    and 4x4 matrices are homogeneous affine transforms whose last row is ignored.
+    Offsets are in 0-255 units.
+    """
+    rows = [list(row) for row in matrix]
+    if len(rows) == 4:
+        rows = rows[:3]
+    if len(rows) != 3:
+        raise ValueError("Color matrix must have 3 or 4 rows")
+
+    values = []
+    for row in rows:
+        if len(row) == 3:
+            row = row + [0]
+        if len(row) != 4:
+            raise ValueError("Color matrix rows must have 3 or 4 columns")
+        values.extend(float(v) for v in row)
+    return tuple(values)
+
+
+def _split_alpha(image):
+    """Return (rgb, alpha) for image, with alpha None when the image has no transparency"""
+    if image.mode == 'RGB':
+        return image, None
+    if image.mode == 'RGBA':
+        return image.convert('RGB'), image.getchannel('A')
+    if 'A' in image.getbands() or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        return image.convert('RGB'), image.getchannel('A')
+    return image.convert('RGB'), None
+
+
+def apply_color_matrix(image, matrix):
+    """Transform the colors of image with a color matrix in a single pass.
+
+    Each output channel is a weighted sum of the input R, G and B channels plus an
+    optional offset. The alpha channel, if any, is kept unchanged.
+    """
+    rgb, alpha = _split_alpha(image)
+    result = rgb.convert('RGB', _normalize_matrix(matrix))
+    if alpha is not None:
+        result.putalpha(alpha)
+    return result
+
+
+def apply_channel_luts(image, luts):
+    """Map each color channel of image through a 256-entry lookup table in a single pass.
+
+    luts is either one table used for R, G and B, or a sequence of three tables.
+    The alpha channel, if any, is kept unchanged.
+    """
+    if len(luts) == 256 and not isinstance(luts[0], (list, tuple)):
+        luts = (luts, luts, luts)
+    if len(luts) != 3 or any(len(lut) != 256 for lut in luts):
+        raise ValueError("Expected one or three lookup tables of 256 entries")
+
+    rgb, alpha = _split_alpha(image)
+    if alpha is not None:
+        rgb.putalpha(alpha)
+        return rgb.point(list(luts[0]) + list(luts[1]) + list(luts[2]) + IDENTITY_LUT)
+    return rgb.point(list(luts[0]) + list(luts[1]) + list(luts[2]))
+
+
+def grayscale_matrix():
+    """Matrix replacing each channel with the luma of the pixel"""
+    return [LUMA, LUMA, LUMA]
+
+
+def sepia_matrix():
+    """Matrix giving the luma a warm brown tone"""
+    return [[1.2 * w for w in LUMA],
+            [0.95 * w for w in LUMA],
+            [0.7 * w for w in LUMA]]
+
+
+def tint_matrix(color, strength=0.5):
+    """Matrix blending the image towards its luma colored with color, an (r, g, b) tuple"""
+    rows = []
+    for channel, value in enumerate(color[:3]):
+        identity = [1.0 if i == channel else 0.0 for i in range(3)]
+        tinted = [value / 255 * w for w in LUMA]
+        rows.append([(1 - strength) * a + strength * b for a, b in zip(identity, tinted)])
+    return rows
+
+
+def saturation_matrix(factor):
+    """Matrix scaling how far each color is from its luma, like ImageEnhance.Color"""
+    return [[(1 - factor) * w + (factor if i == channel else 0) for i, w in enumerate(LUMA)]
+            for channel in range(3)]
+
+
+def brightness_lut(factor):
+    """Lookup table scaling a channel like ImageEnhance.Brightness"""
+    return [min(255, int(i * factor)) for i in range(256)]
+
+
+def brightness_contrast_lut(brightness=1.0, contrast=1.0, histogram=None):
+    """Lookup table applying a brightness factor and then a contrast factor.
+
+    This matches ImageEnhance.Brightness followed by ImageEnhance.Contrast. Contrast
+    is stretched around the mean gray level of the brightened image, worked out
+    from histogram, the 256-entry luma histogram of the image before the brightness
+    change. Without a histogram the middle gray level is used.
+    """
+    lut = brightness_lut(brightness)
+    if contrast == 1.0:
+        return lut
+
+    mean = 128
+    if histogram:
+        total = sum(histogram)
+        if total:
+            mean = int(sum(count * value for count, value in zip(histogram, lut)) / total + 0.5)
+
+    return [max(0, min(255, int(mean + contrast * (value - mean)))) for value in lut]
+
+
+def luma_histogram(image):
+    """Return the 256-entry histogram of the luma of image"""
+    return image.convert('L').histogram()
+
+
+def negative_lut():
+    """Lookup table inverting a channel"""
+    return [255 - i for i in range(256)]
+
+
+def grayscale(image):
+    return apply_color_matrix(image, grayscale_matrix())
+
+
+def sepia(image):
+    return apply_color_matrix(image, sepia_matrix())
+
+
+def negative(image):
+    return apply_channel_luts(image, negative_lut())
+
+
+def tint(image, color, strength=0.5):
+    return apply_color_matrix(image, tint_matrix(color, strength))
@@ -0,0 +1,90 @@
+import io
+import os
+import time
+from PIL import Image
+
+from tools import operations
+
+# File extension -> Pillow format name
+FORMATS = {
+    '.png': 'PNG',
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.webp': 'WEBP',
+    '.bmp': 'BMP',
+    '.gif': 'GIF',
+    '.tif': 'TIFF',
+    '.tiff': 'TIFF',
+}
+
+# Encoder settings offered for each format, with their defaults
+DEFAULT_OPTIONS = {
+    'PNG': {'compress_level': 6},
+    'JPEG': {'quality': 95, 'optimize': False, 'progressive': False},
+    'WEBP': {'quality': 90},
+}
+
+# Pixels in the downscaled sample encoded to estimate the size and time of an export
+SAMPLE_PIXELS = 512 * 512
+
+
+def format_for_path(path):
+    """The Pillow format name for the extension of path"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"Unsupported file type: {ext or 'no extension'}")
+    return FORMATS[ext]
+
+
+def default_options(format):
+    return dict(DEFAULT_OPTIONS.get(format, {}))
+
+
+def export_image(image, path, options=None):
+    """Encode image to path with the encoder options of its format.
+
+    The image is written as it is, flattened only if the format needs it, and the
+    encoder reads it directly rather than from a copy. It is written next to path
+    first, so a failed export leaves an existing file untouched.
+    """
+    format = format_for_path(path)
+    if options is None:
+        options = default_options(format)
+    image = operations.flatten_for_format(image, path)
+
+    temp_path = path + '.tmp'
+    try:
+        image.save(temp_path, format, **options)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def make_sample(image, pixels=SAMPLE_PIXELS):
+    """A downscaled copy of image of about pixels pixels, for estimate()"""
+    scale = min(1.0, (pixels / (image.width * image.height)) ** 0.5)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    if hasattr(image, 'level_for_zoom'):
+        # Files read a tile at a time are sampled from their smallest level that is large enough
+        level, _ = image.level_for_zoom(scale)
+        image = level.crop((0, 0) + level.size)
+    return image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+
+
+def estimate(sample, full_size, path, options):
+    """Return the (bytes, seconds) an export of full_size pixels to path would take, from encoding sample.
+
+    Both are scaled up from the sample by the ratio of pixel counts. A downscaled
+    sample holds more detail per pixel than the full image and the encoder has a
+    fixed cost per call, so both are usually overestimates.
+    """
+    sample = operations.flatten_for_format(sample, path)
+    buffer = io.BytesIO()
+    start = time.perf_counter()
+    sample.save(buffer, format_for_path(path), **options)
+    elapsed = time.perf_counter() - start
+
+    ratio = (full_size[0] * full_size[1]) / (sample.width * sample.height)
+    return int(buffer.tell() * ratio), elapsed * ratio
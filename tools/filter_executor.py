@@ -0,0 +1,129 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageFilter
+
+# Images with fewer pixels than this are filtered in one piece; splitting them costs more than it saves
+MIN_PARALLEL_PIXELS = 1024 * 1024
+
+# Strips per worker, so that a slow strip does not leave the other workers idle
+STRIPS_PER_WORKER = 2
+
+# Strips are never made thinner than this many rows, not counting their margins
+MIN_STRIP_HEIGHT = 64
+
+
+def filter_margin(image_filter):
+    """Return how many pixels around an output pixel image_filter reads, or None if unknown.
+
+    Pillow filters clamp or copy pixels at the image edges, so a strip filtered
+    with at least this many extra rows above and below gives exactly the same
+    result inside the strip as filtering the whole image.
+    """
+    if isinstance(image_filter, type):
+        image_filter = image_filter()
+
+    if isinstance(image_filter, (ImageFilter.GaussianBlur, ImageFilter.UnsharpMask)):
+        # Gaussian blurs are three box blur passes, each reaching int(radius) + 1 pixels
+        return 3 * (int(_largest_radius(image_filter.radius)) + 1)
+    if isinstance(image_filter, ImageFilter.BoxBlur):
+        return int(_largest_radius(image_filter.radius)) + 1
+    if isinstance(image_filter, (ImageFilter.Kernel, ImageFilter.BuiltinFilter)):
+        # filterargs is (size, scale, offset, kernel) for built-in and custom kernels
+        width, height = image_filter.filterargs[0]
+        return max(width, height) // 2
+    if isinstance(image_filter, (ImageFilter.RankFilter, ImageFilter.ModeFilter)):
+        return image_filter.size // 2
+    return None
+
+
+def _largest_radius(radius):
+    """Return the larger radius of a filter that may have separate x and y radii"""
+    if isinstance(radius, (list, tuple)):
+        return max(radius)
+    return radius
+
+
+class FilterExecutor:
+    """Applies Pillow filters to large images in overlapping horizontal strips in parallel.
+
+    Each strip is extended by the reach of the filter on both sides, filtered on a
+    worker thread and cropped back before it is pasted into the result, so the seams
+    are exact and the output is identical to filtering the image in one piece.
+    Pillow releases the GIL while filtering, so threads run the strips concurrently.
+    """
+
+    def __init__(self, workers=None, use_multithreading=True):
+        self.workers = workers or os.cpu_count() or 1
+        self.use_multithreading = use_multithreading
+        self._pool = None
+        self._pool_workers = 0
+
+    def apply(self, image, image_filter, progress=None):
+        """Return image filtered with image_filter.
+
+        progress, if given, is called with the fraction of the strips done after
+        each strip; an exception it raises stops the filter.
+        """
+        margin = filter_margin(image_filter)
+        if (not self.use_multithreading or self.workers < 2 or margin is None
+                or image.width * image.height < MIN_PARALLEL_PIXELS or image.mode == 'P'):
+            return self._apply_serial(image, image_filter, progress)
+
+        strips = self.strips(image.size, margin)
+        if len(strips) < 2:
+            return self._apply_serial(image, image_filter, progress)
+
+        # Make sure the image is loaded once here rather than in every worker
+        image.load()
+
+        def run(strip):
+            box, inner = strip
+            return image.crop(box).filter(image_filter).crop(inner)
+
+        result = Image.new(image.mode, image.size)
+        tiles = self._get_pool().map(run, strips)
+        for done, ((box, inner), tile) in enumerate(zip(strips, tiles), 1):
+            result.paste(tile, (box[0] + inner[0], box[1] + inner[1]))
+            if progress:
+                progress(done / len(strips))
+        return result
+
+    @staticmethod
+    def _apply_serial(image, image_filter, progress):
+        result = image.filter(image_filter)
+        if progress:
+            progress(1.0)
+        return result
+
+    def strips(self, size, margin):
+        """Return (box, inner) for each strip of an image of the given size.
+
+        box is the strip with its margins in image coordinates and inner is the
+        part of the filtered strip that goes into the result, relative to box.
+        """
+        width, height = size
+        count = min(self.workers * STRIPS_PER_WORKER, max(1, height // max(MIN_STRIP_HEIGHT, margin)))
+        step = -(-height // count)
+
+        strips = []
+        for upper in range(0, height, step):
+            lower = min(height, upper + step)
+            box_upper = max(0, upper - margin)
+            box_lower = min(height, lower + margin)
+            strips.append(((0, box_upper, width, box_lower),
+                           (0, upper - box_upper, width, lower - box_upper)))
+        return strips
+
+    def _get_pool(self):
+        """Return the worker pool, starting it or resizing it on first use"""
+        if self._pool is None or self._pool_workers != self.workers:
+            self.shutdown()
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="filter")
+            self._pool_workers = self.workers
+        return self._pool
+
+    def shutdown(self):
+        """Stop the worker threads"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
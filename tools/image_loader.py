@@ -0,0 +1,52 @@
+from PIL import Image
+
+
+def load_image(path):
+    """Decode the first frame of the image at path fully and close the file"""
+    with Image.open(path) as image:
+        image.load()
+        return image
+
+
+def open_preview(path, size):
+    """Return a quick preview of the image at path that fits in size, with the full image size.
+
+    JPEG files are decoded in draft mode at 1/2, 1/4 or 1/8 scale and multi-page
+    TIFF files use their smallest page that still covers size, so the preview
+    costs a fraction of a full decode. Other formats would need a full decode,
+    so (None, full size) is returned for them instead.
+    """
+    with Image.open(path) as image:
+        full_size = image.size
+        if image.format == 'JPEG':
+            # thumbnail() switches the decoder to draft mode at the smallest scale that
+            # still covers size before reading the pixels
+            image.thumbnail(size, Image.BILINEAR, reducing_gap=1.0)
+            return image, full_size
+
+        if image.format == 'TIFF' and getattr(image, 'n_frames', 1) > 1:
+            page = _smallest_page(image, size)
+            if page is not None:
+                image.seek(page)
+                image.thumbnail(size)
+                return image, full_size
+
+    return None, full_size
+
+
+def _smallest_page(image, size):
+    """Index of the smallest reduced-resolution page of a TIFF pyramid that covers size"""
+    full_width, full_height = image.size
+    best = None
+    for index in range(1, image.n_frames):
+        image.seek(index)
+        width, height = image.size
+        # Only pages with the aspect ratio of the first one are reduced copies of it
+        if abs(width / full_width - height / full_height) > 0.01:
+            continue
+        if width >= min(size[0], full_width) and height >= min(size[1], full_height):
+            if best is None or width < best[1]:
+                best = (index, width)
+    image.seek(0)
+    return best[0] if best else None
+
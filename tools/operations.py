@@ -0,0 +1,174 @@
+import json
+from PIL import Image, ImageDraw, ImageFilter, ImageFont, ImageOps
+
+from tools import color_engine
+
+
+def resize(image, width, height, method="LANCZOS"):
+    return image.resize((int(width), int(height)), getattr(Image, method))
+
+
+def crop(image, left, upper, right, lower):
+    return image.crop((left, upper, right, lower))
+
+
+def rotate(image, angle):
+    # expand=True keeps the whole rotated image
+    return image.rotate(angle, expand=True, resample=Image.BICUBIC)
+
+
+def flip_horizontal(image):
+    return ImageOps.mirror(image)
+
+
+def flip_vertical(image):
+    return ImageOps.flip(image)
+
+
+def blur(image, radius=2):
+    return image.filter(ImageFilter.GaussianBlur(radius=radius))
+
+
+def sharpen(image):
+    return image.filter(ImageFilter.SHARPEN)
+
+
+def edge_detection(image):
+    return image.filter(ImageFilter.FIND_EDGES)
+
+
+def emboss(image):
+    return image.filter(ImageFilter.EMBOSS)
+
+
+def grayscale(image):
+    return color_engine.grayscale(image)
+
+
+def sepia(image):
+    return color_engine.sepia(image)
+
+
+def negative(image):
+    return color_engine.negative(image)
+
+
+def tint(image, color=(255, 160, 60), strength=0.5):
+    return color_engine.tint(image, tuple(color), strength)
+
+
+def adjust(image, brightness=0, contrast=0, saturation=0):
+    """Brightness, contrast and saturation in slider units (-100 to 100)"""
+    if brightness or contrast:
+        lut = color_engine.brightness_contrast_lut(
+            1.0 + brightness / 100.0,
+            1.0 + contrast / 100.0,
+            color_engine.luma_histogram(image)
+        )
+        image = color_engine.apply_channel_luts(image, lut)
+    if saturation:
+        image = color_engine.apply_color_matrix(image, color_engine.saturation_matrix(1.0 + saturation / 100.0))
+    return image
+
+
+def text(image, text, position=None, font_family="arial.ttf", font_size=24, color="black"):
+    """Draw text at position, or centered when no position is given"""
+    try:
+        font = ImageFont.truetype(font_family, font_size)
+    except OSError:
+        font = ImageFont.load_default()
+
+    if position is None:
+        position = (image.width // 2, image.height // 2)
+        anchor = "mm"  # Center the text at the position
+    else:
+        anchor = "lt"  # Top-left anchoring for direct placement
+
+    image = image.copy()
+    ImageDraw.Draw(image).text(tuple(position), text, fill=tuple(color) if isinstance(color, list) else color,
+                               font=font, anchor=anchor)
+    return image
+
+
+# Operations that recipe steps can name. Each takes an image and keyword
+# parameters and returns a new image, without touching the GUI.
+OPERATIONS = {
+    "resize": resize,
+    "crop": crop,
+    "rotate": rotate,
+    "flip_horizontal": flip_horizontal,
+    "flip_vertical": flip_vertical,
+    "blur": blur,
+    "sharpen": sharpen,
+    "edge_detection": edge_detection,
+    "emboss": emboss,
+    "grayscale": grayscale,
+    "sepia": sepia,
+    "negative": negative,
+    "tint": tint,
+    "adjust": adjust,
+    "text": text,
+}
+
+
+def apply_step(image, step):
+    """Apply one recipe step, a dict naming the operation in "op" along with its parameters.
+
+    Steps recorded by the editor also name the layer they were applied to under
+    "layer"; it is ignored here, as recipes work on flat images.
+    """
+    params = dict(step)
+    op = params.pop("op", None)
+    params.pop("layer", None)
+    if op not in OPERATIONS:
+        raise ValueError(f"Unknown operation: {op}")
+    return OPERATIONS[op](image, **params)
+
+
+def apply_recipe(image, steps):
+    """Apply a list of recipe steps in order"""
+    for step in steps:
+        image = apply_step(image, step)
+    return image
+
+
+def validate_recipe(steps):
+    """Raise ValueError if steps is not a list of steps naming known operations"""
+    if not isinstance(steps, list):
+        raise ValueError("A recipe must be a list of steps")
+    for index, step in enumerate(steps):
+        if not isinstance(step, dict) or step.get("op") not in OPERATIONS:
+            raise ValueError(f"Step {index + 1} does not name a known operation: {step!r}")
+
+
+def load_recipe(path):
+    """Read a recipe file: a list of steps, or an object with the steps under "operations".
+
+    An object may also give "format" (an output file extension such as "jpg")
+    and "save" (keyword arguments for Image.save, such as {"quality": 90}).
+    """
+    with open(path, 'r') as f:
+        recipe = json.load(f)
+    if isinstance(recipe, list):
+        recipe = {"operations": recipe}
+    validate_recipe(recipe.get("operations"))
+    return recipe
+
+
+def save_recipe(path, steps):
+    """Write steps to path as a recipe file"""
+    with open(path, 'w') as f:
+        json.dump({"operations": steps}, f, indent=4)
+
+
+def flatten_for_format(image, path):
+    """Return image in a mode that can be saved to path, dropping alpha onto white for JPEG"""
+    if path.lower().endswith(('.jpg', '.jpeg')):
+        if image.mode == 'RGBA':
+            rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+            # The alpha of an RGBA mask is used directly, without extracting it as a band
+            rgb_image.paste(image, mask=image)
+            return rgb_image
+        if image.mode != 'RGB':
+            return image.convert('RGB')
+    return image
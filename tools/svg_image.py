@@ -0,0 +1,156 @@
+import io
+import sys
+from PIL import Image
+
+from utils.image_pyramid import ImagePyramid
+
+# cairosvg draws SVG files with cairo. OSError is raised when the cairo library
+# itself cannot be loaded.
+try:
+    import cairosvg
+    from cairosvg.parser import Tree
+    from cairosvg.surface import PNGSurface, cairo
+except (ImportError, OSError):
+    cairosvg = None
+
+# Resolution used for SVG lengths given in physical units
+SVG_DPI = 96
+
+if cairosvg is not None:
+    class _Surface(PNGSurface):
+        """Draws an SVG tree scaled to output_size, keeping only the pixels inside region"""
+
+        def __init__(self, tree, output_size, region):
+            self.region = region
+            super().__init__(tree, None, SVG_DPI, output_width=output_size[0], output_height=output_size[1])
+
+        def _create_surface(self, width, height):
+            width = int(round(width))
+            height = int(round(height))
+            left, upper, right, lower = self.region or (0, 0, width, height)
+            surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, right - left, lower - upper)
+            # The drawing keeps the coordinates of the whole output
+            surface.set_device_offset(-left, -upper)
+            return surface, width, height
+
+    class _SizeSurface(PNGSurface):
+        """Works out the size of an SVG tree without drawing it"""
+
+        def _create_surface(self, width, height):
+            return cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1), int(round(width)), int(round(height))
+
+        def draw(self, node):
+            pass
+
+
+def _surface_image(surface):
+    """The pixels of a cairo image surface as an RGBA image"""
+    surface.flush()
+    size = (surface.get_width(), surface.get_height())
+    if sys.byteorder == 'little':
+        # Premultiplied ARGB words in little-endian order are BGRa bytes
+        return Image.frombytes('RGBA', size, bytes(surface.get_data()), 'raw', 'BGRa', surface.get_stride())
+    buffer = io.BytesIO()
+    surface.write_to_png(buffer)
+    buffer.seek(0)
+    with Image.open(buffer) as image:
+        return image.convert('RGBA')
+
+
+class SvgDocument:
+    """An SVG file rasterized in memory, at any size and one region at a time if needed"""
+
+    def __init__(self, path):
+        if cairosvg is None:
+            raise ImportError("SVG support requires the cairosvg package. Please install it with: pip install cairosvg")
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        # The size the file gives the drawing, in pixels
+        surface = _SizeSurface(self._tree(), None, SVG_DPI)
+        self.size = (surface.width, surface.height)
+
+    def _tree(self):
+        # The path lets references to other files resolve from the directory of this one.
+        # The tree is parsed for each render, as drawing may modify it.
+        return Tree(bytestring=self.data, url=self.path)
+
+    def render(self, size=None, region=None):
+        """Rasterize the drawing scaled to size, only the part inside region if one is given"""
+        size = size or self.size
+        return _surface_image(_Surface(self._tree(), size, region).cairo)
+
+
+class _VectorLevel:
+    """The drawing at one scale, rasterized a region at a time as it is cropped"""
+
+    def __init__(self, pyramid, size):
+        self.pyramid = pyramid
+        self.size = size
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    def crop(self, box):
+        left, upper, right, lower = (int(round(value)) for value in box)
+        region = (max(0, left), max(0, upper), min(self.width, right), min(self.height, lower))
+        image = Image.new('RGBA', (max(0, right - left), max(0, lower - upper)))
+        if region[2] <= region[0] or region[3] <= region[1]:
+            return image
+        rendered = self.pyramid.render(self.size, region)
+        if region == (left, upper, right, lower):
+            return rendered
+        # Like Image.crop(), the part of box outside the drawing is transparent
+        image.paste(rendered, (region[0] - left, region[1] - upper))
+        return image
+
+
+class SvgPyramid:
+    """Zoom levels of a rasterized SVG drawing for CanvasRenderer.
+
+    image is the drawing rasterized at the size of the document. Zoomed-out views
+    are resampled from downscaled levels of it, as for any image. Zoomed-in views
+    rasterize the drawing again at the zoomed scale, only the region that is
+    visible, so it stays sharp without a bitmap of the whole zoomed size.
+    """
+
+    def __init__(self, document, image):
+        self.document = document
+        self.image = image
+        self._pyramid = ImagePyramid(image)
+        # The last raster of a zoomed-in view as (size, box, image)
+        self._raster = None
+
+    def level_for_zoom(self, zoom):
+        """Return (level, scale) for drawing the image at zoom"""
+        if zoom <= 1:
+            return self._pyramid.level_for_zoom(zoom)
+        size = (max(1, round(self.image.width * zoom)), max(1, round(self.image.height * zoom)))
+        return _VectorLevel(self, size), size[0] / self.image.width
+
+    def render(self, size, region):
+        """Rasterize the region of the drawing scaled to size, from the last raster if it covers it.
+
+        Each raster takes in half the size of the region again on every side, so the
+        renders of a view that is panned a little, or redrawn at the same zoom,
+        neither parse the file again nor draw it.
+        """
+        left, upper, right, lower = region
+        cached = self._raster
+        if cached is not None and cached[0] == size:
+            box = cached[1]
+            if box[0] <= left and box[1] <= upper and right <= box[2] and lower <= box[3]:
+                return cached[2].crop((left - box[0], upper - box[1], right - box[0], lower - box[1]))
+
+        margin_x = (right - left) // 2
+        margin_y = (lower - upper) // 2
+        box = (max(0, left - margin_x), max(0, upper - margin_y),
+               min(size[0], right + margin_x), min(size[1], lower + margin_y))
+        image = self.document.render(size, box)
+        self._raster = (size, box, image)
+        return image.crop((left - box[0], upper - box[1], right - box[0], lower - box[1]))
@@ -0,0 +1,420 @@
+import math
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageMode, TiffImagePlugin
+
+# tifffile decodes single tiles and strips of compressed TIFF and BigTIFF files.
+# Without it, only uncompressed files can be read a tile at a time.
+try:
+    import tifffile
+except ImportError:
+    tifffile = None
+
+# Decoded images at least this large are opened tile by tile rather than decoded up front
+TILED_MIN_BYTES = 256 * 1024 * 1024
+# Memory kept for decoded tiles, shared by every open file
+TILE_CACHE_BYTES = 256 * 1024 * 1024
+# Tile size of the downscaled levels built from the tiles of the level above
+REDUCED_TILE_SIZE = 256
+# Uncompressed strips are read in bands of rows of about this many bytes, as files
+# are often written as a single strip holding the whole image
+STRIP_BAND_BYTES = 4 * 1024 * 1024
+
+# TIFF tags listing the byte counts of the tiles or strips
+TILE_BYTE_COUNTS = 325
+STRIP_BYTE_COUNTS = 279
+
+# Pixel layouts tiles are read in, as samples per pixel -> mode
+TIFFFILE_MODES = {1: 'L', 3: 'RGB', 4: 'RGBA'}
+
+
+class TileCache:
+    """Least recently used decoded tiles, up to a memory budget"""
+
+    def __init__(self, max_bytes=TILE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+            return tile
+
+    def put(self, key, tile):
+        with self._lock:
+            if key in self._tiles:
+                return
+            self._tiles[key] = tile
+            self.size += _tile_bytes(tile)
+            while self.size > self.max_bytes and len(self._tiles) > 1:
+                _, evicted = self._tiles.popitem(last=False)
+                self.size -= _tile_bytes(evicted)
+
+    def discard(self, owner):
+        """Drop the tiles of owner, the first item of their keys"""
+        with self._lock:
+            for key in [key for key in self._tiles if key[0] is owner]:
+                self.size -= _tile_bytes(self._tiles.pop(key))
+
+
+def _tile_bytes(tile):
+    return tile.width * tile.height * len(tile.getbands())
+
+
+tile_cache = TileCache()
+
+
+class _TiledLevel:
+    """One resolution of an image, stored as a grid of tiles that are made on demand"""
+
+    def __init__(self, size, mode, tile_size):
+        self.size = size
+        self.mode = mode
+        self.tile_size = tile_size
+
+    @property
+    def tile_bytes(self):
+        """Memory taken by one decoded tile"""
+        return self.tile_size[0] * self.tile_size[1] * len(ImageMode.getmode(self.mode).bands)
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    def crop(self, box):
+        """Return the region box as an image, making only the tiles it covers"""
+        left, upper, right, lower = (int(round(value)) for value in box)
+        region = Image.new(self.mode, (max(0, right - left), max(0, lower - upper)))
+        tile_width, tile_height = self.tile_size
+
+        for row in range(max(0, upper) // tile_height, (min(lower, self.height) - 1) // tile_height + 1):
+            for col in range(max(0, left) // tile_width, (min(right, self.width) - 1) // tile_width + 1):
+                region.paste(self.tile(col, row), (col * tile_width - left, row * tile_height - upper))
+        return region
+
+    def tile(self, col, row):
+        key = (self, col, row)
+        tile = tile_cache.get(key)
+        if tile is None:
+            tile = self._make_tile(col, row)
+            # Tiles on the right and bottom edges may be padded past the image
+            width = min(self.tile_size[0], self.width - col * self.tile_size[0])
+            height = min(self.tile_size[1], self.height - row * self.tile_size[1])
+            if tile.size != (width, height):
+                tile = tile.crop((0, 0, width, height))
+            tile_cache.put(key, tile)
+        return tile
+
+    def _make_tile(self, col, row):
+        raise NotImplementedError
+
+
+class _StripBands:
+    """Rows of uncompressed strips, read in bands of rows that need not match the strips"""
+
+    def __init__(self, source, offsets, rows_per_strip, row_bytes):
+        self.source = source
+        self.offsets = offsets
+        self.rows_per_strip = rows_per_strip
+        self.row_bytes = row_bytes
+        self.band_rows = max(1, STRIP_BAND_BYTES // row_bytes)
+
+    def read(self, upper, lower):
+        """Return the bytes of rows upper to lower"""
+        chunks = []
+        row = upper
+        while row < lower:
+            strip, first = divmod(row, self.rows_per_strip)
+            count = min(lower, (strip + 1) * self.rows_per_strip) - row
+            chunks.append(self.source.read(self.offsets[strip] + first * self.row_bytes, count * self.row_bytes))
+            row += count
+        return b''.join(chunks)
+
+
+class _PillowPage(_TiledLevel):
+    """A page of an uncompressed TIFF file, read one raw tile or band of strip rows at a time by Pillow"""
+
+    def __init__(self, source, image):
+        self.source = source
+        self._bands = None
+        if image.tag_v2.get(TILE_BYTE_COUNTS):
+            # Pillow lists the tiles in the order of their byte counts
+            self._tiles = {(tile.extents[0], tile.extents[1]): (tile, count)
+                           for tile, count in zip(image.tile, image.tag_v2[TILE_BYTE_COUNTS])}
+            extents = image.tile[0].extents
+            tile_size = (extents[2] - extents[0], extents[3] - extents[1])
+        else:
+            first = image.tile[0]
+            self._rawmode = first.args[0]
+            rows_per_strip = first.extents[3] - first.extents[1]
+            row_bytes = first.args[1] or image.tag_v2[STRIP_BYTE_COUNTS][0] // rows_per_strip
+            self._bands = _StripBands(source, [tile.offset for tile in image.tile], rows_per_strip, row_bytes)
+            tile_size = (image.width, self._bands.band_rows)
+        super().__init__(image.size, image.mode, tile_size)
+
+    def _make_tile(self, col, row):
+        if self._bands is not None:
+            upper = row * self.tile_size[1]
+            lower = min(self.height, upper + self.tile_size[1])
+            data = self._bands.read(upper, lower)
+            return Image.frombytes(self.mode, (self.width, lower - upper), data, 'raw',
+                                   self._rawmode, self._bands.row_bytes)
+
+        tile, count = self._tiles[(col * self.tile_size[0], row * self.tile_size[1])]
+        data = self.source.read(tile.offset, count)
+        left, upper, right, lower = tile.extents
+        size = (right - left, lower - upper)
+        rawmode, stride, orientation = tile.args
+        return Image.frombytes(self.mode, size, data, 'raw', rawmode, stride, orientation)
+
+
+class _TifffilePage(_TiledLevel):
+    """A page of a TIFF or BigTIFF file, decoded one tile or strip at a time by tifffile"""
+
+    def __init__(self, source, page):
+        self.source = source
+        self.page = page
+        self._bands = None
+        height, width = page.shape[:2]
+        if page.is_tiled:
+            tile_size = (page.tilewidth, page.tilelength)
+        elif page.compression == 1:
+            # Uncompressed strips are read straight from the file in bands of rows
+            rows_per_strip = min(page.rowsperstrip or height, height)
+            self._bands = _StripBands(source, page.dataoffsets, rows_per_strip, width * page.samplesperpixel)
+            tile_size = (width, self._bands.band_rows)
+        else:
+            tile_size = (width, page.rowsperstrip or height)
+        self._columns = -(-width // tile_size[0])
+        super().__init__((width, height), TIFFFILE_MODES[page.samplesperpixel], tile_size)
+
+    def _make_tile(self, col, row):
+        if self._bands is not None:
+            upper = row * self.tile_size[1]
+            lower = min(self.height, upper + self.tile_size[1])
+            return Image.frombytes(self.mode, (self.width, lower - upper), self._bands.read(upper, lower))
+
+        index = row * self._columns + col
+        data = self.source.read(self.page.dataoffsets[index], self.page.databytecounts[index])
+        segment, _, shape = self.page.decode(data, index, jpegtables=self.page.jpegtables)
+        # The segment is (depth, height, width, samples)
+        pixels = segment.reshape(shape[1:])
+        if pixels.shape[2] == 1:
+            pixels = pixels[:, :, 0]
+        return Image.fromarray(pixels, self.mode)
+
+
+class _ReducedLevel(_TiledLevel):
+    """Half the size of another level, each tile averaged from the tiles of the level above"""
+
+    def __init__(self, parent):
+        self.parent = parent
+        size = (-(-parent.width // 2), -(-parent.height // 2))
+        super().__init__(size, parent.mode, (REDUCED_TILE_SIZE, REDUCED_TILE_SIZE))
+
+    def _make_tile(self, col, row):
+        left = col * REDUCED_TILE_SIZE * 2
+        upper = row * REDUCED_TILE_SIZE * 2
+        box = (left, upper, min(self.parent.width, left + REDUCED_TILE_SIZE * 2),
+               min(self.parent.height, upper + REDUCED_TILE_SIZE * 2))
+        return self.parent.crop(box).reduce(2)
+
+
+class _FileReader:
+    """Reads byte ranges of a file that is kept open, from any thread"""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._lock = threading.Lock()
+
+    def read(self, offset, count):
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(count)
+
+    def close(self):
+        self._file.close()
+
+
+class TiledTiff:
+    """A tile or strip organized TIFF file whose tiles are decoded only when they are used.
+
+    Cropping reads the tiles intersecting the crop box, so regions of files larger
+    than memory can be viewed and cropped. Decoded tiles are kept in the shared
+    tile_cache. The reduced-resolution pages of pyramidal files are used for
+    zoomed-out views, and the levels missing from the file are built from the
+    tiles of the level above, one tile at a time.
+
+    The file serves as its own pyramid for CanvasRenderer: image is the file
+    itself and level_for_zoom() picks a level. Anything else an image offers is
+    looked up on a full decode of the first page, made the first time it is needed,
+    so the editor only does that in background jobs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._reader = _FileReader(path)
+        self._tifffile = None
+        self._image = None
+        self._image_lock = threading.Lock()
+        try:
+            self.levels = self._open_levels(path)
+        except Exception:
+            self.close()
+            raise
+        self.size = self.levels[0].size
+        self.mode = self.levels[0].mode
+        self.info = {}
+        self.format = 'TIFF'
+
+    def _open_levels(self, path):
+        """Return the pages of the file that are reduced copies of the first one, largest first"""
+        if tifffile is not None:
+            self._tifffile = tifffile.TiffFile(path)
+            # The levels of the first series include pyramids stored in SubIFDs
+            pages = [level.keyframe for level in self._tifffile.series[0].levels]
+            pages += [page for page in self._tifffile.pages[1:] if page not in pages]
+            pages = [page for page in pages
+                     if page.samplesperpixel in TIFFFILE_MODES and page.dtype == 'uint8'
+                     and page.planarconfig == 1 and page.imagedepth == 1]
+            levels = [_TifffilePage(self._reader, page) for page in pages]
+        else:
+            levels = []
+            with _open_header(path) as image:
+                for index in range(getattr(image, 'n_frames', 1)):
+                    image.seek(index)
+                    if image.mode in TIFFFILE_MODES.values() and _is_raw(image):
+                        levels.append(_PillowPage(self._reader, image))
+
+        if not levels:
+            raise ValueError("The file has no pages that can be read a tile at a time")
+        if levels[0].tile_bytes > tile_cache.max_bytes:
+            # Each tile would be decoded in full and would not fit in the tile cache
+            raise ValueError("The tiles of the file are too large to be read one at a time")
+        base = levels[0]
+        # Only pages with the aspect ratio of the first one are reduced copies of it
+        reduced = [level for level in levels[1:] if level.width < base.width
+                   and abs(level.width / base.width - level.height / base.height) < 0.01]
+        reduced = {level.width: level for level in sorted(reduced, key=lambda level: level.width)}
+        return [base] + sorted(reduced.values(), key=lambda level: -level.width)
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    @property
+    def image(self):
+        return self
+
+    def getbands(self):
+        return ImageMode.getmode(self.mode).bands
+
+    def crop(self, box=None):
+        if box is None:
+            box = (0, 0) + self.size
+        if self._image is not None:
+            return self._image.crop(box)
+        return self.levels[0].crop(box)
+
+    def copy(self):
+        return self.decoded.copy()
+
+    def level_for_zoom(self, zoom):
+        """Return (level, scale) for the smallest level at least zoom times the image size"""
+        if zoom >= 1:
+            return self.levels[0], 1.0
+
+        index = int(math.floor(math.log2(1 / zoom)))
+        index = min(index, max(0, int(math.floor(math.log2(max(1, min(self.size)))))))
+        level = self.level(index)
+        return level, level.width / self.width
+
+    def level(self, index):
+        """Return the level 2**index times smaller than the image, from the file or built from tiles"""
+        width = -(-self.width // 2 ** index)
+        best = self.levels[0]
+        for level in self.levels:
+            if abs(level.width - width) <= 1:
+                return level
+            if level.width > width:
+                best = level
+        # Halve the nearest larger level until it is small enough
+        while best.width - width > 1:
+            best = self._reduced(best)
+        return best
+
+    def _reduced(self, level):
+        reduced = getattr(level, '_reduced', None)
+        if reduced is None:
+            reduced = level._reduced = _ReducedLevel(level)
+        return reduced
+
+    @property
+    def decoded(self):
+        """The first page decoded in full, decoding it on first use"""
+        with self._image_lock:
+            if self._image is None:
+                with Image.open(self.path) as image:
+                    image.load()
+                    self._image = image
+            return self._image
+
+    def __getattr__(self, name):
+        # Only called for attributes not found on the file itself
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.decoded, name)
+
+    def close(self):
+        """Close the file and drop its cached tiles"""
+        for level in getattr(self, 'levels', []):
+            while level is not None:
+                tile_cache.discard(level)
+                level = getattr(level, '_reduced', None)
+        if self._tifffile is not None:
+            self._tifffile.close()
+        self._reader.close()
+
+
+def _open_header(path):
+    """Open a TIFF file with Pillow without its decompression bomb check.
+
+    The check guards against allocating huge images, which reading tile by tile never does.
+    """
+    return TiffImagePlugin.TiffImageFile(path)
+
+
+def _is_raw(image):
+    """Whether Pillow lists the tiles or strips of the current page as uncompressed"""
+    return bool(image.tile) and all(tile.codec_name == 'raw' for tile in image.tile)
+
+
+def can_open(path):
+    """Whether the TIFF file at path can be read a tile at a time in this environment"""
+    try:
+        TiledTiff(path).close()
+    except Exception:
+        return False
+    return True
+
+
+def should_open_tiled(path):
+    """Whether the file at path is a TIFF too large to decode up front that can be read tile by tile"""
+    try:
+        with _open_header(path) as image:
+            decoded_bytes = image.width * image.height * len(image.getbands())
+    except Exception:
+        return False
+    return decoded_bytes >= TILED_MIN_BYTES and can_open(path)
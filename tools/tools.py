@@ -1,13 +1,44 @@
 import os
-from tkinter import filedialog, messagebox, ttk
-from PIL import Image, ImageTk, ImageOps, ImageEnhance, ImageFilter
+from tkinter import filedialog, messagebox
+from PIL import Image, ImageTk, ImageFilter
 import customtkinter as ctk
 import tkinter as tk
 from PIL import ImageDraw
 
+from tools import color_engine, export, image_loader, operations, svg_image, tiled_tiff
+from layers import psd_import
+from layers.project import PROJECT_EXTENSION, ProjectFile
+from utils.image_pyramid import ImagePyramid
+
 class Toolss:
     def __init__(self, editor):
         self.editor = editor
+        
+        # Adjustment slider values (-100 to 100)
+        self.brightness_value = 0
+        self.contrast_value = 0
+        self.saturation_value = 0
+        
+        # Cached stages of the adjustment pipeline as (source image, slider values, result)
+        self._luma_histogram = None
+        self._toned = None
+        self._adjusted = None
+        
+        # Screen-sized proxy of the original previewed while a slider is dragged,
+        # as (original image, view, proxy, canvas box)
+        self._adjust_proxy = None
+        self._original_pyramid = ImagePyramid()
+        # Zoom levels of a current image that is not the layer composite
+        self._image_pyramid = ImagePyramid()
+        # Background job applying the adjustments to the full image on slider release
+        self._adjust_job = None
+        # Background job reading the original for the first preview of its adjustments
+        self._prepare_job = None
+        # Zoom levels of the SVG drawing the current image was rasterized from, if any
+        self._svg_pyramid = None
+        # Brush stroke being painted as (ImageDraw, layer), layer None when painting
+        # on a copy of an image without layers
+        self._stroke = None
     
     def open_image(self):
         """Open an image file with extended format support and larger file sizes (up to 200MB)"""
@@ -39,7 +70,8 @@ class Toolss:
             file_size = os.path.getsize(self.editor.image_path)
             max_size = 500 * 1024 * 1024  # 200MB in bytes
             
-            if file_size > max_size:
+            # Tiled TIFF files are never decoded in full, so they may be larger
+            if file_size > max_size and not tiled_tiff.can_open(self.editor.image_path):
                 messagebox.showerror(
                     "File Too Large", 
                     f"The selected file is {file_size / (1024 * 1024):.1f}MB, which exceeds the maximum supported size of 200MB."
@@ -50,110 +82,46 @@ class Toolss:
             _, ext = os.path.splitext(self.editor.image_path)
             ext = ext.lower()
             
-            # Special handling for SVG files
+            # SVG files are rasterized in memory at the size they give the drawing
             if ext == '.svg':
                 try:
-                    # Convert SVG to PNG using cairosvg
-                    import cairosvg
-                    import tempfile
-                    
-                    # Create a temporary PNG file
-                    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
-                        temp_png_path = tmp_file.name
-                    
-                    # Convert SVG to PNG
-                    cairosvg.svg2png(url=self.editor.image_path, write_to=temp_png_path, output_width=1000)
-                    
-                    # Open the PNG
-                    self.editor.original_image = Image.open(temp_png_path)
-                    
-                    # Clean up the temporary file
-                    os.unlink(temp_png_path)
+                    svg_document = svg_image.SvgDocument(self.editor.image_path)
+                    self.editor.original_image = svg_document.render()
                     
                     # Show a note about the conversion
-                    self.editor.status_bar.configure(text=f"Converted SVG to PNG: {os.path.basename(self.editor.image_path)}")
-                except ImportError:
-                    messagebox.showerror("Error", "SVG support requires the cairosvg package. Please install it with: pip install cairosvg")
+                    self.editor.status_bar.configure(
+                        text=f"Rasterized SVG at {svg_document.size[0]}x{svg_document.size[1]}: {os.path.basename(self.editor.image_path)}"
+                    )
+                except ImportError as e:
+                    messagebox.showerror("Error", str(e))
                     return
                 except Exception as e:
                     messagebox.showerror("SVG Conversion Error", f"Could not convert SVG: {str(e)}")
                     return
-            # Special handling for PSD files
+            # PSD files are opened as layers in the background
             elif ext == '.psd':
-                try:
-                    # Try to use PSDImage from psd_tools
-                    from psd_tools import PSDImage
-                    psd = PSDImage.open(self.editor.image_path)
-                    self.editor.original_image = psd.compose()
-                    
-                    # Show a note about the conversion
-                    self.editor.status_bar.configure(text=f"Opened PSD file: {os.path.basename(self.editor.image_path)}")
-                except ImportError:
+                if psd_import.PSDImage is None:
                     messagebox.showerror("Error", "PSD support requires the psd_tools package. Please install it with: pip install psd-tools")
                     return
-                except Exception as e:
-                    messagebox.showerror("PSD Opening Error", f"Could not open PSD file: {str(e)}")
-                    return
-            # For other image formats, use PIL
+                self.open_psd(self.editor.image_path)
+                return
+            # For other image formats, show a draft preview and decode the full image in the background
             else:
-                # For large files, use a progress dialog
-                if file_size > 10 * 1024 * 1024:  # 10MB
-                    progress_window = tk.Toplevel(self.editor.root)
-                    progress_window.title("Loading Image")
-                    progress_window.geometry("300x100")
-                    progress_window.transient(self.editor.root)
-                    progress_window.grab_set()
-                    
-                    # Center the window
-                    progress_window.update_idletasks()
-                    x = (progress_window.winfo_screenwidth() // 2) - (300 // 2)
-                    y = (progress_window.winfo_screenheight() // 2) - (100 // 2)
-                    progress_window.geometry(f"300x100+{x}+{y}")
-                    
-                    # Add a label
-                    label = tk.Label(progress_window, text=f"Loading {os.path.basename(self.editor.image_path)}...")
-                    label.pack(pady=(20, 10))
-                    
-                    # Add a progress bar
-                    progress = ttk.Progressbar(progress_window, mode='indeterminate')
-                    progress.pack(fill='x', padx=20)
-                    progress.start()
-                    
-                    # Update the UI
-                    progress_window.update()
-                    
-                    # Load the image in a separate thread to keep UI responsive
-                    def load_image_thread():
-                        try:
-                            img = Image.open(self.editor.image_path)
-                            self.editor.original_image = img
-                            
-                            # Update UI in the main thread
-                            self.editor.root.after(0, lambda: self.finish_loading(progress_window))
-                        except Exception as e:
-                            # Handle errors in the main thread
-                            self.editor.root.after(0, lambda: self.handle_loading_error(progress_window, str(e)))
-                    
-                    # Start the loading thread
-                    import threading
-                    thread = threading.Thread(target=load_image_thread)
-                    thread.daemon = True
-                    thread.start()
-                    
-                    # Don't proceed further - the thread will call finish_loading when done
-                    return
-                else:
-                    # For smaller files, load directly
-                    self.editor.original_image = Image.open(self.editor.image_path)
+                self.load_image_file(self.editor.image_path)
+                return
             
             # Create a copy for editing
             self.editor.current_image = self.editor.original_image.copy()
+            self.editor.preview_scale = 1.0
+            if ext == '.svg':
+                # Zoomed-in views are rasterized again from the drawing until the image is edited
+                self._svg_pyramid = svg_image.SvgPyramid(svg_document, self.editor.current_image)
             
             # Display the image
             self.display_image_on_canvas()
             
             # Update status bar
-            if not ext == '.svg' and not ext == '.psd':  # Already updated for these formats
+            if not ext == '.svg':  # Already updated for SVG files
                 self.editor.status_bar.configure(text=f"Loaded: {os.path.basename(self.editor.image_path)}")
             
             # Add to recent files if the menu manager exists
@@ -161,110 +129,377 @@ class Toolss:
                 self.editor.menu_manager.add_to_recent_files(self.editor.image_path)
             
             # Clear history when opening a new image
-            self.editor.history = [self.editor.current_image.copy()]
-            self.editor.history_index = 0
-            self.editor.update_undo_redo_buttons()
+            self.editor.reset_history()
             
         except Exception as e:
             messagebox.showerror("Error", f"Could not open image: {str(e)}")
 
-    def finish_loading(self, progress_window):
-        """Complete the image loading process after the thread finishes"""
-        # Close the progress window
-        progress_window.destroy()
-        
-        # Create a copy for editing
-        self.editor.current_image = self.editor.original_image.copy()
-        
-        # Display the image
-        self.display_image_on_canvas()
-        
-        # Update status bar
-        self.editor.status_bar.configure(text=f"Loaded: {os.path.basename(self.editor.image_path)}")
-        
-        # Add to recent files if the menu manager exists
-        if hasattr(self.editor, 'menu_manager'):
-            self.editor.menu_manager.add_to_recent_files(self.editor.image_path)
-        
-        # Clear history when opening a new image
-        self.editor.history = [self.editor.current_image.copy()]
-        self.editor.history_index = 0
-        self.editor.update_undo_redo_buttons()
+    def load_image_file(self, path, on_loaded=None, allow_tiled=True):
+        """Open the image at path, showing a screen-sized preview while the full image is decoded.
+        
+        JPEG files are previewed from a draft-mode decode at reduced resolution. The full
+        image is decoded as a background job and becomes the current image when it is
+        ready, after which on_loaded(image) is called. The decoded image is also kept as
+        the original, which stays as it was loaded even if the file is overwritten; if
+        on_loaded is given it may edit the image in place, so the original is a copy
+        made in the background.
+        
+        TIFF files too large to decode up front are opened as a TiledTiff instead, which
+        decodes only the tiles that are viewed or cropped, unless allow_tiled is False.
+        """
+        previous_image = self.editor.current_image
+        name = os.path.basename(path)
+        tiled = allow_tiled and tiled_tiff.should_open_tiled(path)
+        
+        preview = None
+        if not tiled:
+            preview, full_size = image_loader.open_preview(path, self.editor.renderer.canvas_size)
+        if preview is not None:
+            # Draw the preview at the size the full image will have
+            self.editor.preview_scale = full_size[0] / preview.width
+            self.editor.current_image = preview
+            self.display_image_on_canvas()
+        self.editor.status_bar.configure(text=f"Loading {name}...")
+        
+        def load(job, prepared):
+            if tiled:
+                # A tiled file is never changed in place, so it is its own original
+                image = tiled_tiff.TiledTiff(path)
+                return image, image
+            image = image_loader.load_image(path)
+            return image, image.copy() if on_loaded else image
+        
+        def finish(result):
+            image, original = result
+            # Release the file and cached tiles of a tiled image that is being replaced
+            if isinstance(self.editor.original_image, tiled_tiff.TiledTiff):
+                self.editor.original_image.close()
+            
+            self.editor.preview_scale = 1.0
+            # The new document is not saved as a project yet
+            self.editor.project = None
+            self.editor.original_image = original
+            self.editor.current_image = image
+            self.display_image_on_canvas()
+            self.editor.status_bar.configure(text=f"Loaded: {name}")
+            
+            # Add to recent files if the menu manager exists
+            if hasattr(self.editor, 'menu_manager'):
+                self.editor.menu_manager.add_to_recent_files(path)
+            
+            if on_loaded:
+                on_loaded(image)
+            
+            # Clear history when opening a new image
+            self.editor.reset_history()
+        
+        def abandon():
+            # Put back the image that was open before the preview
+            if preview is not None and self.editor.current_image is preview:
+                self.editor.preview_scale = 1.0
+                self.editor.current_image = previous_image
+                self.display_image_on_canvas()
+        
+        def failed(error):
+            abandon()
+            messagebox.showerror("Error", f"Could not open image: {str(error)}")
+        
+        def cancelled():
+            abandon()
+            self.editor.status_bar.configure(text=f"Cancelled loading {name}")
+        
+        return self.editor.job_scheduler.submit(
+            f"Loading {name}",
+            load,
+            on_done=finish,
+            on_error=failed,
+            on_cancel=cancelled
+        )
 
-    def handle_loading_error(self, progress_window, error_message):
-        """Handle errors that occur during image loading"""
-        # Close the progress window
-        progress_window.destroy()
-        
-        # Show error message
-        messagebox.showerror("Error", f"Could not open image: {error_message}")
+    def open_psd(self, path):
+        """Open a Photoshop file as layers, decoding the pixels of each layer only once it is used.
+        
+        The file is read and its visible layers decoded in the background. Previews of
+        the hidden layers are made by a second job, without keeping their pixels.
+        """
+        name = os.path.basename(path)
+        
+        def read(job, prepared):
+            layers, canvas_size = psd_import.open_psd(path)
+            # The visible layers are composited right away, so decode them here
+            # rather than on the main thread
+            for layer in layers:
+                if layer.visible:
+                    layer.image
+            return layers, canvas_size
+        
+        def opened(result):
+            layers, canvas_size = result
+            self.editor.project = None
+            # Saving writes a flattened image, so it asks for a path rather than
+            # overwriting the PSD file
+            self.editor.image_path = None
+            self.show_layers(layers, canvas_size, len(layers) - 1, f"Opened PSD file: {name}")
+            if hasattr(self.editor, 'menu_manager'):
+                self.editor.menu_manager.add_to_recent_files(path)
+            self.make_layer_previews(layers)
+        
+        return self.editor.job_scheduler.submit(
+            f"Opening {name}",
+            read,
+            on_done=opened,
+            on_error=lambda e: messagebox.showerror("PSD Opening Error", f"Could not open PSD file: {str(e)}")
+        )
+    
+    def make_layer_previews(self, layers):
+        """Make the layer panel previews of layers whose pixels are not loaded, in the background"""
+        def make(job, prepared):
+            # Sources still waiting for their pixels as the job starts
+            sources = [layer.image_source for layer in layers if layer.image_source is not None]
+            for index, source in enumerate(sources):
+                if getattr(source, 'thumbnail', None) is None and hasattr(source, 'make_thumbnail'):
+                    source.make_thumbnail()
+                job.report((index + 1) / len(sources))
+        
+        def failed(error):
+            # The previews made before the error are shown all the same
+            self.editor.layer_manager.update_layer_ui()
+            self.editor.status_bar.configure(text=f"Could not make layer previews: {error}")
+        
+        self.editor.job_scheduler.submit(
+            "Making layer previews",
+            make,
+            on_done=lambda result: self.editor.layer_manager.update_layer_ui(),
+            on_error=failed
+        )
 
     def save_image(self, save_as=False):
         """Save the current image"""
-        if not hasattr(self, 'layer_manager') or not self.layer_manager.layers:
+        if not self.editor.current_image:
             messagebox.showinfo("Info", "No image to save")
             return
         
-        # Get the composite image from all layers
-        composite = self.layer_manager.get_composite_image()
-        if not composite:
-            return
-        
-        # If save_as or no path exists, ask for a path
-        if save_as or not self.image_path:
+        # If save_as or no path exists, ask for a path, as also for files opened
+        # from a format that cannot be written back
+        path = self.editor.image_path
+        if save_as or not path or os.path.splitext(path)[1].lower() not in export.FORMATS:
             file_path = filedialog.asksaveasfilename(
                 defaultextension=".png",
                 filetypes=[("PNG", "*.png"), ("JPEG", "*.jpg"), ("All Files", "*.*")]
             )
             if not file_path:
                 return  # User cancelled
-            self.image_path = file_path
+            self.editor.image_path = path = file_path
         
-        # Save the composite image
-        try:
-            # Convert to RGB if saving as JPEG
-            if self.image_path.lower().endswith(('.jpg', '.jpeg')):
-                if composite.mode == 'RGBA':
-                    rgb_image = Image.new('RGB', composite.size, (255, 255, 255))
-                    rgb_image.paste(composite, mask=composite.split()[3])
-                    rgb_image.save(self.image_path, quality=95)
-                else:
-                    composite.convert('RGB').save(self.image_path, quality=95)
-            else:
-                composite.save(self.image_path)
-            
-            self.status_bar.configure(text=f"Saved: {os.path.basename(self.image_path)}")
+        def save(job, image):
+            export.export_image(image, path)
+        
+        def saved(result):
+            self.editor.status_bar.configure(text=f"Saved: {os.path.basename(path)}")
             
             # Add to recent files
-            if hasattr(self, 'menu_manager'):
-                self.menu_manager.add_to_recent_files(self.image_path)
+            if hasattr(self.editor, 'menu_manager'):
+                self.editor.menu_manager.add_to_recent_files(path)
+        
+        # Save the displayed image as it is once the edits queued before have been
+        # applied; edits made while it is encoded leave it as it is
+        self.editor.job_scheduler.submit(
+            "Saving",
+            save,
+            on_done=saved,
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to save image: {str(e)}"),
+            prepare=self.snapshot_image
+        )
+    
+    def snapshot_image(self):
+        """The current image as it is now, for a job to read off the main thread.
+        
+        Edits made while the job runs leave the returned image as it is. The layer
+        composite is updated in place, so it is shared until the compositor next
+        changes it. Any other image is only ever replaced, never modified, so it is
+        returned as it is.
+        """
+        image = self.editor.current_image
+        layer_manager = self.editor.layer_manager
+        if image is not None and layer_manager.layers and image is layer_manager.get_composite_image():
+            return layer_manager.get_composite_snapshot()
+        return image
+    
+    def export_image(self, path, options):
+        """Encode the current image to path with the encoder options in the background"""
+        name = os.path.basename(path)
+        
+        def exported(result):
+            self.editor.status_bar.configure(text=f"Exported: {name}")
+        
+        # The image is taken once the edits queued before have been applied
+        return self.editor.job_scheduler.submit(
+            f"Exporting {name}",
+            lambda job, image: export.export_image(image, path, options),
+            on_done=exported,
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to export image: {str(e)}"),
+            prepare=self.snapshot_image
+        )
+
+    def open_project(self):
+        """Open a layered project file, reading layer pixels from it only as they are needed"""
+        path = filedialog.askopenfilename(
+            title="Open Project",
+            filetypes=[("Project Files", "*" + PROJECT_EXTENSION), ("All Files", "*.*")]
+        )
+        if not path:
+            return  # User cancelled
         
+        try:
+            project, layers, canvas_size, active_index = ProjectFile.open(path)
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to save image: {str(e)}")
+            messagebox.showerror("Error", f"Could not open project: {str(e)}")
+            return
+        
+        self.editor.project = project
+        # Saving as an image asks for a path
+        self.editor.image_path = None
+        self.show_layers(layers, canvas_size, active_index, f"Opened project: {os.path.basename(path)}")
+    
+    def show_layers(self, layers, canvas_size, active_index, message):
+        """Make layers read from a project file the document and start a new history"""
+        layer_manager = self.editor.layer_manager
+        layer_manager.canvas_size = canvas_size
+        layer_manager.layers = layers
+        layer_manager.active_layer_index = active_index
+        layer_manager.update_layer_ui()
+        
+        # Only the visible layers are read to composite the document
+        self.editor.current_image = layer_manager.get_composite_image()
+        self.editor.original_image = self.editor.current_image.copy()
+        self.display_image_on_canvas()
+        self.editor.status_bar.configure(text=message)
+        
+        # Clear history when opening a new document
+        self.editor.reset_history()
+    
+    def save_project(self, save_as=False):
+        """Save the layers as a project file, writing only the tiles changed since the last save"""
+        layer_manager = self.editor.layer_manager
+        if not layer_manager.layers:
+            messagebox.showinfo("Info", "No layers to save")
+            return
+        
+        project = self.editor.project
+        if save_as or project is None:
+            path = filedialog.asksaveasfilename(
+                defaultextension=PROJECT_EXTENSION,
+                filetypes=[("Project Files", "*" + PROJECT_EXTENSION), ("All Files", "*.*")]
+            )
+            if not path:
+                return  # User cancelled
+            if project is None or os.path.abspath(path) != os.path.abspath(project.path):
+                project = ProjectFile(path)
+        
+        def prepare():
+            return project.prepare_save(layer_manager.layers, layer_manager.canvas_size,
+                                        layer_manager.active_layer_index)
+        
+        def write(job, plan):
+            project.write(plan)
+            return plan
+        
+        def saved(plan):
+            project.finish_save(plan)
+            self.editor.project = project
+            self.editor.status_bar.configure(text=f"Saved project: {os.path.basename(project.path)}")
+        
+        # Copy the changed tiles once the edits queued before have been applied and
+        # compress and write them in the background
+        self.editor.job_scheduler.submit(
+            "Saving project",
+            write,
+            on_done=saved,
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to save project: {str(e)}"),
+            prepare=prepare
+        )
 
-    def display_image_on_canvas(self):
+    def run_image_job(self, name, operation, message, on_applied=None, steps=()):
+        """Replace the current image with operation(image, job), run in the background.
+        
+        The job runs after the jobs queued before it, on a snapshot of the current
+        image as they left it, so edits made meanwhile do not change what it reads.
+        Its result is added to history and displayed on the main thread, and steps,
+        the recipe steps equivalent to operation, are logged for macros.
+        """
+        if not self.editor.current_image:
+            messagebox.showinfo("Info", "Please open an image first")
+            return None
+        
+        def apply_result(image):
+            # Add current state to history before making changes
+            self.editor.push_to_history()
+            for step in steps:
+                self.editor.record_operation(**step)
+            
+            self.editor.current_image = image
+            self.display_image_on_canvas()
+            self.editor.status_bar.configure(text=message)
+            if on_applied:
+                on_applied()
+        
+        # The scheduler calls work(job, prepared)
+        return self.editor.job_scheduler.submit(
+            name,
+            lambda job, image: operation(image, job),
+            on_done=apply_result,
+            on_error=lambda e: messagebox.showerror("Error", f"{name} failed: {str(e)}"),
+            prepare=self.snapshot_image
+        )
+    
+    def run_macro(self, steps):
+        """Replay recipe steps on the current image as one background job.
+        
+        The steps are applied one after the other in the worker without drawing
+        anything in between; the result is drawn and added to history once.
+        """
+        if not steps:
+            return None
+        
+        def replay(image, job):
+            for index, step in enumerate(steps):
+                image = operations.apply_step(image, step)
+                job.report((index + 1) / len(steps))
+            return image
+        
+        return self.run_image_job("Running macro", replay, f"Macro applied ({len(steps)} steps)", steps=steps)
+    
+    def display_image_on_canvas(self, fast=False):
         """Display the current image on the canvas"""
         if self.editor.current_image:
-            # Get the current zoom level
-            zoom_factor = self.editor.zoom_level / 100.0
-            
-            # Resize the image according to zoom level
-            if zoom_factor != 1.0:
-                width = int(self.editor.current_image.width * zoom_factor)
-                height = int(self.editor.current_image.height * zoom_factor)
-                resized_image = self.editor.current_image.resize((width, height), Image.LANCZOS)
-            else:
-                resized_image = self.editor.current_image
+            # Resample only the part of the image visible at the current zoom level,
+            # from a downscaled level of the composite when zoomed out
+            # A tiled file provides its own downscaled levels for zoomed-out views
+            image = self.editor.current_image
+            pyramid = self.editor.layer_manager.pyramid
+            if isinstance(image, tiled_tiff.TiledTiff):
+                pyramid = image
+            elif pyramid.image is not image:
+                # An image opened without layers or left by an operation; its levels
+                # are built again whenever it is replaced
+                self._image_pyramid.update(image)
+                pyramid = self._image_pyramid
             
-            # Convert to PhotoImage for display
-            self.editor.photo_image = ImageTk.PhotoImage(resized_image)
-            
-            # Update canvas
-            self.editor.canvas.delete("image")
-            self.editor.canvas.create_image(0, 0, anchor="nw", image=self.editor.photo_image, tags="image")
+            # An SVG drawing is rasterized again for zoomed-in views
+            if self._svg_pyramid is not None:
+                if self._svg_pyramid.image is self.editor.current_image:
+                    pyramid = self._svg_pyramid
+                else:
+                    # The image was edited or replaced, so it no longer matches the drawing
+                    self._svg_pyramid = None
             
-            # Update canvas scrollregion
-            self.editor.canvas.config(scrollregion=self.editor.canvas.bbox("all"))
+            # A draft preview is drawn at the size of the full image it stands in for
+            self.editor.renderer.render(
+                self.editor.current_image,
+                self.editor.zoom_level * self.editor.preview_scale,
+                pyramid,
+                fast=fast
+            )
 
     def resize_image(self):
         """Enhanced resize image tool with professional features."""
@@ -532,36 +767,7 @@ class Toolss:
             highlightthickness=0
         )
         preview_canvas.pack(fill="both", expand=True)
-
-    def activate_draw_tool(self):
-        """Activate the drawing tool."""
-        self.editor.active_tool = "draw"
-        self.editor.status_bar.configure(text="Draw Tool: Click and drag to draw")
-        self.editor.canvas.config(cursor="pencil")  # Change cursor to indicate draw mode
-        
-        # Set up drawing properties
-        self.editor.draw_color = self.editor.properties_panel.draw_properties["color"]
-        self.editor.draw_size = self.editor.properties_panel.draw_properties["size"]
-        self.editor.draw_last_point = None
         
-        # Create a temporary image for drawing preview
-        if self.editor.current_image:
-            self.editor.draw_overlay = self.editor.current_image.copy()
-            self.editor.draw_preview = ImageDraw.Draw(self.editor.draw_overlay)
-
-    def apply_drawing(self):
-        """Apply the drawing to the actual image."""
-        if hasattr(self.editor, 'draw_overlay') and self.editor.draw_overlay:
-            # Save current state for undo
-            self.editor.push_to_history()
-            
-            # Apply the drawing to the current image
-            self.editor.current_image = self.editor.draw_overlay.copy()
-            self.editor.display_image_on_canvas()
-            
-            # Reset drawing state
-            self.editor.draw_last_point = None
-
         # Function to update preview
         def update_preview():
             if not preview_var.get() or not self.editor.current_image:
@@ -577,8 +783,8 @@ class Toolss:
             
             # Create preview image
             try:
-                preview_img = self.editor.current_image.copy()
-                preview_img.thumbnail((300, 300))  # Limit preview size
+                # Made from a small sample, without copying or decoding the full image
+                preview_img = export.make_sample(self.editor.current_image, 300 * 300)
                 
                 # Apply resize with current settings
                 new_width = width_var.get()
@@ -650,6 +856,106 @@ class Toolss:
         y = (resize_dialog.winfo_screenheight() // 2) - (height // 2)
         resize_dialog.geometry(f"{width}x{height}+{x}+{y}")
 
+    def refuse_tiled_edit(self, action):
+        """Tell the user action is not available and return True if the current image is a tiled file.
+        
+        Editing such an image on the main thread would decode the whole file there.
+        """
+        if not isinstance(self.editor.current_image, tiled_tiff.TiledTiff):
+            return False
+        messagebox.showinfo("Info", f"{action} is not available for large TIFF files read a tile at a time")
+        return True
+    
+    def start_stroke(self):
+        """Start a brush stroke, returning False if there is nothing to paint on.
+        
+        While the current image is the composite of the layers, the stroke is painted
+        straight into the active layer, and each segment is marked dirty on it so only
+        the tiles under the brush are recomposited, kept in history and saved. Any other
+        image is painted on a copy that replaces it when the stroke ends.
+        """
+        layer_manager = self.editor.layer_manager
+        if not self.editor.current_image or self.refuse_tiled_edit("Drawing"):
+            return False
+        
+        # Save current state for undo
+        self.editor.push_to_history()
+        
+        layer = None
+        if layer_manager.layers and 0 <= layer_manager.active_layer_index < len(layer_manager.layers) \
+                and self.editor.current_image is layer_manager.get_composite_image():
+            layer = layer_manager.layers[layer_manager.active_layer_index]
+        
+        if layer is not None and layer.image:
+            self.editor.draw_overlay = None
+            self._stroke = (ImageDraw.Draw(layer.image), layer)
+        else:
+            self.editor.draw_overlay = self.editor.current_image.copy()
+            self._stroke = (ImageDraw.Draw(self.editor.draw_overlay), None)
+        return True
+    
+    def paint_stroke(self, start, end):
+        """Paint the segment of the stroke from start to end, in image coordinates"""
+        if self._stroke is None:
+            return
+        draw, layer = self._stroke
+        
+        # Layers are painted in their own coordinates
+        if layer is not None:
+            start = (start[0] - layer.x_offset, start[1] - layer.y_offset)
+            end = (end[0] - layer.x_offset, end[1] - layer.y_offset)
+        
+        # A line from the last point, with a circle at the end point for smoother lines
+        radius = self.editor.draw_size // 2
+        if start != end:
+            draw.line([start, end], fill=self.editor.draw_color, width=self.editor.draw_size)
+        draw.ellipse([(end[0] - radius, end[1] - radius), (end[0] + radius, end[1] + radius)],
+                     fill=self.editor.draw_color)
+        
+        rect = self.brush_rect(start, end)
+        if layer is None:
+            # Update only the part of the display under the brush
+            self.editor.renderer.render_region(self.editor.draw_overlay, rect)
+            return
+        
+        width, height = layer.image.size
+        rect = (max(0, rect[0]), max(0, rect[1]), min(width, rect[2]), min(height, rect[3]))
+        if rect[2] <= rect[0] or rect[3] <= rect[1]:
+            return
+        layer.mark_dirty(rect)
+        
+        # Recomposite and redraw only the tiles under the brush
+        layer_manager = self.editor.layer_manager
+        self.editor.current_image = layer_manager.get_composite_image()
+        canvas_rect = (rect[0] + layer.x_offset, rect[1] + layer.y_offset,
+                       rect[2] + layer.x_offset, rect[3] + layer.y_offset)
+        self.editor.renderer.render_region(self.editor.current_image, canvas_rect, layer_manager.pyramid)
+    
+    def brush_rect(self, start, end):
+        """Return the image region covered by a brush segment from start to end."""
+        radius = self.editor.draw_size // 2 + 1
+        return (min(start[0], end[0]) - radius, min(start[1], end[1]) - radius,
+                max(start[0], end[0]) + radius + 1, max(start[1], end[1]) + radius + 1)
+    
+    def apply_drawing(self):
+        """Finish the brush stroke being painted."""
+        if self._stroke is None:
+            return
+        _, layer = self._stroke
+        self._stroke = None
+        
+        if layer is None:
+            # Apply the drawing to the current image; the next stroke starts a new overlay
+            self.editor.current_image = self.editor.draw_overlay
+            self.editor.display_image_on_canvas()
+            self.editor.draw_overlay = None
+        else:
+            # The layer was painted in place; refresh its preview in the layer panel
+            self.editor.layer_manager.update_layer_ui()
+        
+        # Reset drawing state
+        self.editor.draw_last_point = None
+
     def apply_resize(self, new_width, new_height, method_name, dialog):
         """Apply the resize operation with the selected parameters."""
         if not self.editor.current_image:
@@ -663,24 +969,14 @@ class Toolss:
                 messagebox.showerror("Error", "Width and height must be greater than 0")
                 return
                 
-            # Get the resampling method from PIL
-            resampling_method = getattr(Image, method_name)
-            
-            # Add current state to history before making changes
-            self.editor.push_to_history()
-            
-            # Perform the resize operation
-            self.editor.current_image = self.editor.current_image.resize(
-                (new_width, new_height), 
-                resampling_method
+            # Perform the resize operation in the background
+            self.run_image_job(
+                "Resizing",
+                lambda image, job: operations.resize(image, new_width, new_height, method_name),
+                f"Image resized to {new_width}x{new_height} using {method_name}",
+                steps=[{"op": "resize", "width": new_width, "height": new_height, "method": method_name}]
             )
             
-            # Update the display
-            self.display_image_on_canvas()
-            
-            # Update status bar
-            self.editor.status_bar.configure(text=f"Image resized to {new_width}x{new_height} using {method_name}")
-            
             # Close the dialog
             dialog.destroy()
             
@@ -688,53 +984,36 @@ class Toolss:
             messagebox.showerror("Resize Error", f"Could not resize image: {str(e)}")
 
     def rotate_image(self, angle):
-        if not self.editor.current_image:
-            messagebox.showinfo("Info", "Please open an image first")
-            return
-        
-        try:
-            # Add current state to history before making changes
-            self.editor.push_to_history()
-            
-            # Rotate the image (expand=True to show the entire rotated image)
-            self.editor.current_image = self.editor.current_image.rotate(angle, expand=True, resample=Image.BICUBIC)
-            self.display_image_on_canvas()
-            self.editor.status_bar.configure(text=f"Image rotated by {angle} degrees")
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not rotate image: {str(e)}")
+        self.run_image_job(
+            "Rotating",
+            lambda image, job: operations.rotate(image, angle),
+            f"Image rotated by {angle} degrees",
+            steps=[{"op": "rotate", "angle": angle}]
+        )
     
     def flip_horizontal(self):
-        if not self.editor.current_image:
-            messagebox.showinfo("Info", "Please open an image first")
-            return
-        
-        # Add current state to history before making changes
-        self.editor.push_to_history()
-        
-        self.editor.current_image = ImageOps.mirror(self.editor.current_image)
-        self.display_image_on_canvas()
-        self.editor.status_bar.configure(text="Image flipped horizontally")
+        self.run_image_job("Flipping", lambda image, job: operations.flip_horizontal(image), "Image flipped horizontally",
+                           steps=[{"op": "flip_horizontal"}])
     
     def flip_vertical(self):
-        if not self.editor.current_image:
-            messagebox.showinfo("Info", "Please open an image first")
-            return
-        
-        # Add current state to history before making changes
-        self.editor.push_to_history()
-        
-        self.editor.current_image = ImageOps.flip(self.editor.current_image)
-        self.display_image_on_canvas()
-        self.editor.status_bar.configure(text="Image flipped vertically")
+        self.run_image_job("Flipping", lambda image, job: operations.flip_vertical(image), "Image flipped vertically",
+                           steps=[{"op": "flip_vertical"}])
     
     def reset_image(self):
-        if self.editor.original_image:
-            # Add current state to history before making changes
+        original = self.editor.original_image
+        if not original:
+            return
+        
+        if isinstance(original, tiled_tiff.TiledTiff):
+            # A tiled file is read a tile at a time and never changed, so it is shown as it is
             self.editor.push_to_history()
-            
-            self.editor.current_image = self.editor.original_image.copy()
+            self.editor.current_image = original
             self.display_image_on_canvas()
             self.editor.status_bar.configure(text="Image reset to original")
+            return
+        
+        # The original is copied in the background, so later edits leave it as it is
+        self.run_image_job("Resetting image", lambda image, job: original.copy(), "Image reset to original")
 # Filter functions
     def apply_brightness(self, value):
         """Apply brightness adjustment to the image."""
@@ -743,8 +1022,8 @@ class Toolss:
         
         self.brightness_value = value
         
-        # Apply the filter
-        self._apply_combined_adjustments()
+        # Preview on a screen-sized proxy; the full image is done on release
+        self._preview_adjustments()
     
     def apply_contrast(self, value):
         """Apply contrast adjustment to the image."""
@@ -753,8 +1032,8 @@ class Toolss:
         
         self.contrast_value = value
         
-        # Apply the filter
-        self._apply_combined_adjustments()
+        # Preview on a screen-sized proxy; the full image is done on release
+        self._preview_adjustments()
     
     def apply_saturation(self, value):
         """Apply saturation adjustment to the image."""
@@ -763,60 +1042,206 @@ class Toolss:
         
         self.saturation_value = value
         
-        # Apply the filter
-        self._apply_combined_adjustments()
+        # Preview on a screen-sized proxy; the full image is done on release
+        self._preview_adjustments()
     
-    def _apply_combined_adjustments(self):
-        """Apply all adjustments at once to avoid quality loss from multiple operations."""
-        if not self.editor.current_image or not self.editor.original_image:
+    def adjust_image(self, image, brightness, contrast, saturation, reference=None):
+        """Return image with the brightness, contrast and saturation slider values applied.
+        
+        Brightness and contrast are folded into a single lookup table pass and saturation
+        is a single color matrix pass. Each stage is cached against the slider values,
+        so moving the saturation slider does not redo the lookup table pass. Contrast is
+        stretched around the mean gray level of reference, which defaults to image, so a
+        proxy of an image can be adjusted the same way as the image itself.
+        
+        Safe to call from a worker thread while the main thread adjusts another image.
+        """
+        if reference is None:
+            reference = image
+        key = (brightness, contrast, saturation)
+        
+        # Read each cache once, another thread may replace it meanwhile
+        cached = self._adjusted
+        if cached is not None and cached[0] is image and cached[1] == key:
+            return cached[2]
+        
+        # Brightness and contrast
+        cached = self._toned
+        if brightness == 0 and contrast == 0:
+            toned = image
+        elif cached is not None and cached[0] is image and cached[1] == key[:2]:
+            toned = cached[2]
+        else:
+            # The contrast is stretched around the mean gray level of the brightened image
+            histogram = self._luma_histogram
+            if histogram is None or histogram[0] is not reference:
+                histogram = (reference, color_engine.luma_histogram(reference))
+                self._luma_histogram = histogram
+            
+            lut = color_engine.brightness_contrast_lut(
+                1.0 + brightness / 100.0,
+                1.0 + contrast / 100.0,
+                histogram[1]
+            )
+            toned = color_engine.apply_channel_luts(image, lut)
+            self._toned = (image, key[:2], toned)
+        
+        # Saturation
+        if saturation == 0:
+            adjusted = toned
+        else:
+            matrix = color_engine.saturation_matrix(1.0 + saturation / 100.0)
+            adjusted = color_engine.apply_color_matrix(toned, matrix)
+        
+        self._adjusted = (image, key, adjusted)
+        return adjusted
+    
+    def _preview_adjustments(self):
+        """Draw the slider adjustments applied to a screen-sized proxy of the original image.
+        
+        The proxy is the part of the original visible on the canvas at screen resolution,
+        so each slider callback costs the same whatever the size of the image. The current
+        image is left alone until commit_adjustments() is called on release.
+        """
+        original = self.editor.original_image
+        renderer = self.editor.renderer
+        view = (self.editor.zoom_level, renderer.origin, renderer.canvas_size)
+        
+        # The histogram and zoom levels of the original are computed in the background
+        # first; the preview is drawn once they are ready
+        histogram = self._luma_histogram
+        if histogram is None or histogram[0] is not original or self._original_pyramid.image is not original:
+            self.prepare_adjustments()
             return
         
-        # Start with the original image
-        img = self.editor.original_image.copy()
-        
-        # Apply brightness (convert slider value to enhancement factor)
-        if self.brightness_value != 0:
-            factor = 1.0 + (self.brightness_value / 100.0)
-            enhancer = ImageEnhance.Brightness(img)
-            img = enhancer.enhance(factor)
-        
-        # Apply contrast
-        if self.contrast_value != 0:
-            factor = 1.0 + (self.contrast_value / 100.0)
-            enhancer = ImageEnhance.Contrast(img)
-            img = enhancer.enhance(factor)
-        
-        # Apply saturation
-        if self.saturation_value != 0:
-            factor = 1.0 + (self.saturation_value / 100.0)
-            enhancer = ImageEnhance.Color(img)
-            img = enhancer.enhance(factor)
-        
-        # Update the current image
-        self.editor.current_image = img
+        proxy = self._adjust_proxy
+        if proxy is None or proxy[0] is not original or proxy[1] != view:
+            # Zoomed-out proxies are resampled from a downscaled level of the original
+            image, box = renderer.view_proxy(original, self._original_pyramid)
+            if image is None:
+                return
+            # The view may have been clamped while the proxy was made
+            view = (self.editor.zoom_level, renderer.origin, renderer.canvas_size)
+            proxy = self._adjust_proxy = (original, view, image, box)
+        
+        # Drop redraws of the current image that would cover the preview
+        self.editor.render_scheduler.cancel()
+        
+        adjusted = self.adjust_image(
+            proxy[2],
+            self.brightness_value,
+            self.contrast_value,
+            self.saturation_value,
+            reference=original
+        )
+        renderer.show_proxy(adjusted, proxy[3])
+    
+    def prepare_adjustments(self):
+        """Compute what previews of the slider adjustments need from the original in the background.
         
-        # Display the updated image
-        self.display_image_on_canvas()
+        The luma histogram of the original and the zoom level the proxy is resampled
+        from would otherwise both be computed by the first slider callback.
+        """
+        if self._prepare_job is not None or not self.editor.original_image:
+            return
+        zoom = self.editor.renderer.zoom
+        
+        def prepare(job, original):
+            # The histogram is cached here so the job applying the adjustments can
+            # use it even if it starts before this one's result is handled
+            self._luma_histogram = (original, color_engine.luma_histogram(original))
+            pyramid = ImagePyramid(original)
+            pyramid.level_for_zoom(zoom)
+            return pyramid
+        
+        def prepared(pyramid):
+            self._prepare_job = None
+            if pyramid.image is not self.editor.original_image:
+                return
+            self._original_pyramid = pyramid
+            # Show the sliders as they are now, unless they were released meanwhile
+            if self._adjust_job is None:
+                self._preview_adjustments()
+        
+        def failed(error):
+            self._prepare_job = None
+            messagebox.showerror("Error", f"Failed to read the image for adjustments: {str(error)}")
+        
+        def cancelled():
+            self._prepare_job = None
+        
+        self._prepare_job = self.editor.job_scheduler.submit(
+            "Preparing adjustments",
+            prepare,
+            on_done=prepared,
+            on_error=failed,
+            on_cancel=cancelled,
+            prepare=lambda: self.editor.original_image
+        )
     
-    def apply_grayscale(self):
-        """Convert the image to grayscale."""
-        if not self.editor.current_image:
-            messagebox.showinfo("Info", "Please open an image first")
+    def commit_adjustments(self, event=None):
+        """Apply the slider adjustments to the full image in the background once a slider is released"""
+        # A slider may be released before its first preview was ready
+        if self._adjust_proxy is None and self._prepare_job is None:
+            return
+        if not self.editor.current_image or not self.editor.original_image:
             return
+        self._adjust_proxy = None
         
-        # Add current state to history before making changes
-        self.editor.push_to_history()
+        # A newer release supersedes the result of this one
+        if self._adjust_job is not None:
+            self._adjust_job.cancel()
         
-        # Convert to grayscale
-        self.editor.current_image = ImageOps.grayscale(self.editor.current_image).convert('RGB')
+        values = (self.brightness_value, self.contrast_value, self.saturation_value)
         
-        # Display the updated image
-        self.display_image_on_canvas()
+        def adjust(job, original):
+            return original, self.adjust_image(original, *values)
         
-        # Update status
-        self.editor.status_bar.configure(text="Grayscale filter applied")
+        def apply_result(result):
+            original, img = result
+            self._adjust_job = None
+            if original is not self.editor.original_image:
+                return
+            
+            # Add current state to history before making changes
+            self.editor.push_to_history()
+            brightness, contrast, saturation = values
+            self.editor.record_operation("adjust", brightness=brightness, contrast=contrast, saturation=saturation)
+            
+            # Keep the original untouched by later edits of the current image
+            if img is original:
+                img = img.copy()
+            
+            self.editor.current_image = img
+            self.display_image_on_canvas()
+            self.editor.status_bar.configure(text="Adjustments applied")
         
-        # Reset adjustment sliders
+        def failed(error):
+            self._adjust_job = None
+            self.display_image_on_canvas()
+            messagebox.showerror("Error", f"Failed to apply adjustments: {str(error)}")
+        
+        self._adjust_job = self.editor.job_scheduler.submit(
+            "Applying adjustments",
+            adjust,
+            on_done=apply_result,
+            on_error=failed,
+            prepare=lambda: self.editor.original_image
+        )
+    
+    def apply_grayscale(self):
+        """Convert the image to grayscale."""
+        # Convert to grayscale, keeping any transparency
+        self.run_image_job(
+            "Grayscale",
+            lambda image, job: color_engine.grayscale(image),
+            "Grayscale filter applied",
+            on_applied=self.reset_adjustment_sliders,
+            steps=[{"op": "grayscale"}]
+        )
+    
+    def reset_adjustment_sliders(self):
+        """Set the brightness, contrast and saturation sliders back to zero"""
         self.brightness_value = 0
         self.contrast_value = 0
         self.saturation_value = 0
@@ -829,123 +1254,55 @@ class Toolss:
     
     def apply_blur(self):
         """Apply blur filter to the image."""
-        if not self.editor.current_image:
-            messagebox.showinfo("Info", "Please open an image first")
-            return
-        
-        # Add current state to history before making changes
-        self.editor.push_to_history()
-        
-        # Apply blur filter
-        self.editor.current_image = self.editor.current_image.filter(ImageFilter.GaussianBlur(radius=2))
-        
-        # Display the updated image
-        self.display_image_on_canvas()
-        
-        # Update status
-        self.editor.status_bar.configure(text="Blur filter applied")
+        self._apply_filter("Blur", ImageFilter.GaussianBlur(radius=2), "Blur filter applied",
+                           {"op": "blur", "radius": 2})
     
     def apply_sharpen(self):
         """Apply sharpen filter to the image."""
-        if not self.editor.current_image:
-            messagebox.showinfo("Info", "Please open an image first")
-            return
-        
-        # Add current state to history before making changes
-        self.editor.push_to_history()
-        
-        # Apply sharpen filter
-        self.editor.current_image = self.editor.current_image.filter(ImageFilter.SHARPEN)
-        
-        # Display the updated image
-        self.display_image_on_canvas()
-        
-        # Update status
-        self.editor.status_bar.configure(text="Sharpen filter applied")
+        self._apply_filter("Sharpen", ImageFilter.SHARPEN, "Sharpen filter applied", {"op": "sharpen"})
     
     def apply_edge_detection(self):
         """Apply edge detection filter to the image."""
-        if not self.editor.current_image:
-            messagebox.showinfo("Info", "Please open an image first")
-            return
-        
-        # Add current state to history before making changes
-        self.editor.push_to_history()
-        
-        # Apply edge detection filter
-        self.editor.current_image = self.editor.current_image.filter(ImageFilter.FIND_EDGES)
-        
-        # Display the updated image
-        self.display_image_on_canvas()
-        
-        # Update status
-        self.editor.status_bar.configure(text="Edge detection filter applied")
+        self._apply_filter("Edge detection", ImageFilter.FIND_EDGES, "Edge detection filter applied",
+                           {"op": "edge_detection"})
     
     def apply_emboss(self):
         """Apply emboss filter to the image."""
-        if not self.editor.current_image:
-            messagebox.showinfo("Info", "Please open an image first")
-            return
-        
-        # Add current state to history before making changes
-        self.editor.push_to_history()
-        
-        # Apply emboss filter
-        self.editor.current_image = self.editor.current_image.filter(ImageFilter.EMBOSS)
-        
-        # Display the updated image
-        self.display_image_on_canvas()
-        
-        # Update status
-        self.editor.status_bar.configure(text="Emboss filter applied")
+        self._apply_filter("Emboss", ImageFilter.EMBOSS, "Emboss filter applied", {"op": "emboss"})
+    
+    def _apply_filter(self, name, image_filter, message, step):
+        """Run a Pillow filter in parallel strips in the background, reporting progress per strip"""
+        self.run_image_job(
+            name,
+            lambda image, job: self.editor.filter_executor.apply(image, image_filter, progress=job.report),
+            message,
+            steps=[step]
+        )
     
     def apply_sepia(self):
         """Apply sepia tone filter to the image."""
-        if not self.editor.current_image:
-            messagebox.showinfo("Info", "Please open an image first")
-            return
-        
-        # Add current state to history before making changes
-        self.editor.push_to_history()
-        
-        # Convert to grayscale first
-        grayscale = ImageOps.grayscale(self.editor.current_image)
-        
-        # Apply sepia tone (using a simple method)
-        width, height = grayscale.size
-        sepia = Image.new('RGB', (width, height))
-        
-        # Create sepia tone by adjusting RGB values
-        for x in range(width):
-            for y in range(height):
-                gray_value = grayscale.getpixel((x, y))
-                r = min(int(gray_value * 1.2), 255)
-                g = min(int(gray_value * 0.95), 255)
-                b = int(gray_value * 0.7)
-                sepia.putpixel((x, y), (r, g, b))
-        
-        self.editor.current_image = sepia
-        
-        # Display the updated image
-        self.display_image_on_canvas()
-        
-        # Update status
-        self.editor.status_bar.configure(text="Sepia filter applied")
+        # Apply the sepia tone as a single color matrix pass
+        self.run_image_job("Sepia", lambda image, job: color_engine.sepia(image), "Sepia filter applied",
+                           steps=[{"op": "sepia"}])
     
     def apply_negative(self):
         """Apply negative/invert filter to the image."""
+        # Invert the color channels, keeping any transparency
+        self.run_image_job("Negative", lambda image, job: color_engine.negative(image), "Negative filter applied",
+                           steps=[{"op": "negative"}])
+    
+    def apply_tint(self, color=None, strength=0.5):
+        """Tint the image with a color, asking for the color if none is given."""
         if not self.editor.current_image:
             messagebox.showinfo("Info", "Please open an image first")
             return
         
-        # Add current state to history before making changes
-        self.editor.push_to_history()
-        
-        # Invert the image
-        self.editor.current_image = ImageOps.invert(self.editor.current_image)
-        
-        # Display the updated image
-        self.display_image_on_canvas()
+        if color is None:
+            from tkinter import colorchooser
+            color = colorchooser.askcolor(title="Choose Tint Color")[0]
+            if color is None:
+                return
         
-        # Update status
-        self.editor.status_bar.configure(text="Negative filter applied")
\ No newline at end of file
+        # Blend the colors towards the tinted luma in a single color matrix pass
+        self.run_image_job("Tint", lambda image, job: color_engine.tint(image, color, strength), "Tint applied",
+                           steps=[{"op": "tint", "color": list(color), "strength": strength}])
\ No newline at end of file
@@ -0,0 +1,259 @@
+import math
+import tkinter as tk
+from PIL import Image, ImageTk
+
+# Factor by which fast renders reduce the resolution of a zoomed-out view
+FAST_REDUCTION = 2
+
+# Radius of each resampling filter in source pixels at a scale of 1
+FILTER_SUPPORT = {
+    Image.NEAREST: 0,
+    Image.BILINEAR: 1,
+    Image.LANCZOS: 3,
+}
+
+
+class CanvasRenderer:
+    """Draws the visible part of an image onto a canvas at a given zoom level.
+
+    Only the region of the image that falls inside the canvas is resampled, into a
+    canvas-sized frame that is pasted into a reused PhotoImage, so the cost of a
+    redraw depends on the window size rather than on the image size or zoom level.
+    """
+
+    def __init__(self, canvas, background="#2a2d2e"):
+        self.canvas = canvas
+        self.background = background
+        self.zoom = 1.0
+        # Canvas position of the image's top-left corner
+        self.origin = (0.0, 0.0)
+        self.image_size = None
+        self.photo = None
+        self.item = None
+        # Set when the view should be centered on the next render
+        self._recenter = True
+
+    @property
+    def canvas_size(self):
+        return (max(self.canvas.winfo_width(), 1), max(self.canvas.winfo_height(), 1))
+
+    def reset_view(self):
+        """Center the image on the next render"""
+        self._recenter = True
+
+    def image_to_canvas(self, x, y):
+        """Convert image coordinates to canvas coordinates"""
+        return (self.origin[0] + x * self.zoom, self.origin[1] + y * self.zoom)
+
+    def canvas_to_image(self, x, y):
+        """Convert canvas coordinates to image coordinates"""
+        return ((x - self.origin[0]) / self.zoom, (y - self.origin[1]) / self.zoom)
+
+    def contains(self, x, y):
+        """Check whether the canvas point (x, y) lies on the image"""
+        if self.image_size is None:
+            return False
+        img_x, img_y = self.canvas_to_image(x, y)
+        return 0 <= img_x <= self.image_size[0] and 0 <= img_y <= self.image_size[1]
+
+    def set_zoom(self, zoom, anchor=None):
+        """Change the zoom level, keeping the image point under the canvas point anchor in place"""
+        if anchor is None:
+            canvas_width, canvas_height = self.canvas_size
+            anchor = (canvas_width / 2, canvas_height / 2)
+
+        img_x, img_y = self.canvas_to_image(*anchor)
+        self.zoom = zoom
+        self.origin = (anchor[0] - img_x * zoom, anchor[1] - img_y * zoom)
+
+    def pan(self, dx, dy):
+        """Move the image by (dx, dy) canvas pixels"""
+        self.origin = (self.origin[0] + dx, self.origin[1] + dy)
+
+    def _clamp_origin(self):
+        """Center the image along axes where it fits and keep the canvas covered along the others"""
+        canvas_size = self.canvas_size
+        origin = list(self.origin)
+        for axis in (0, 1):
+            extent = self.image_size[axis] * self.zoom
+            if extent <= canvas_size[axis] or self._recenter:
+                origin[axis] = (canvas_size[axis] - extent) // 2
+            else:
+                origin[axis] = min(0, max(canvas_size[axis] - extent, origin[axis]))
+            # Keep the image aligned to whole canvas pixels
+            origin[axis] = round(origin[axis])
+        self.origin = tuple(origin)
+        self._recenter = False
+
+    def render(self, image, zoom=None, pyramid=None, fast=False):
+        """Draw image onto the canvas, resampling only the region that is visible.
+
+        When a pyramid of the image is given, zoomed-out views are resampled from
+        its nearest larger level instead of from the full-resolution image. A fast
+        render resamples at half the canvas resolution with a cheaper filter.
+        """
+        if image is None:
+            return
+
+        if zoom is not None and zoom != self.zoom:
+            self.set_zoom(zoom)
+        if image.size != self.image_size:
+            # A new or resized image starts centered
+            self._recenter = True
+        self.image_size = image.size
+        self._clamp_origin()
+
+        frame = Image.new("RGB", self.canvas_size, self.background)
+        visible = self._visible_box()
+        if visible is not None:
+            frame.paste(self._draw_box(image, visible, pyramid, fast), visible[:2])
+
+        self._show(frame)
+
+    def render_region(self, image, rect, pyramid=None):
+        """Redraw only the part of the canvas showing the image region rect.
+
+        rect is (left, upper, right, lower) in image coordinates. The region is
+        resampled on its own and copied into the existing canvas image, so the cost
+        depends on the size of rect rather than on the size of the canvas.
+        """
+        if image is None:
+            return
+        if self.photo is None or image.size != self.image_size:
+            self.render(image, pyramid=pyramid)
+            return
+
+        visible = self._visible_box()
+        if visible is None:
+            return
+
+        # Resampling spreads each changed pixel over the support of the filter
+        grow = FILTER_SUPPORT[Image.LANCZOS] * max(1, 1 / self.zoom) + 1
+
+        # Canvas pixels showing rect, grown outward to whole pixels
+        left, upper = self.image_to_canvas(rect[0] - grow, rect[1] - grow)
+        right, lower = self.image_to_canvas(rect[2] + grow, rect[3] + grow)
+        box = (max(visible[0], int(math.floor(left))), max(visible[1], int(math.floor(upper))),
+               min(visible[2], int(math.ceil(right))), min(visible[3], int(math.ceil(lower))))
+        if box[2] <= box[0] or box[3] <= box[1]:
+            return
+
+        patch = ImageTk.PhotoImage(self._draw_box(image, box, pyramid, False))
+        self.canvas.tk.call(str(self.photo), 'copy', str(patch), '-to', box[0], box[1])
+
+    def _visible_box(self):
+        """Return the box of canvas pixels covered by the image, or None if it is off screen"""
+        canvas_width, canvas_height = self.canvas_size
+        left = max(0, self.origin[0])
+        upper = max(0, self.origin[1])
+        right = min(canvas_width, int(math.floor(self.origin[0] + self.image_size[0] * self.zoom)))
+        lower = min(canvas_height, int(math.floor(self.origin[1] + self.image_size[1] * self.zoom)))
+        if right <= left or lower <= upper:
+            return None
+        return (left, upper, right, lower)
+
+    def view_proxy(self, image, pyramid=None):
+        """Return (proxy, canvas_box) for the part of image visible on the canvas.
+
+        The proxy is that part of the image resampled to screen resolution, so edits
+        previewed on it cost the same whatever the size of the image. Show the edited
+        proxy with show_proxy(). Returns (None, None) if the image is off screen.
+        """
+        if image is None:
+            return None, None
+
+        if image.size != self.image_size:
+            self._recenter = True
+        self.image_size = image.size
+        self._clamp_origin()
+        visible = self._visible_box()
+        if visible is None:
+            return None, None
+        return self._region(image, visible, pyramid, False), visible
+
+    def show_proxy(self, proxy, canvas_box):
+        """Draw a proxy made by view_proxy() in place of the image"""
+        frame = Image.new("RGB", self.canvas_size, self.background)
+        frame.paste(self._on_background(proxy), canvas_box[:2])
+        self._show(frame)
+
+    def _draw_box(self, image, canvas_box, pyramid, fast):
+        """Resample the part of image shown in canvas_box onto the canvas background"""
+        return self._on_background(self._region(image, canvas_box, pyramid, fast))
+
+    def _region(self, image, canvas_box, pyramid, fast):
+        """Resample the part of image shown in canvas_box to the size of the box"""
+        left, upper, right, lower = canvas_box
+
+        # The matching region of the image, in fractional image coordinates
+        box_left, box_upper = self.canvas_to_image(left, upper)
+        box_right, box_lower = self.canvas_to_image(right, lower)
+
+        # A fast render of a zoomed-out view only needs half the resolution
+        reduction = FAST_REDUCTION if fast and self.zoom < 1 else 1
+
+        source, scale = image, 1.0
+        if pyramid is not None and pyramid.image is image:
+            source, scale = pyramid.level_for_zoom(self.zoom / reduction)
+
+        box = (max(0.0, box_left * scale), max(0.0, box_upper * scale),
+               min(float(source.width), box_right * scale), min(float(source.height), box_lower * scale))
+
+        size = (right - left, lower - upper)
+        if not fast:
+            return self._resample(source, size, box, Image.LANCZOS)
+        if reduction > 1:
+            reduced_size = (max(1, size[0] // reduction), max(1, size[1] // reduction))
+            return self._resample(source, reduced_size, box, Image.BILINEAR).resize(size, Image.NEAREST)
+        return self._resample(source, size, box, Image.NEAREST)
+
+    def _on_background(self, region):
+        """Return region as an RGB image, with transparent areas over the canvas background"""
+        if 'A' not in region.getbands() and 'transparency' not in region.info:
+            return region.convert("RGB")
+
+        region = region.convert("RGBA")
+        background = Image.new("RGB", region.size, self.background)
+        background.paste(region, (0, 0), region)
+        return background
+
+    @staticmethod
+    def _resample(image, size, box, resample):
+        """Resize the region box of image to size.
+
+        Resizing a box of a large image still walks far more of the image than the box,
+        so the box is cropped out first with enough margin for the filter support,
+        which gives the same result.
+        """
+        scale = max((box[2] - box[0]) / size[0], (box[3] - box[1]) / size[1], 1)
+        margin = int(math.ceil(FILTER_SUPPORT.get(resample, 3) * scale)) + 1
+
+        crop_box = (max(0, int(box[0]) - margin), max(0, int(box[1]) - margin),
+                    min(image.width, int(math.ceil(box[2])) + margin),
+                    min(image.height, int(math.ceil(box[3])) + margin))
+        region = image.crop(crop_box)
+        return region.resize(size, resample, box=(box[0] - crop_box[0], box[1] - crop_box[1],
+                                                  box[2] - crop_box[0], box[3] - crop_box[1]))
+
+    def _show(self, frame):
+        """Copy frame into the canvas image, creating it only when the canvas size changes"""
+        if self.photo is None or (self.photo.width(), self.photo.height()) != frame.size:
+            self.photo = ImageTk.PhotoImage(frame)
+            if self.item is None:
+                self.item = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo, tags="image")
+            else:
+                self.canvas.itemconfig(self.item, image=self.photo)
+        else:
+            self.photo.paste(frame)
+
+        # Keep the image below crop rectangles, text boxes and other overlays
+        self.canvas.tag_lower(self.item)
+
+    def clear(self):
+        """Remove the image from the canvas"""
+        if self.item is not None:
+            self.canvas.delete(self.item)
+        self.item = None
+        self.photo = None
+        self.image_size = None
+        self._recenter = True
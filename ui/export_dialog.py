@@ -0,0 +1,133 @@
+import tkinter as tk
+from tkinter import messagebox
+import customtkinter as ctk
+
+from tools import export
+
+# Delay after the last change of an option before the estimate is redone
+ESTIMATE_DELAY_MS = 200
+
+
+class ExportDialog:
+    """Asks for the encoder options of an export and estimates the size and time they lead to.
+
+    The estimate comes from encoding a small downscaled sample of the image with
+    the chosen options, redone whenever they change. on_export is called with the
+    options when the Export button is pressed.
+    """
+
+    def __init__(self, editor, path, image, on_export):
+        self.editor = editor
+        self.path = path
+        self.format = export.format_for_path(path)
+        self.full_size = image.size
+        self.sample = export.make_sample(image)
+        self.on_export = on_export
+        self.options = export.default_options(self.format)
+        self._estimate_job = None
+
+        self.dialog = ctk.CTkToplevel(editor.root)
+        self.dialog.title("Export Options")
+        self.dialog.geometry("360x300")
+        self.dialog.resizable(False, False)
+        self.dialog.transient(editor.root)
+        self.dialog.grab_set()
+
+        # Center the window
+        self.dialog.update_idletasks()
+        width = self.dialog.winfo_width()
+        height = self.dialog.winfo_height()
+        x = (self.dialog.winfo_screenwidth() // 2) - (width // 2)
+        y = (self.dialog.winfo_screenheight() // 2) - (height // 2)
+        self.dialog.geometry(f"{width}x{height}+{x}+{y}")
+
+        title_label = ctk.CTkLabel(self.dialog, text=f"Export as {self.format}", font=ctk.CTkFont(size=16, weight="bold"))
+        title_label.pack(pady=(15, 10))
+
+        options_frame = ctk.CTkFrame(self.dialog)
+        options_frame.pack(fill=tk.X, padx=20, pady=5)
+
+        if self.format == 'PNG':
+            self.add_slider(options_frame, "Compression level:", 'compress_level', 0, 9)
+        elif self.format == 'JPEG':
+            self.add_slider(options_frame, "Quality:", 'quality', 1, 100)
+            self.add_checkbox(options_frame, "Optimize (smaller file, slower)", 'optimize')
+            self.add_checkbox(options_frame, "Progressive", 'progressive')
+        elif self.format == 'WEBP':
+            self.add_slider(options_frame, "Quality:", 'quality', 1, 100)
+        else:
+            ctk.CTkLabel(options_frame, text="This format has no encoder options").pack(pady=10)
+
+        self.estimate_label = ctk.CTkLabel(self.dialog, text="Estimating...", text_color=("gray40", "gray70"))
+        self.estimate_label.pack(pady=10)
+
+        button_frame = ctk.CTkFrame(self.dialog)
+        button_frame.pack(fill=tk.X, padx=20, pady=(5, 15))
+        ctk.CTkButton(button_frame, text="Cancel", command=self.close, width=80).pack(side=tk.LEFT, padx=10)
+        ctk.CTkButton(button_frame, text="Export", command=self.export, width=80).pack(side=tk.RIGHT, padx=10)
+
+        self.schedule_estimate()
+
+    def add_slider(self, parent, text, key, from_, to):
+        row = ctk.CTkFrame(parent)
+        row.pack(fill=tk.X, pady=5)
+        ctk.CTkLabel(row, text=text, width=120, anchor="w").pack(side=tk.LEFT, padx=5)
+        value_label = ctk.CTkLabel(row, text=str(self.options[key]), width=30)
+
+        def changed(value):
+            self.options[key] = int(round(value))
+            value_label.configure(text=str(self.options[key]))
+            self.schedule_estimate()
+
+        slider = ctk.CTkSlider(row, from_=from_, to=to, number_of_steps=to - from_, command=changed)
+        slider.set(self.options[key])
+        slider.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        value_label.pack(side=tk.LEFT, padx=5)
+
+    def add_checkbox(self, parent, text, key):
+        var = tk.BooleanVar(value=self.options[key])
+
+        def changed():
+            self.options[key] = var.get()
+            self.schedule_estimate()
+
+        ctk.CTkCheckBox(parent, text=text, variable=var, command=changed).pack(anchor="w", padx=10, pady=5)
+
+    def schedule_estimate(self):
+        """Redo the estimate once the options have stopped changing"""
+        if self._estimate_job is not None:
+            self.dialog.after_cancel(self._estimate_job)
+        self._estimate_job = self.dialog.after(ESTIMATE_DELAY_MS, self.update_estimate)
+
+    def update_estimate(self):
+        self._estimate_job = None
+        try:
+            size, seconds = export.estimate(self.sample, self.full_size, self.path, self.options)
+        except Exception as e:
+            self.estimate_label.configure(text=f"No estimate: {str(e)}")
+            return
+        self.estimate_label.configure(text=f"Estimated size: {format_bytes(size)}, about {seconds:.1f} s to encode")
+
+    def export(self):
+        options = dict(self.options)
+        self.close()
+        try:
+            self.on_export(options)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to export image: {str(e)}")
+
+    def close(self):
+        if self._estimate_job is not None:
+            self.dialog.after_cancel(self._estimate_job)
+            self._estimate_job = None
+        self.dialog.destroy()
+
+
+def format_bytes(size):
+    """size in bytes as a short readable string"""
+    if size < 1024:
+        return f"{size} bytes"
+    for unit in ("KB", "MB", "GB"):
+        size /= 1024
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
@@ -0,0 +1,122 @@
+import tkinter as tk
+from tkinter import colorchooser, simpledialog
+import customtkinter as ctk
+
+from layers.filter_stack import FILTER_OPS
+
+
+class LayerFiltersDialog:
+    """Lists the filter stack of the active layer and lets each node be toggled, edited, moved or removed"""
+
+    def __init__(self, editor):
+        self.editor = editor
+        self.layer_manager = editor.layer_manager
+
+        self.dialog = ctk.CTkToplevel(editor.root)
+        self.dialog.title("Layer Filters")
+        self.dialog.geometry("420x360")
+        self.dialog.transient(editor.root)
+
+        # Center the window
+        self.dialog.update_idletasks()
+        width = self.dialog.winfo_width()
+        height = self.dialog.winfo_height()
+        x = (self.dialog.winfo_screenwidth() // 2) - (width // 2)
+        y = (self.dialog.winfo_screenheight() // 2) - (height // 2)
+        self.dialog.geometry(f"{width}x{height}+{x}+{y}")
+
+        title_label = ctk.CTkLabel(self.dialog, text="Layer Filters", font=ctk.CTkFont(size=16, weight="bold"))
+        title_label.pack(pady=(15, 10))
+
+        self.list_frame = ctk.CTkScrollableFrame(self.dialog)
+        self.list_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=5)
+
+        # Add a node at the end of the stack
+        add_frame = ctk.CTkFrame(self.dialog)
+        add_frame.pack(fill=tk.X, padx=15, pady=(5, 15))
+
+        labels = {label: op for op, (label, _, _) in FILTER_OPS.items()}
+        add_var = tk.StringVar(value=next(iter(labels)))
+        ctk.CTkOptionMenu(add_frame, values=list(labels), variable=add_var).pack(side=tk.LEFT, padx=5)
+        ctk.CTkButton(
+            add_frame,
+            text="Add",
+            width=60,
+            command=lambda: self.change(lambda filters: filters.add(labels[add_var.get()]))
+        ).pack(side=tk.LEFT, padx=5)
+        ctk.CTkButton(add_frame, text="Close", width=60, command=self.dialog.destroy).pack(side=tk.RIGHT, padx=5)
+
+        self.refresh()
+
+    def active_filters(self):
+        layers = self.layer_manager.layers
+        index = self.layer_manager.active_layer_index
+        if 0 <= index < len(layers):
+            return layers[index].filters
+        return None
+
+    def change(self, change):
+        """Apply change to the filter stack of the active layer and refresh the list"""
+        self.layer_manager.edit_layer_filters(change)
+        self.refresh()
+
+    def refresh(self):
+        """Rebuild the list of nodes"""
+        for widget in self.list_frame.winfo_children():
+            widget.destroy()
+
+        filters = self.active_filters()
+        if not filters or not len(filters):
+            ctk.CTkLabel(self.list_frame, text="No filters on this layer").pack(pady=10)
+            return
+
+        count = len(filters)
+        for index, node in enumerate(filters):
+            row = ctk.CTkFrame(self.list_frame)
+            row.pack(fill=tk.X, pady=2)
+
+            enabled_var = tk.BooleanVar(value=node.enabled)
+            ctk.CTkCheckBox(
+                row,
+                text=self.describe(node),
+                variable=enabled_var,
+                command=lambda i=index, var=enabled_var: self.change(lambda f: f.set_enabled(i, var.get()))
+            ).pack(side=tk.LEFT, padx=5)
+
+            ctk.CTkButton(row, text="✕", width=28,
+                          command=lambda i=index: self.change(lambda f: f.remove(i))).pack(side=tk.RIGHT, padx=2)
+            if index < count - 1:
+                ctk.CTkButton(row, text="↓", width=28,
+                              command=lambda i=index: self.change(lambda f: f.move(i, i + 1))).pack(side=tk.RIGHT, padx=2)
+            if index > 0:
+                ctk.CTkButton(row, text="↑", width=28,
+                              command=lambda i=index: self.change(lambda f: f.move(i, i - 1))).pack(side=tk.RIGHT, padx=2)
+            if node.params:
+                ctk.CTkButton(row, text="Edit", width=40,
+                              command=lambda i=index: self.edit_node(i)).pack(side=tk.RIGHT, padx=2)
+
+    @staticmethod
+    def describe(node):
+        if not node.params:
+            return node.label
+        params = ", ".join(f"{name} {value}" for name, value in node.params.items())
+        return f"{node.label} ({params})"
+
+    def edit_node(self, index):
+        """Ask for new parameters of a node; the nodes before it keep their cached results"""
+        node = self.active_filters().nodes[index]
+        params = {}
+        for name, value in node.params.items():
+            if name == "color":
+                color = colorchooser.askcolor(color="#%02x%02x%02x" % tuple(value[:3]), parent=self.dialog)[0]
+                new_value = tuple(int(c) for c in color) if color else None
+            elif isinstance(value, int):
+                new_value = simpledialog.askinteger(node.label, f"{name.capitalize()}:", initialvalue=value, parent=self.dialog)
+            else:
+                new_value = simpledialog.askfloat(node.label, f"{name.capitalize()}:", initialvalue=value, parent=self.dialog)
+            if new_value is None:
+                return  # User cancelled
+            params[name] = new_value
+
+        if params != node.params:
+            self.change(lambda filters: filters.set_params(index, **params))
@@ -3,6 +3,8 @@ import customtkinter as ctk
 from PIL import Image, ImageTk, ImageDraw
 import os
 
+from layers.blend_modes import BLEND_MODES
+
 class LayerPanel:
     def __init__(self, editor, parent_frame):
         self.editor = editor
@@ -100,10 +102,9 @@ class LayerPanel:
         blend_label.pack(anchor="w", padx=5, pady=(5, 0))
         
         self.blend_var = tk.StringVar(value="Normal")
-        blend_modes = ["Normal", "Multiply", "Screen", "Overlay", "Soft Light", "Hard Light", "Difference"]
         self.blend_dropdown = ctk.CTkOptionMenu(
             controls_frame,
-            values=blend_modes,
+            values=BLEND_MODES,
             variable=self.blend_var,
             command=self.change_blend_mode
         )
@@ -159,10 +160,10 @@ class LayerPanel:
         
         # Layer thumbnail (small preview of the layer)
         thumbnail_size = (30, 30)
-        if layer.image:
-            # Create thumbnail from layer image
-            thumb = layer.image.copy()
-            thumb.thumbnail(thumbnail_size)
+        # Create thumbnail from layer image, with its filters applied; layers whose
+        # pixels are not loaded may not have a preview yet
+        thumb = layer.thumbnail(thumbnail_size) if layer.image_size else None
+        if thumb is not None:
             if thumb.mode == 'RGBA':
                 # Create a checkerboard background for transparent images
                 bg = self.create_transparency_checkerboard(thumbnail_size)
@@ -280,7 +281,7 @@ class LayerPanel:
                 
             # Update the layer opacity
             self.editor.layer_manager.layers[active_index].opacity = int(value)
-            self.editor.layer_manager.update_composite()
+            self.editor.layer_manager.update_composite(interactive=True)
     
     def change_blend_mode(self, blend_mode):
         """Change the blend mode of the active layer"""
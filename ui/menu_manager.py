@@ -11,7 +11,12 @@ from tkinter import filedialog, messagebox
 from ui.settings_manager import SettingsManager
 from layers.layer import Layer
 from layers.layer_manager import LayerManager
+from layers import psd_import
 from ui.layer_panel import LayerPanel
+from ui.layer_filters_dialog import LayerFiltersDialog
+from ui.export_dialog import ExportDialog
+from layers.filter_stack import FILTER_OPS
+from tools import operations
 
 class MenuManager:
     def __init__(self, editor):
@@ -98,7 +103,7 @@ class MenuManager:
     def open_recent_file(self, filepath):
         """Open a file from the recent files list"""
         if os.path.exists(filepath):
-            self.editor.open_image_from_path(filepath)
+            self.open_image_from_path(filepath)
         else:
             # If file doesn't exist, remove it from the list
             self.recent_files.remove(filepath)
@@ -116,10 +121,6 @@ class MenuManager:
         """Create a new blank image dialog"""
         self.editor.new_image()
     
-    def export_image(self):
-        """Export the current image in different formats"""
-        self.editor.export_image()
-    
     def create_menu(self):
         # Create main menu bar
         self.menu_bar = tk.Menu(self.editor.root)
@@ -140,17 +141,22 @@ class MenuManager:
         self.file_menu.add_cascade(label="Open Recent", menu=self.recent_menu)
         self.update_recent_files_menu()  # Populate with recent files
         
+        # Layered documents
+        self.file_menu.add_command(label="Open Project...", command=self.editor.open_project)
+        
         self.file_menu.add_separator()
         
         # Add Save commands
         self.file_menu.add_command(label="Save", command=self.editor.save_image, accelerator="Ctrl+S")
         self.file_menu.add_command(label="Save As...", command=lambda: self.editor.save_image(save_as=True), accelerator="Ctrl+Shift+S")
+        self.file_menu.add_command(label="Save Project", command=self.editor.save_project)
+        self.file_menu.add_command(label="Save Project As...", command=lambda: self.editor.save_project(save_as=True))
         
         # Add Export command
         self.file_menu.add_command(label="Export As...", command=self.export_image, accelerator="Ctrl+E")
         
         self.file_menu.add_separator()
-        self.file_menu.add_command(label="Exit", command=self.editor.root.quit, accelerator="Ctrl+Q")
+        self.file_menu.add_command(label="Exit", command=self.editor.quit, accelerator="Ctrl+Q")
         
         # Edit menu
         self.edit_menu = tk.Menu(self.menu_bar, tearoff=0)
@@ -162,6 +168,9 @@ class MenuManager:
         self.edit_menu.add_command(label="Resize", command=self.editor.resize_image, accelerator="R")
         self.edit_menu.add_separator()
         self.edit_menu.add_command(label="Reset to Original", command=self.editor.reset_image, accelerator="Ctrl+0")
+        self.edit_menu.add_separator()
+        self.edit_menu.add_command(label="Export Macro...", command=self.export_macro)
+        self.edit_menu.add_command(label="Run Macro...", command=self.run_macro)
         
         # View menu
         self.view_menu = tk.Menu(self.menu_bar, tearoff=0)
@@ -189,6 +198,22 @@ class MenuManager:
         self.layer_menu.add_separator()
         self.layer_menu.add_command(label="Merge Down", command=lambda: self.editor.layer_manager.merge_with_below(), accelerator="Ctrl+E")
         self.layer_menu.add_command(label="Flatten Image", command=self.editor.layer_manager.flatten_image, accelerator="Shift+Ctrl+E")
+        self.layer_menu.add_separator()
+
+        # Non-destructive filters of the active layer
+        self.layer_filters_menu = tk.Menu(self.layer_menu, tearoff=0)
+        self.layer_menu.add_cascade(label="Add Layer Filter", menu=self.layer_filters_menu)
+        for op, (label, _, _) in FILTER_OPS.items():
+            self.layer_filters_menu.add_command(
+                label=label,
+                command=lambda op=op: self.editor.layer_manager.edit_layer_filters(lambda filters: filters.add(op))
+            )
+        self.layer_menu.add_command(label="Layer Filters...", command=lambda: LayerFiltersDialog(self.editor))
+        self.layer_menu.add_command(label="Apply Layer Filters", command=self.editor.layer_manager.apply_layer_filters)
+        self.layer_menu.add_command(
+            label="Clear Layer Filters",
+            command=lambda: self.editor.layer_manager.edit_layer_filters(lambda filters: filters.clear())
+        )
 
         # Filters menu
         self.filters_menu = tk.Menu(self.menu_bar, tearoff=0)
@@ -200,6 +225,7 @@ class MenuManager:
         self.filters_menu.add_command(label="Emboss", command=self.editor.tools.apply_emboss)
         self.filters_menu.add_command(label="Negative", command=self.editor.tools.apply_negative)
         self.filters_menu.add_command(label="Sepia", command=self.editor.tools.apply_sepia)
+        self.filters_menu.add_command(label="Tint...", command=self.editor.tools.apply_tint)
         
         ## Tools menu
         self.tools_menu = tk.Menu(self.menu_bar, tearoff=0)
@@ -301,7 +327,7 @@ class MenuManager:
     def open_recent_file(self, filepath):
         """Open a file from the recent files list"""
         if os.path.exists(filepath):
-            self.editor.open_image_from_path(filepath)
+            self.open_image_from_path(filepath)
         else:
             # If file doesn't exist, remove it from the list
             self.recent_files.remove(filepath)
@@ -311,44 +337,36 @@ class MenuManager:
             
     def open_image_from_path(self, filepath):
         """Open an image from a specific file path using the layer system"""
-        try:
-            # Load the image
-            image = Image.open(filepath)
+        def setup_layers(image):
+            layer_manager = self.editor.layer_manager
             
             # Initialize the layer manager with the correct canvas size
-            self.layer_manager.canvas_size = image.size
+            layer_manager.canvas_size = image.size
             
             # Clear existing layers
-            self.layer_manager.layers = []
+            layer_manager.layers = []
             
             # Create a background layer with the loaded image
             bg_layer = Layer(image, name="Background")
-            self.layer_manager.add_layer(bg_layer)
-            
-            # Store the original image for reset functionality
-            self.original_image = image.copy()
-            self.image_path = filepath
-            
-            # Clear history
-            self.history = []
-            self.history_index = -1
+            layer_manager.add_layer(bg_layer)
             
             # Get the composite image from layer manager
-            self.current_image = self.layer_manager.get_composite_image()
-            
-            # Display the image
-            self.display_image_on_canvas()
-            
-            # Update UI state
-            self.update_ui_state()
-            
-            # Add to recent files
-            if hasattr(self, 'menu_manager'):
-                self.menu_manager.add_to_recent_files(filepath)
+            self.editor.current_image = layer_manager.get_composite_image()
+            self.editor.display_image_on_canvas()
             
             # Update status
-            self.status_bar.configure(text=f"Opened: {filepath}")
-            
+            self.editor.status_bar.configure(text=f"Opened: {filepath}")
+        
+        # PSD files are opened with their layers when psd-tools is available
+        if filepath.lower().endswith('.psd') and psd_import.PSDImage is not None:
+            self.editor.tools.open_psd(filepath)
+            return
+        
+        try:
+            self.editor.image_path = filepath
+            # The preview is shown at once; the layers are set up once the full image is
+            # decoded, and they need all of its pixels in memory
+            self.editor.tools.load_image_file(filepath, on_loaded=setup_layers, allow_tiled=False)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open image: {str(e)}")
 
@@ -436,6 +454,8 @@ class MenuManager:
                 # Set it as the current image
                 self.editor.original_image = new_image
                 self.editor.current_image = new_image.copy()
+                # The new document is not saved as a project yet
+                self.editor.project = None
                 
                 # Set canvas size for layer manager
                 self.editor.layer_manager.canvas_size = (width, height)
@@ -453,9 +473,7 @@ class MenuManager:
                 self.editor.status_bar.configure(text=f"Created new image ({width}x{height})")
                 
                 # Clear history when creating a new image
-                self.editor.history = [self.editor.current_image.copy()]
-                self.editor.history_index = 0
-                self.editor.update_undo_redo_buttons()
+                self.editor.reset_history()
                 
                 # Close the dialog
                 dialog.destroy()
@@ -473,7 +491,7 @@ class MenuManager:
         width_entry.focus_set()
 
     def export_image(self):
-        """Export the current image in different formats"""
+        """Export the current image in different formats, with encoder options"""
         if not self.editor.current_image:
             messagebox.showinfo("Info", "Please open or create an image first")
             return
@@ -482,6 +500,7 @@ class MenuManager:
         file_types = [
             ("PNG Image", "*.png"),
             ("JPEG Image", "*.jpg *.jpeg"),
+            ("WebP Image", "*.webp"),
             ("BMP Image", "*.bmp"),
             ("GIF Image", "*.gif"),
             ("TIFF Image", "*.tiff *.tif"),
@@ -497,26 +516,59 @@ class MenuManager:
         if not filepath:
             return  # User cancelled
         
+        # The options are estimated on a downscaled sample of the image as it is now;
+        # the export itself runs in the background once they are chosen
         try:
-            # Get file extension
-            _, ext = os.path.splitext(filepath)
-            ext = ext.lower()
-            
-            # Handle different formats
-            if ext == '.jpg' or ext == '.jpeg':
-                # Convert to RGB if needed (JPEG doesn't support alpha)
-                if self.editor.current_image.mode == 'RGBA':
-                    rgb_image = Image.new('RGB', self.editor.current_image.size, (255, 255, 255))
-                    rgb_image.paste(self.editor.current_image, mask=self.editor.current_image.split()[3])
-                    rgb_image.save(filepath, 'JPEG', quality=95)
-                else:
-                    self.editor.current_image.save(filepath, 'JPEG', quality=95)
-            else:
-                # Save in the requested format
-                self.editor.current_image.save(filepath)
-            
-            messagebox.showinfo("Success", f"Image exported successfully to {filepath}")
-            
+            ExportDialog(
+                self.editor,
+                filepath,
+                self.editor.current_image,
+                lambda options: self.editor.tools.export_image(filepath, options)
+            )
         except Exception as e:
             messagebox.showerror("Error", f"Failed to export image: {str(e)}")
-    
\ No newline at end of file
+    
+
+    def export_macro(self):
+        """Save the operations that led to the current image as a macro.
+        
+        Macros are recipe files, so they can also be run with tools/batch.py.
+        """
+        steps = self.editor.recorded_operations()
+        if not steps:
+            messagebox.showinfo("Info", "No operations have been recorded yet")
+            return
+        
+        filepath = filedialog.asksaveasfilename(
+            title="Export Macro",
+            filetypes=[("Macro", "*.json"), ("All Files", "*.*")],
+            defaultextension=".json"
+        )
+        if not filepath:
+            return  # User cancelled
+        
+        try:
+            operations.save_recipe(filepath, steps)
+            self.editor.status_bar.configure(text=f"Macro exported: {os.path.basename(filepath)} ({len(steps)} steps)")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to export macro: {str(e)}")
+    
+    def run_macro(self):
+        """Replay a macro or batch recipe on the current image"""
+        if not self.editor.current_image:
+            messagebox.showinfo("Info", "Please open an image first")
+            return
+        
+        filepath = filedialog.askopenfilename(
+            title="Run Macro",
+            filetypes=[("Macro", "*.json"), ("All Files", "*.*")]
+        )
+        if not filepath:
+            return  # User cancelled
+        
+        try:
+            recipe = operations.load_recipe(filepath)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load macro: {str(e)}")
+            return
+        self.editor.tools.run_macro(recipe["operations"])
@@ -322,6 +322,16 @@ class PropertiesPanel:
             if self.editor.active_tool == "draw":
                 self.editor.draw_color = color
 
+    def update_brush_size(self, value):
+        """Update the brush size for drawing."""
+        size = int(value)
+        self.draw_properties["size"] = size
+        self.size_value_label.configure(text=f"{size}px")
+        
+        # Update active drawing size if draw tool is active
+        if self.editor.active_tool == "draw":
+            self.editor.draw_size = size
+
     def update_opacity(self, value):
         """Update the opacity for drawing."""
         opacity = int(value)
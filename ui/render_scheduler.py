@@ -0,0 +1,56 @@
+class RenderScheduler:
+    """Coalesces canvas redraws into a fast preview now and a full quality pass on idle.
+
+    While input is active, each request draws a quick reduced-resolution preview
+    at the next idle moment of the Tk event loop, so a burst of events in one turn
+    only draws once. The full quality pass is postponed until no request has come
+    in for idle_delay milliseconds. Any newer request supersedes the pending ones.
+    """
+
+    def __init__(self, root, render, idle_delay=150):
+        self.root = root
+        # Callback drawing the canvas, called with fast=True for previews
+        self.render = render
+        self.idle_delay = idle_delay
+        self._preview_job = None
+        self._final_job = None
+
+    def request(self, interactive=True):
+        """Ask for a redraw, as a fast preview followed by a quality pass if interactive"""
+        if not interactive:
+            self.render_now()
+            return
+
+        if self._preview_job is None:
+            self._preview_job = self.root.after_idle(self._run_preview)
+
+        # Restart the idle countdown for the quality pass
+        if self._final_job is not None:
+            self.root.after_cancel(self._final_job)
+        self._final_job = self.root.after(self.idle_delay, self._run_final)
+
+    def render_now(self):
+        """Draw at full quality immediately, dropping any pending redraws"""
+        self.cancel()
+        self.render(fast=False)
+
+    def cancel(self):
+        """Cancel pending redraws"""
+        if self._preview_job is not None:
+            self.root.after_cancel(self._preview_job)
+            self._preview_job = None
+        if self._final_job is not None:
+            self.root.after_cancel(self._final_job)
+            self._final_job = None
+
+    def _run_preview(self):
+        self._preview_job = None
+        self.render(fast=True)
+
+    def _run_final(self):
+        self._final_job = None
+        # The quality pass supersedes a preview that has not been drawn yet
+        if self._preview_job is not None:
+            self.root.after_cancel(self._preview_job)
+            self._preview_job = None
+        self.render(fast=False)
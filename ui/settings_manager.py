@@ -23,8 +23,11 @@ class SettingsManager:
             },
             "performance": {
                 "max_history_states": 20,
+                "history_memory_budget_mb": 512,
+                "render_idle_delay_ms": 150,
                 "max_image_dimension": 10000,
-                "use_multithreading": True
+                "use_multithreading": True,
+                "autosave_interval_s": 60
             }
         }
         
@@ -63,15 +66,25 @@ class SettingsManager:
         
         # Apply performance settings
         if "performance" in self.settings:
-            # Set max history states if the editor has this attribute
-            if hasattr(self.editor, "max_history_states"):
-                self.editor.max_history_states = self.settings["performance"]["max_history_states"]
+            # Set max history states and the history memory budget
+            self.editor.max_history_states = self.settings["performance"]["max_history_states"]
+            if hasattr(self.editor, "history_store"):
+                budget_mb = self.settings["performance"]["history_memory_budget_mb"]
+                self.editor.history_store.budget = budget_mb * 1024 * 1024 if budget_mb else None
+                self.editor.enforce_history_budget()
+            
+            # Delay before the full quality redraw after zooming, panning or dragging sliders
+            if hasattr(self.editor, "render_scheduler"):
+                self.editor.render_scheduler.idle_delay = self.settings["performance"]["render_idle_delay_ms"]
+            
+            # Seconds between autosaves to the recovery file, 0 turns autosave off
+            if hasattr(self.editor, "autosave"):
+                self.editor.autosave.interval = self.settings["performance"]["autosave_interval_s"]
             
             # Apply multithreading setting
-            # This might require additional implementation in the editor class
             use_threading = self.settings["performance"]["use_multithreading"]
-            if hasattr(self.editor, "use_multithreading"):
-                self.editor.use_multithreading = use_threading
+            if hasattr(self.editor, "filter_executor"):
+                self.editor.filter_executor.use_multithreading = use_threading
         
         # Apply measurement settings
         if "measurement" in self.settings:
@@ -237,8 +250,11 @@ class SettingsManager:
         if "performance" not in self.settings:
             self.settings["performance"] = {
                 "max_history_states": 20,
+                "history_memory_budget_mb": 512,
+                "render_idle_delay_ms": 150,
                 "max_image_dimension": 10000,
-                "use_multithreading": True
+                "use_multithreading": True,
+                "autosave_interval_s": 60
             }
     
         # History states setting
@@ -278,6 +294,84 @@ class SettingsManager:
         )
         history_desc.pack(anchor="w", padx=30, pady=(0, 15))
     
+        # History memory budget setting
+        budget_frame = ctk.CTkFrame(self.content_frame)
+        budget_frame.pack(fill="x", padx=20, pady=10)
+    
+        budget_label = ctk.CTkLabel(
+            budget_frame, 
+            text="History Memory Budget (MB):", 
+            width=200,
+            anchor="w"
+        )
+        budget_label.pack(side="left", padx=(10, 10))
+    
+        # Create variable for the history memory budget
+        self.history_budget_var = tk.IntVar(value=self.settings["performance"]["history_memory_budget_mb"])
+
+        budget_options = [128, 256, 512, 1024, 2048, "No Limit"]
+        current_budget_str = str(self.history_budget_var.get())
+        if self.history_budget_var.get() == 0:
+            current_budget_str = "No Limit"
+
+        budget_dropdown = ctk.CTkOptionMenu(
+            budget_frame,
+            values=[str(x) for x in budget_options],
+            variable=tk.StringVar(value=current_budget_str),
+            command=lambda x: self.history_budget_var.set(0 if x == "No Limit" else int(x)),
+            width=100
+        )
+
+        budget_dropdown.pack(side="left")
+    
+        # History memory budget description
+        budget_desc = ctk.CTkLabel(
+            self.content_frame,
+            text="Older undo steps beyond this amount of memory are compressed, then moved to a temporary folder on disk.",
+            font=ctk.CTkFont(size=12),
+            text_color=("gray40", "gray70"),
+            wraplength=500,
+            justify="left"
+        )
+        budget_desc.pack(anchor="w", padx=30, pady=(0, 15))
+    
+        # Render idle delay setting
+        render_frame = ctk.CTkFrame(self.content_frame)
+        render_frame.pack(fill="x", padx=20, pady=10)
+    
+        render_label = ctk.CTkLabel(
+            render_frame, 
+            text="Quality Redraw Delay (ms):", 
+            width=200,
+            anchor="w"
+        )
+        render_label.pack(side="left", padx=(10, 10))
+    
+        # Create variable for the render idle delay
+        self.render_delay_var = tk.IntVar(value=self.settings["performance"]["render_idle_delay_ms"])
+
+        render_options = [50, 100, 150, 300, 500]
+        render_dropdown = ctk.CTkOptionMenu(
+            render_frame,
+            values=[str(x) for x in render_options],
+            variable=tk.StringVar(value=str(self.render_delay_var.get())),
+            command=lambda x: self.render_delay_var.set(int(x)),
+            width=100
+        )
+
+        render_dropdown.pack(side="left")
+    
+        # Render idle delay description
+        render_desc = ctk.CTkLabel(
+            self.content_frame,
+            text="While zooming, panning or dragging sliders a fast preview is drawn. The full quality image is drawn once input has been idle for this long.",
+            font=ctk.CTkFont(size=12),
+            text_color=("gray40", "gray70"),
+            wraplength=500,
+            justify="left"
+        )
+        render_desc.pack(anchor="w", padx=30, pady=(0, 15))
+    
         # Max image dimension setting
         dimension_frame = ctk.CTkFrame(self.content_frame)
         dimension_frame.pack(fill="x", padx=20, pady=10)
@@ -355,6 +449,47 @@ class SettingsManager:
         )
         threading_desc.pack(anchor="w", padx=30, pady=(0, 15))
     
+        # Autosave interval setting
+        autosave_frame = ctk.CTkFrame(self.content_frame)
+        autosave_frame.pack(fill="x", padx=20, pady=10)
+    
+        autosave_label = ctk.CTkLabel(
+            autosave_frame, 
+            text="Autosave Interval (s):", 
+            width=200,
+            anchor="w"
+        )
+        autosave_label.pack(side="left", padx=(10, 10))
+    
+        # Create variable for the autosave interval
+        self.autosave_var = tk.IntVar(value=self.settings["performance"]["autosave_interval_s"])
+
+        autosave_options = [30, 60, 120, 300, "Off"]
+        current_autosave_str = str(self.autosave_var.get())
+        if self.autosave_var.get() == 0:
+            current_autosave_str = "Off"
+
+        autosave_dropdown = ctk.CTkOptionMenu(
+            autosave_frame,
+            values=[str(x) for x in autosave_options],
+            variable=tk.StringVar(value=current_autosave_str),
+            command=lambda x: self.autosave_var.set(0 if x == "Off" else int(x)),
+            width=100
+        )
+
+        autosave_dropdown.pack(side="left")
+    
+        # Autosave description
+        autosave_desc = ctk.CTkLabel(
+            self.content_frame,
+            text="Saves the layers to a recovery file in the background while they change, writing only the edited tiles. After a crash, the editor offers to restore them on the next start.",
+            font=ctk.CTkFont(size=12),
+            text_color=("gray40", "gray70"),
+            wraplength=500,
+            justify="left"
+        )
+        autosave_desc.pack(anchor="w", padx=30, pady=(0, 15))
+    
         # Performance tips section
         tips_frame = ctk.CTkFrame(self.content_frame)
         tips_frame.pack(fill="x", padx=20, pady=(20, 10))
@@ -569,12 +704,21 @@ class SettingsManager:
         if hasattr(self, 'history_var'):
             self.settings["performance"]["max_history_states"] = self.history_var.get()
         
+        if hasattr(self, 'history_budget_var'):
+            self.settings["performance"]["history_memory_budget_mb"] = self.history_budget_var.get()
+        
+        if hasattr(self, 'render_delay_var'):
+            self.settings["performance"]["render_idle_delay_ms"] = self.render_delay_var.get()
+        
         if hasattr(self, 'dimension_var'):
             self.settings["performance"]["max_image_dimension"] = self.dimension_var.get()
         
         if hasattr(self, 'threading_var'):
             self.settings["performance"]["use_multithreading"] = self.threading_var.get()
         
+        if hasattr(self, 'autosave_var'):
+            self.settings["performance"]["autosave_interval_s"] = self.autosave_var.get()
+        
         # Update measurement settings if they exist
         if hasattr(self, 'unit_var'):
             self.settings["measurement"]["default_unit"] = self.unit_var.get()
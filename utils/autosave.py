@@ -0,0 +1,184 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from layers.layer import Layer
+from layers.project import ProjectFile
+from tools import tiled_tiff
+
+# Written while the editor runs and removed when it is closed normally
+RECOVERY_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "config",
+    "recovery.mie"
+)
+DEFAULT_INTERVAL_S = 60
+
+
+class AutosaveService:
+    """Saves the layers to a recovery file every interval seconds while they keep changing.
+
+    Each autosave is an incremental project save: the tiles edited since the
+    previous autosave are copied out of the layers on the main thread, and
+    compressed and written on a worker thread, so the editor does not stall
+    however large the document is. Nothing is written while nothing changes,
+    and only one autosave is written at a time.
+
+    When the current image is not the composite of the layers, as after File > Open
+    or an operation that replaced it, it is saved as a single layer instead.
+
+    The recovery file is removed when the editor is closed normally, so finding
+    it on startup means the last session ended without closing and its work can
+    be restored.
+    """
+
+    def __init__(self, editor, path=RECOVERY_FILE, interval=DEFAULT_INTERVAL_S, poll_interval=100):
+        self.editor = editor
+        self.path = path
+        self.poll_interval = poll_interval
+        self.project = ProjectFile(path)
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autosave")
+        self._timer = None
+        self._writing = None  # (plan, state, future) of the autosave being written
+        self._saved_state = None  # What the last autosave wrote, see _document_state()
+        self._image_layer = None  # Holds a current image that is not the layer composite
+        self.error = None  # Why the last autosave failed, if it did
+        self._interval = 0
+        self.interval = interval
+
+    @property
+    def interval(self):
+        """Seconds between autosaves, 0 when autosaving is off"""
+        return self._interval
+
+    @interval.setter
+    def interval(self, seconds):
+        self._interval = seconds
+        self._schedule()
+
+    @property
+    def has_recovery(self):
+        """Whether a recovery file was left behind by a session that did not close normally"""
+        return os.path.exists(self.path)
+
+    def _schedule(self):
+        if self._timer is not None:
+            self.editor.root.after_cancel(self._timer)
+            self._timer = None
+        if self._interval > 0 and self._pool is not None:
+            self._timer = self.editor.root.after(int(self._interval * 1000), self._tick)
+
+    def _tick(self):
+        self._timer = None
+        self.autosave()
+        self._schedule()
+
+    def _document(self):
+        """Return the (layers, active_index, canvas_size) to save, or None if there is nothing to save"""
+        image = self.editor.current_image
+        layer_manager = self.editor.layer_manager
+        if layer_manager.layers and (image is None or image is layer_manager.get_composite_image()):
+            self._image_layer = None
+            return layer_manager.layers, layer_manager.active_layer_index, tuple(layer_manager.canvas_size)
+        # A tiled file is never modified, so it is still on disk as it is, and a draft
+        # preview stands in for an image that is still being loaded
+        if image is None or isinstance(image, tiled_tiff.TiledTiff) or self.editor.preview_scale != 1.0:
+            return None
+
+        # Saved as one layer, kept from one autosave to the next so that only the
+        # tiles of an image edited in place are written again
+        if self._image_layer is None:
+            self._image_layer = Layer(image, name="Background")
+        elif self._image_layer.image is not image:
+            self._image_layer.image = image
+        return [self._image_layer], 0, image.size
+
+    @staticmethod
+    def _document_state(layers, active_index, canvas_size):
+        """The layers with their stamps, the active layer and the canvas size"""
+        return [(id(layer), layer.stamp) for layer in layers], active_index, canvas_size
+
+    def autosave(self):
+        """Start writing what changed since the last autosave, unless one is still being written"""
+        if self._pool is None or self._writing is not None:
+            return
+        document = self._document()
+        if document is None:
+            return
+        state = self._document_state(*document)
+        if state == self._saved_state:
+            return
+
+        layers, active_index, canvas_size = document
+        try:
+            plan = self.project.prepare_save(layers, canvas_size, active_index)
+        except Exception as e:
+            self._failed(e)
+            return
+        self._writing = (plan, state, self._pool.submit(self.project.write, plan))
+        self.editor.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        """Record the autosave being written once it is on disk"""
+        if self._writing is None:
+            return
+        plan, state, future = self._writing
+        if not future.done():
+            self.editor.root.after(self.poll_interval, self._poll)
+            return
+
+        self._writing = None
+        try:
+            future.result()
+        except Exception as e:
+            self._failed(e)
+            return
+        self.project.finish_save(plan)
+        self._saved_state = state
+        self.error = None
+
+    def _failed(self, error):
+        """Tell the user the recovery file is not being written; the next autosave tries again"""
+        self.error = str(error)
+        self.editor.status_bar.configure(text=f"Autosave failed, work is not being saved for recovery: {error}")
+
+    def restore(self):
+        """Open the recovery file and return its (layers, canvas_size, active_index).
+
+        The restored layers read their pixels from the recovery file as they are
+        needed, so autosaving carries on in that file rather than starting a new one.
+        """
+        self._wait()
+        self.project.close()
+        project, layers, canvas_size, active_index = ProjectFile.open(self.path)
+        self.project = project
+        self._saved_state = None
+        self._image_layer = None
+        return layers, canvas_size, active_index
+
+    def discard(self):
+        """Delete the recovery file; the next autosave starts a new one"""
+        self._wait()
+        self.project.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.project = ProjectFile(self.path)
+        self._saved_state = None
+        self._image_layer = None
+
+    def stop(self):
+        """Stop autosaving and delete the recovery file, as when the editor closes normally"""
+        if self._pool is None:
+            return
+        self._wait()
+        self._pool.shutdown()
+        self._pool = None
+        self._schedule()
+        self.project.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _wait(self):
+        """Let the autosave being written finish, discarding it"""
+        if self._writing is not None:
+            self._writing[2].exception()
+            self._writing = None
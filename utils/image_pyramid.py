@@ -0,0 +1,105 @@
+import math
+
+# Modes Image.reduce() works on directly; anything else is converted first
+REDUCIBLE_MODES = ('L', 'LA', 'La', 'RGB', 'RGBA', 'RGBa', 'I', 'F')
+
+
+class ImagePyramid:
+    """Power-of-two downscaled copies of an image, built on demand.
+
+    Level 0 is the image itself and each following level is half the size of the
+    previous one. Zooming out resamples from the smallest level that is still at
+    least as large as the displayed size instead of from the full-resolution image.
+    When the image is modified in place, mark_dirty() records the changed region
+    and only that part of each level is rebuilt the next time the level is used.
+    """
+
+    def __init__(self, image=None):
+        self.image = None
+        self.levels = []
+        self._pending = []  # Level 0 boxes still to be applied, one list per level
+        if image is not None:
+            self.set_image(image)
+
+    def set_image(self, image):
+        """Start a new pyramid for image"""
+        self.image = image
+        self.levels = [image]
+        self._pending = [[]]
+
+    def rebase(self, image):
+        """Track image, a copy of the current image made before any change, keeping the levels"""
+        self.image = image
+        if self.levels:
+            self.levels[0] = image
+
+    def update(self, image, boxes=None):
+        """Track image, which may be the current image modified in place inside boxes"""
+        if image is not self.image or image.size != self.levels[0].size:
+            self.set_image(image)
+        elif boxes:
+            for box in boxes:
+                self.mark_dirty(box)
+
+    def mark_dirty(self, box):
+        """Record that the region box of the level 0 image has changed"""
+        for pending in self._pending[1:]:
+            pending.append(box)
+
+    def level_for_zoom(self, zoom):
+        """Return (image, scale) for the smallest level at least zoom times the image size"""
+        if self.image is None:
+            return None, 1.0
+        if zoom >= 1:
+            return self.image, 1.0
+
+        index = int(math.floor(math.log2(1 / zoom)))
+        index = min(index, self.max_level)
+        return self.level(index), 1 / (2 ** index)
+
+    @property
+    def max_level(self):
+        """Index of the last level, one pixel wide or high"""
+        width, height = self.image.size
+        return max(0, int(math.floor(math.log2(max(1, min(width, height))))))
+
+    def level(self, index):
+        """Return the image at level index, building or refreshing it as needed"""
+        while len(self.levels) <= index:
+            source = self._source(len(self.levels) - 1)
+            self.levels.append(source.reduce(2))
+            self._pending.append([])
+
+        if index > 0 and self._pending[index]:
+            # The level below has to be up to date before it is sampled
+            self.level(index - 1)
+            for box in self._pending[index]:
+                self._rebuild(index, box)
+            self._pending[index] = []
+
+        return self.levels[index]
+
+    def _source(self, index):
+        """Return level index in a mode that can be reduced"""
+        image = self.levels[index]
+        if image.mode not in REDUCIBLE_MODES:
+            image = image.convert('RGBA' if image.mode in ('P', 'PA') else 'RGB')
+        return image
+
+    def _rebuild(self, index, box):
+        """Recompute the part of level index covering the level 0 region box"""
+        factor = 2 ** index
+        level = self.levels[index]
+        parent = self._source(index - 1)
+
+        # The region at this level, grown outward to whole pixels
+        left = box[0] // factor
+        upper = box[1] // factor
+        right = min(level.width, -(-box[2] // factor))
+        lower = min(level.height, -(-box[3] // factor))
+        if right <= left or lower <= upper:
+            return
+
+        # Each pixel averages a 2x2 block of the level below
+        parent_box = (2 * left, 2 * upper, min(parent.width, 2 * right), min(parent.height, 2 * lower))
+        level.paste(parent.crop(parent_box).reduce(2), (left, upper))
@@ -0,0 +1,163 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been cancelled"""
+
+
+class Job:
+    """A piece of background work with progress reporting and cancellation.
+
+    The work function runs on a worker thread and can call report() with the
+    fraction done. report() raises JobCancelled once the job has been cancelled,
+    so long running work stops at its next progress point.
+    """
+
+    def __init__(self, name, work, on_done=None, on_error=None, prepare=None, on_cancel=None):
+        self.name = name
+        self.work = work
+        self.on_done = on_done
+        self.on_error = on_error
+        self.prepare = prepare
+        self.on_cancel = on_cancel
+        self.progress = 0.0
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Ask the job to stop; its result is discarded and on_cancel is called right away"""
+        if self._cancelled.is_set():
+            return
+        self._cancelled.set()
+        if self.on_cancel:
+            self.on_cancel()
+
+    def report(self, fraction):
+        """Record the fraction of the work done, stopping the job if it was cancelled"""
+        self.check_cancelled()
+        self.progress = max(0.0, min(1.0, fraction))
+
+    def check_cancelled(self):
+        """Raise JobCancelled if the job has been cancelled"""
+        if self._cancelled.is_set():
+            raise JobCancelled(self.name)
+
+
+class JobScheduler:
+    """Runs jobs one at a time off the Tk main loop, in the order they were submitted.
+
+    Each job starts only once the callbacks of the previous one have run, so an
+    edit queued behind another one works on its result. prepare() is called on
+    the main thread when the job starts and its return value is handed to the
+    work function. Results come back through a queue that is polled with
+    root.after, and on_done or on_error are called on the main thread. Jobs are
+    cancelled from the main thread, which is where on_cancel runs.
+    on_update is called with the running job, or None when the queue is empty.
+    """
+
+    def __init__(self, root, on_update=None, poll_interval=50):
+        self.root = root
+        self.on_update = on_update
+        self.poll_interval = poll_interval
+        self.current = None
+        self._pending = deque()
+        self._results = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs")
+        self._poll_job = None
+
+    @property
+    def busy(self):
+        return self.current is not None or bool(self._pending)
+
+    def submit(self, name, work, on_done=None, on_error=None, prepare=None, on_cancel=None):
+        """Queue work(job, prepared) to run after the jobs already queued and return the job"""
+        job = Job(name, work, on_done, on_error, prepare, on_cancel)
+        self._pending.append(job)
+        if self.current is None:
+            self._start_next()
+        return job
+
+    def cancel(self):
+        """Cancel the running job and every job waiting behind it"""
+        for job in self._pending:
+            job.cancel()
+        self._pending.clear()
+        if self.current is not None:
+            self.current.cancel()
+
+    def _start_next(self):
+        """Start the next job that has not been cancelled, if any"""
+        while self._pending:
+            job = self._pending.popleft()
+            if job.cancelled:
+                continue
+            try:
+                prepared = job.prepare() if job.prepare else None
+            except Exception as e:
+                self._finish(job, error=e)
+                continue
+
+            self.current = job
+            self._pool.submit(self._run, job, prepared)
+            self._notify()
+            if self._poll_job is None:
+                self._poll_job = self.root.after(self.poll_interval, self._poll)
+            return
+
+        self.current = None
+        self._notify()
+
+    def _run(self, job, prepared):
+        """Run a job on the worker thread and queue its outcome for the main thread"""
+        try:
+            job.check_cancelled()
+            result = job.work(job, prepared)
+            job.check_cancelled()
+            self._results.put((job, result, None))
+        except JobCancelled:
+            self._results.put((job, None, None))
+        except Exception as e:
+            self._results.put((job, None, e))
+
+    def _poll(self):
+        """Hand finished jobs to their callbacks and report the progress of the running one"""
+        self._poll_job = None
+        try:
+            while True:
+                job, result, error = self._results.get_nowait()
+                self.current = None
+                if not job.cancelled:
+                    self._finish(job, result, error)
+        except queue.Empty:
+            pass
+
+        if self.current is None:
+            self._start_next()
+        else:
+            self._notify()
+
+        if self.current is not None and self._poll_job is None:
+            self._poll_job = self.root.after(self.poll_interval, self._poll)
+
+    def _finish(self, job, result=None, error=None):
+        """Call the callback matching the outcome of a job"""
+        if error is not None:
+            if job.on_error:
+                job.on_error(error)
+        elif job.on_done:
+            job.on_done(result)
+
+    def _notify(self):
+        if self.on_update:
+            self.on_update(self.current)
+
+    def shutdown(self):
+        """Cancel all jobs and stop the worker thread"""
+        self.cancel()
+        self._pool.shutdown(wait=False)
@@ -14,7 +14,7 @@ class KeyboardShortcuts:
         self.editor.root.bind("<Control-o>", self.editor.open_image)
         self.editor.root.bind("<Control-s>", self.editor.save_image)
         self.editor.root.bind("<Control-Shift-s>", lambda e: self.editor.save_image(save_as=True))
-        self.editor.root.bind("<Control-q>", lambda e: self.editor.root.quit())
+        self.editor.root.bind("<Control-q>", self.editor.quit)
         
         # Edit operations
         self.editor.root.bind("<Control-z>", self.editor.undo)